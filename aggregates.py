@@ -0,0 +1,343 @@
+"""Roster and statistics aggregates over SQLite and the School model.
+
+Four aggregates are supported:
+
+* enrollment per course;
+* load per instructor (courses taught, total enrollments in them);
+* age distribution of students and of instructors;
+* students registered in no course.
+
+:func:`db_snapshot` computes them with grouped SQL and never builds the
+object graph. :class:`Aggregates` keeps them materialized for a live
+:class:`models.School`: it is filled once by :meth:`Aggregates.reset`, and
+after that every stored or removed entity only adjusts the counts it
+contributed. Both produce the same snapshot dictionary, which
+:func:`format_report` renders for the statistics views.
+
+:class:`CoEnrollment` answers which courses share students: a sparse
+student x course incidence matrix over integer-coded IDs and the course x
+course co-enrollment counts derived from it, with top-k overlapping pairs
+and timetable conflicts.
+"""
+
+from __future__ import annotations
+import heapq
+from array import array
+from collections import Counter
+from itertools import chain, combinations, repeat
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+import metrics
+import storage
+
+@metrics.instrumented()
+def db_snapshot(path: str | Path | None = None) -> dict:
+    """Compute all aggregates from the database with grouped SQL.
+
+    :param path: Database file; defaults to ``storage.DB_PATH``.
+    :type path: str | Path | None
+    :return: Snapshot in the format of :meth:`Aggregates.snapshot`.
+    :rtype: dict
+    """
+    storage.init_db(path)
+    conn = storage.get_conn(path)
+    try:
+        enrollment = dict(conn.execute(
+            """SELECT c.course_id, COUNT(r.student_id) FROM courses c
+               LEFT JOIN registrations r ON r.course_id = c.course_id GROUP BY c.course_id"""))
+        load = {iid: (courses, students) for iid, courses, students in conn.execute(
+            """SELECT i.instructor_id, COUNT(DISTINCT c.course_id), COUNT(r.student_id) FROM instructors i
+               LEFT JOIN courses c ON c.instructor_id = i.instructor_id
+               LEFT JOIN registrations r ON r.course_id = c.course_id
+               GROUP BY i.instructor_id""")}
+        ages = {t: dict(conn.execute(f"SELECT age, COUNT(*) FROM {t} GROUP BY age ORDER BY age"))
+                for t in ("students", "instructors")}
+        idle = [r[0] for r in conn.execute(
+            """SELECT student_id FROM students s
+               WHERE NOT EXISTS (SELECT 1 FROM registrations r WHERE r.student_id = s.student_id)
+               ORDER BY student_id""")]
+    finally:
+        conn.close()
+    return {"enrollment": enrollment, "instructor_load": load, "ages": ages, "students_without_courses": idle}
+
+class Aggregates:
+    """Materialized aggregates over one School, refreshed incrementally.
+
+    Feed it the School's write notifications, either directly::
+
+        agg = Aggregates()
+        agg.reset(school)
+        school.subscribe(agg.on_write)
+
+    or through :meth:`engine.Engine.watch` (see ``Engine.aggregates``),
+    which also calls :meth:`reset` when the model is replaced.
+    """
+    def __init__(self):
+        self._clear()
+
+    def _clear(self):
+        # per-entity contribution, so a write can subtract what it replaces
+        self._students: Dict[str, Tuple[int, int]] = {}          # id -> (age, registered courses)
+        self._instructors: Dict[str, int] = {}                    # id -> age
+        self._courses: Dict[str, Tuple[Optional[str], int]] = {}  # id -> (instructor, enrolled)
+        self._ages = {"students": Counter(), "instructors": Counter()}
+        # stored instructor id -> [courses, enrollments], like the JOIN in db_snapshot
+        self._load: Dict[str, List[int]] = {}
+        self._idle: Dict[str, None] = {}
+
+    @metrics.instrumented("aggregates.reset")
+    def reset(self, school):
+        """Recompute everything from ``school`` in one pass per collection."""
+        self._clear()
+        for sid, s in school.students.items():
+            self._add_student(sid, s)
+        for iid, i in school.instructors.items():
+            self._add_instructor(iid, i)
+        for cid, c in school.courses.items():
+            self._add_course(cid, c)
+        metrics.record("aggregates.reset", rows=len(self._students) + len(self._instructors) + len(self._courses))
+
+    def on_write(self, entity: str, key: str, obj):
+        """Apply one stored (``obj``) or removed (``obj is None``) entity."""
+        if entity == "students":
+            self._remove_student(key)
+            if obj is not None:
+                self._add_student(key, obj)
+        elif entity == "instructors":
+            load = self._load.get(key)
+            self._remove_instructor(key)
+            if obj is not None:
+                if load is not None:
+                    self._load[key] = load
+                self._add_instructor(key, obj)
+        elif entity == "courses":
+            self._remove_course(key)
+            if obj is not None:
+                self._add_course(key, obj)
+
+    # ---------------------- Contributions ----------------------
+    def _add_student(self, sid, s):
+        n = len(s.registered_courses)
+        self._students[sid] = (s.age, n)
+        self._ages["students"][s.age] += 1
+        if n == 0:
+            self._idle[sid] = None
+
+    def _remove_student(self, sid):
+        old = self._students.pop(sid, None)
+        if old is not None:
+            _decrement(self._ages["students"], old[0])
+            self._idle.pop(sid, None)
+
+    def _add_instructor(self, iid, i):
+        self._instructors[iid] = i.age
+        self._ages["instructors"][i.age] += 1
+        if iid not in self._load:
+            # courses stored before their instructor were not counted yet
+            taught = [n for ins, n in self._courses.values() if ins == iid]
+            if taught:
+                self._load[iid] = [len(taught), sum(taught)]
+
+    def _remove_instructor(self, iid):
+        old = self._instructors.pop(iid, None)
+        if old is not None:
+            _decrement(self._ages["instructors"], old)
+        self._load.pop(iid, None)
+
+    def _add_course(self, cid, c):
+        n = len(c.enrolled_students)
+        self._courses[cid] = (c.instructor_id, n)
+        if c.instructor_id in self._instructors:
+            load = self._load.setdefault(c.instructor_id, [0, 0])
+            load[0] += 1
+            load[1] += n
+
+    def _remove_course(self, cid):
+        old = self._courses.pop(cid, None)
+        if old is not None and old[0] in self._instructors:
+            load = self._load[old[0]]
+            load[0] -= 1
+            load[1] -= old[1]
+            if load[0] == 0:
+                del self._load[old[0]]
+
+    # ---------------------- Results ----------------------
+    def enrollment(self) -> Dict[str, int]:
+        """Return ``{course_id: enrolled students}``."""
+        return {cid: n for cid, (_, n) in self._courses.items()}
+
+    def instructor_load(self) -> Dict[str, Tuple[int, int]]:
+        """Return ``{instructor_id: (courses taught, enrollments in them)}``."""
+        return {iid: tuple(self._load.get(iid, (0, 0))) for iid in self._instructors}
+
+    def age_distribution(self, entity: str = "students") -> Dict[int, int]:
+        """Return ``{age: count}`` in age order for ``"students"`` or ``"instructors"``."""
+        return dict(sorted(self._ages[entity].items()))
+
+    def students_without_courses(self) -> List[str]:
+        """Return the IDs of students registered in no course, sorted."""
+        return sorted(self._idle)
+
+    def snapshot(self) -> dict:
+        """Return every aggregate in the format of :func:`db_snapshot`.
+
+        :rtype: dict
+        """
+        return {"enrollment": self.enrollment(), "instructor_load": self.instructor_load(),
+                "ages": {e: self.age_distribution(e) for e in ("students", "instructors")},
+                "students_without_courses": self.students_without_courses()}
+
+def _decrement(counter: Counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
+
+def format_report(snap: dict, top: int = 10) -> str:
+    """Render a snapshot as plain text for the statistics views.
+
+    :param snap: Result of :func:`db_snapshot` or :meth:`Aggregates.snapshot`.
+    :type snap: dict
+    :param top: Rows shown for the largest courses, busiest instructors and idle students.
+    :type top: int
+    :rtype: str
+    """
+    enrollment, load = snap["enrollment"], snap["instructor_load"]
+    idle = snap["students_without_courses"]
+    n_students = sum(snap["ages"]["students"].values())
+    lines = [f"Students {n_students}   Instructors {len(load)}   Courses {len(enrollment)}   "
+             f"Registrations {sum(enrollment.values())}", ""]
+    lines.append(f"Students without courses: {len(idle)}" + (f"  ({', '.join(idle[:top])}"
+                                                              f"{', ...' if len(idle) > top else ''})" if idle else ""))
+    lines += ["", f"Largest courses (of {len(enrollment)}):"]
+    for cid, n in sorted(enrollment.items(), key=lambda kv: (-kv[1], kv[0]))[:top]:
+        lines.append(f"  {cid:<14}{n:>8}")
+    lines += ["", "Instructor load (courses / enrollments):"]
+    for iid, (c, n) in sorted(load.items(), key=lambda kv: (-kv[1][1], -kv[1][0], kv[0]))[:top]:
+        lines.append(f"  {iid:<14}{c:>5} / {n:<8}")
+    for entity in ("students", "instructors"):
+        dist = snap["ages"][entity]
+        lines += ["", f"Age distribution ({entity}):"]
+        peak = max(dist.values(), default=0)
+        for age, n in dist.items():
+            lines.append(f"  {age:>4} {n:>8}  " + "#" * (round(40 * n / peak) if peak else 0))
+    return "\n".join(lines) + "\n"
+
+# ---------------------- Co-enrollment ----------------------
+class CoEnrollment:
+    """Course overlap computed from a sparse student x course incidence matrix.
+
+    Courses and students are coded as integers in first-seen order. The
+    incidence matrix is kept CSR-style: student ``s`` takes the sorted course
+    codes ``indices[indptr[s]:indptr[s + 1]]``. The co-enrollment matrix is
+    its transpose times itself; being symmetric, only the upper triangle is
+    stored, sparsely, as ``{(i, j): shared students}`` with ``i < j``, and
+    the diagonal (enrollment per course) separately. Counting runs over
+    ``itertools.combinations`` of each student's row, so the work is the
+    sum of squared courses per student rather than courses squared.
+
+    :param registrations: ``(student_id, course_id)`` pairs in any order.
+    :type registrations: Iterable[tuple[str, str]]
+    """
+    def __init__(self, registrations: Iterable[Tuple[str, str]]):
+        course_code: Dict[str, int] = {}
+        by_student: Dict[str, List[int]] = {}
+        for sid, cid in registrations:
+            code = course_code.get(cid)
+            if code is None:
+                code = course_code[cid] = len(course_code)
+            by_student.setdefault(sid, []).append(code)
+        self.course_ids: List[str] = list(course_code)
+        self.student_ids: List[str] = list(by_student)
+        self._course_code = course_code
+        self._student_code = {sid: n for n, sid in enumerate(self.student_ids)}
+        rows = [sorted(set(codes)) for codes in by_student.values()]
+        self.indptr = array("l", [0])
+        self.indices = array("l")
+        for row in rows:
+            self.indices.extend(row)
+            self.indptr.append(len(self.indices))
+        self.pairs: Counter = Counter(chain.from_iterable(map(combinations, rows, repeat(2))))
+        enrolled = Counter(self.indices)
+        self.enrollment = array("l", (enrolled[i] for i in range(len(self.course_ids))))
+        metrics.record("aggregates.co_enrollment", rows=len(self.indices))
+
+    @classmethod
+    @metrics.instrumented("aggregates.co_enrollment")
+    def from_db(cls, path: str | Path | None = None) -> "CoEnrollment":
+        """Build from the ``registrations`` table without loading the model."""
+        storage.init_db(path)
+        conn = storage.get_conn(path)
+        try:
+            return cls(conn.execute("SELECT student_id, course_id FROM registrations"))
+        finally:
+            conn.close()
+
+    @classmethod
+    @metrics.instrumented("aggregates.co_enrollment")
+    def from_school(cls, school) -> "CoEnrollment":
+        """Build from the students' ``registered_courses`` of a School."""
+        return cls((sid, cid) for sid, s in school.students.items() for cid in s.registered_courses)
+
+    def row(self, student_id: str) -> List[str]:
+        """Return the course IDs of one student (a row of the incidence matrix)."""
+        s = self._student_code.get(student_id)
+        if s is None:
+            return []
+        return [self.course_ids[i] for i in self.indices[self.indptr[s]:self.indptr[s + 1]]]
+
+    def overlap(self, course_a: str, course_b: str) -> int:
+        """Return the number of students taking both courses (enrollment if they are the same)."""
+        a, b = self._course_code.get(course_a), self._course_code.get(course_b)
+        if a is None or b is None:
+            return 0
+        if a == b:
+            return self.enrollment[a]
+        return self.pairs.get((a, b) if a < b else (b, a), 0)
+
+    def top_pairs(self, k: int = 10) -> List[Tuple[str, str, int]]:
+        """Return the ``k`` course pairs sharing the most students.
+
+        :rtype: list[tuple[str, str, int]]
+        """
+        ids = self.course_ids
+        return [(ids[a], ids[b], n) for (a, b), n in heapq.nlargest(k, self.pairs.items(), key=itemgetter(1))]
+
+    def neighbours(self, course_id: str, k: int = 10) -> List[Tuple[str, int]]:
+        """Return the ``k`` courses sharing the most students with ``course_id``."""
+        c = self._course_code.get(course_id)
+        if c is None:
+            return []
+        ids = self.course_ids
+        shared = ((b if a == c else a, n) for (a, b), n in self.pairs.items() if a == c or b == c)
+        return [(ids[o], n) for o, n in heapq.nlargest(k, shared, key=itemgetter(1))]
+
+    def conflict_pairs(self, schedule: Mapping[str, object]) -> List[Tuple[str, str, int]]:
+        """Return course pairs scheduled in the same slot that share students, most shared first.
+
+        :param schedule: ``{course_id: slot}``; unscheduled courses never conflict.
+        :type schedule: Mapping[str, object]
+        """
+        slot = [schedule.get(cid) for cid in self.course_ids]
+        ids = self.course_ids
+        hits = [(ids[a], ids[b], n) for (a, b), n in self.pairs.items()
+                if slot[a] is not None and slot[a] == slot[b]]
+        hits.sort(key=lambda t: (-t[2], t[0], t[1]))
+        return hits
+
+    def conflicts(self, schedule: Mapping[str, object]) -> Dict[str, List[Tuple[str, str]]]:
+        """Return, per affected student, the pairs of their courses that share a slot.
+
+        :param schedule: ``{course_id: slot}``; unscheduled courses never conflict.
+        :type schedule: Mapping[str, object]
+        :rtype: dict[str, list[tuple[str, str]]]
+        """
+        slot = [schedule.get(cid) for cid in self.course_ids]
+        ids, indices, indptr = self.course_ids, self.indices, self.indptr
+        out: Dict[str, List[Tuple[str, str]]] = {}
+        for s, sid in enumerate(self.student_ids):
+            row = [i for i in indices[indptr[s]:indptr[s + 1]] if slot[i] is not None]
+            if len({slot[i] for i in row}) == len(row):
+                continue
+            out[sid] = [(ids[a], ids[b]) for a, b in combinations(row, 2) if slot[a] == slot[b]]
+        return out
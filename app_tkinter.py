@@ -5,10 +5,27 @@ Provides a tabbed interface to manage students, instructors, and courses with
 JSON/CSV import-export and SQLite synchronization.
 """
 
+import sys
+import time
+_STARTED = time.perf_counter()
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from models import School, Student, Instructor, Course
-from storage import save_json, load_json, export_csv, school_to_db, db_to_school, backup_db, init_db
+from tkinter import ttk, messagebox
+import metrics
+# models, storage and tkinter.filedialog are imported where they are used so the
+# window is drawn before they load
+
+# Treeview rows inserted per event-loop turn while a table fills
+FILL_CHUNK = 500
+
+# Treeview row values; the first value (the entity ID) is also the item ID
+def _student_row(s):
+    return (s.student_id, s.name, s.age, s._email, ",".join(s.registered_courses))
+
+def _instructor_row(i):
+    return (i.instructor_id, i.name, i.age, i._email, ",".join(i.assigned_courses))
+
+def _course_row(c):
+    return (c.course_id, c.course_name, c.instructor_id or "", ",".join(c.enrolled_students))
 
 class SchoolAppTk:
     """Tkinter application window for managing school data.
@@ -19,18 +36,76 @@ class SchoolAppTk:
     def __init__(self, root):
         """Constructor.
 
-        Initializes the model and database, builds the UI, and refreshes tables.
+        Builds the empty window only; the model is loaded once the window has
+        been drawn (see :meth:`_load_initial`).
 
         :param root: Tk root window.
         :type root: tk.Tk
         """
         self.root = root
         self.root.title("School Management System (Tkinter)")
-        self.school = School()
-        init_db()
+        self.engine = None
+        self.cache_hit = None
+        self.startup_times = {}
+        self._fill_jobs = {}
 
         self._build_ui()
-        self._refresh_all_tables()
+        # every handler needs the model; clicks before _load_initial has run would hit None
+        self._set_buttons_enabled(False)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.after_idle(self._load_initial)
+
+    def _load_initial(self):
+        """Load the model after the first paint and fill the tables progressively.
+
+        If the startup cache matches the database, the model starts populated
+        from it without reading SQLite.
+        """
+        from engine import Engine
+        self.root.update_idletasks()
+        self._report_startup("First paint")
+        self.engine = Engine()
+        self.engine.open()
+        self.cache_hit = self.engine.load_startup_cache()
+        self._report_startup(f"Data loaded (startup cache {'hit' if self.cache_hit else 'miss'})", "Data loaded")
+        self._set_buttons_enabled(True)
+        self._refresh_all_tables(on_done=lambda: self._report_startup("Rows painted"))
+
+    def _on_close(self):
+        """Close the engine (refreshing the startup cache if still valid) and the window."""
+        if self.engine is not None:
+            self.engine.close()
+        self.root.destroy()
+
+    def _set_buttons_enabled(self, enabled):
+        """Enable or disable every button in the main window."""
+        flag = "!disabled" if enabled else "disabled"
+        widgets = [self.root]
+        while widgets:
+            w = widgets.pop()
+            widgets.extend(w.winfo_children())
+            if isinstance(w, ttk.Button):
+                w.state([flag])
+
+    @property
+    def school(self):
+        """The engine's live model, or None before :meth:`_load_initial` has run.
+
+        The buttons stay disabled until then, so handlers can rely on it.
+
+        :rtype: School | None
+        """
+        return self.engine.school if self.engine is not None else None
+
+    def _report_startup(self, message, stage=None):
+        """Log and record the time from launch to a startup stage.
+
+        :param message: Text printed to stderr.
+        :param stage: Key in :attr:`startup_times` (defaults to ``message``).
+        """
+        ms = (time.perf_counter() - _STARTED) * 1000
+        self.startup_times[stage or message] = ms
+        print(f"{message} after {ms:.0f} ms", file=sys.stderr)
 
     def _build_ui(self):
         """Create the search bar, action buttons, and tabbed views."""
@@ -40,6 +115,8 @@ class SchoolAppTk:
         ttk.Label(search_frame, text="Search:").pack(side="left")
         self.search_var = tk.StringVar()
         ttk.Entry(search_frame, textvariable=self.search_var).pack(side="left", expand=True, fill="x", padx=6)
+        self.fuzzy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Fuzzy", variable=self.fuzzy_var).pack(side="left", padx=(0, 6))
         ttk.Button(search_frame, text="Go", command=self._on_search).pack(side="left")
         ttk.Button(search_frame, text="Clear", command=self._on_clear_search).pack(side="left", padx=4)
 
@@ -52,6 +129,8 @@ class SchoolAppTk:
         ttk.Button(btns, text="Sync → DB", command=self._sync_to_db).pack(side="left", padx=4)
         ttk.Button(btns, text="Load ← DB", command=self._load_from_db).pack(side="left")
         ttk.Button(btns, text="Backup DB", command=self._backup_db).pack(side="left", padx=4)
+        ttk.Button(btns, text="Diagnostics", command=self._show_diagnostics).pack(side="left")
+        ttk.Button(btns, text="Statistics", command=self._show_statistics).pack(side="left", padx=4)
 
         # Notebook
         self.nb = ttk.Notebook(self.root)
@@ -60,6 +139,10 @@ class SchoolAppTk:
         self._build_students_tab()
         self._build_instructors_tab()
         self._build_courses_tab()
+        # School collection -> (Treeview, row values)
+        self._tables = {"students": (self.stu_tv, _student_row),
+                        "instructors": (self.ins_tv, _instructor_row),
+                        "courses": (self.c_tv, _course_row)}
 
     # --------- Students Tab ---------
     def _build_students_tab(self):
@@ -94,6 +177,7 @@ class SchoolAppTk:
 
         :raises ValueError: When required fields are missing or invalid.
         """
+        from models import Student
         try:
             s = Student(
                 student_id=self.stu_id.get().strip(),
@@ -114,13 +198,8 @@ class SchoolAppTk:
             messagebox.showerror("Error", str(e))
 
     def _delete_student(self):
-        """Delete the selected student from the model and refresh views."""
-        item = self._selected_item(self.stu_tv)
-        if not item: return
-        sid = self.stu_tv.set(item, "id")
-        self.school.delete_student(sid)
-        self._refresh_students()
-        self._update_dropdowns()
+        """Delete the selected students from the model and refresh views."""
+        self._delete_selected("students")
 
     def _on_student_select(self, _ev=None):
         """Populate the student form on table selection."""
@@ -132,11 +211,9 @@ class SchoolAppTk:
         self.stu_email.set(self.stu_tv.set(item, "email"))
 
     def _refresh_students(self, results=None):
-        """Reload students table with optional filtered list."""
-        self._refresh_table(self.stu_tv)
-        data = results or list(self.school.students.values())
-        for s in data:
-            self.stu_tv.insert("", "end", values=(s.student_id, s.name, s.age, s._email, ",".join(s.registered_courses)))
+        """Reload students table with optional filtered iterable."""
+        data = self.school.students.values() if results is None else results
+        self._fill_table(self.stu_tv, data, _student_row)
 
     def _clear_student_form(self):
         """Clear all student form input fields."""
@@ -175,6 +252,7 @@ class SchoolAppTk:
 
         :raises ValueError: When required fields are missing or invalid.
         """
+        from models import Instructor
         try:
             i = Instructor(
                 instructor_id=self.ins_id.get().strip(),
@@ -195,13 +273,8 @@ class SchoolAppTk:
             messagebox.showerror("Error", str(e))
 
     def _delete_instructor(self):
-        """Delete the selected instructor from the model and refresh views."""
-        item = self._selected_item(self.ins_tv)
-        if not item: return
-        iid = self.ins_tv.set(item, "id")
-        self.school.delete_instructor(iid)
-        self._refresh_instructors()
-        self._update_dropdowns()
+        """Delete the selected instructors from the model and refresh views."""
+        self._delete_selected("instructors")
 
     def _on_instructor_select(self, _ev=None):
         """Populate the instructor form on table selection."""
@@ -213,11 +286,9 @@ class SchoolAppTk:
         self.ins_email.set(self.ins_tv.set(item, "email"))
 
     def _refresh_instructors(self, results=None):
-        """Reload instructors table with optional filtered list."""
-        self._refresh_table(self.ins_tv)
-        data = results or list(self.school.instructors.values())
-        for i in data:
-            self.ins_tv.insert("", "end", values=(i.instructor_id, i.name, i.age, i._email, ",".join(i.assigned_courses)))
+        """Reload instructors table with optional filtered iterable."""
+        data = self.school.instructors.values() if results is None else results
+        self._fill_table(self.ins_tv, data, _instructor_row)
 
     def _clear_instructor_form(self):
         """Clear all instructor form input fields."""
@@ -255,6 +326,8 @@ class SchoolAppTk:
         self.reg_course_combo = ttk.Combobox(relf, textvariable=self.reg_course, state="readonly")
         self.reg_course_combo.grid(row=0,column=3, padx=4, pady=2)
         ttk.Button(relf, text="Register", command=self._register_student).grid(row=0,column=4, padx=6)
+        ttk.Button(relf, text="Register selected students",
+                   command=self._register_selected).grid(row=0,column=5, padx=6)
 
         self.assign_instructor_id = tk.StringVar()
         self.assign_course_id = tk.StringVar()
@@ -265,6 +338,8 @@ class SchoolAppTk:
         self.assign_course_combo = ttk.Combobox(relf, textvariable=self.assign_course_id, state="readonly")
         self.assign_course_combo.grid(row=1,column=3, padx=4, pady=2)
         ttk.Button(relf, text="Assign", command=self._assign_instructor).grid(row=1,column=4, padx=6)
+        ttk.Button(relf, text="Assign to selected courses",
+                   command=self._assign_selected).grid(row=1,column=5, padx=6)
 
         # Table
         self.c_tv = ttk.Treeview(tab, columns=("id","name","instructor","students"), show="headings", height=10)
@@ -279,6 +354,7 @@ class SchoolAppTk:
 
         :raises ValueError: When required fields are missing or invalid.
         """
+        from models import Course
         try:
             c = Course(
                 course_id=self.c_id.get().strip(),
@@ -298,13 +374,8 @@ class SchoolAppTk:
             messagebox.showerror("Error", str(e))
 
     def _delete_course(self):
-        """Delete the selected course from the model and refresh views."""
-        item = self._selected_item(self.c_tv)
-        if not item: return
-        cid = self.c_tv.set(item, "id")
-        self.school.delete_course(cid)
-        self._refresh_courses()
-        self._update_dropdowns()
+        """Delete the selected courses from the model and refresh views."""
+        self._delete_selected("courses")
 
     def _on_course_select(self, _ev=None):
         """Populate the course form on table selection."""
@@ -336,7 +407,76 @@ class SchoolAppTk:
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    def _register_selected(self):
+        """Register every student selected on the Students tab into the selected course."""
+        try:
+            cid = self.reg_course.get().strip()
+            sids = list(self.stu_tv.selection())
+            if not sids or not cid:
+                raise ValueError("Select students on the Students tab and a course")
+            self._bulk(self.school.register_students_in_course, sids, cid)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def _assign_selected(self):
+        """Assign the selected instructor to every course selected in the table."""
+        try:
+            iid = self.assign_instructor_id.get().strip()
+            cids = list(self.c_tv.selection())
+            if not cids or not iid:
+                raise ValueError("Select courses in the table and an instructor")
+            self._bulk(self.school.assign_instructor_to_courses, iid, cids)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+
+    def _delete_selected(self, entity):
+        """Delete every selected row of an entity's table in one model pass.
+
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        """
+        tv, _ = self._tables[entity]
+        keys = list(tv.selection())
+        if keys:
+            self._bulk(self.school.delete_many, entity, keys)
+
     # --------- Helpers ---------
+    def _bulk(self, op, *args):
+        """Run a model operation, then update only the table rows it wrote.
+
+        :param op: School method to call with ``args``.
+        """
+        changed = {}
+        def note(entity, key, obj):
+            changed[(entity, key)] = obj
+        self.school.subscribe(note)
+        try:
+            op(*args)
+        finally:
+            self.school.unsubscribe(note)
+        self._apply_changes(changed)
+
+    def _apply_changes(self, changed):
+        """Update or remove the table rows of changed entities.
+
+        :param changed: ``{(entity, key): new value or None}``.
+        :type changed: dict
+        """
+        if self._fill_jobs:
+            # rows still being inserted would come from the old objects
+            self._refresh_all_tables()
+            return
+        for (entity, key), obj in changed.items():
+            tv, values = self._tables[entity]
+            if not tv.exists(key):
+                continue
+            if obj is None:
+                tv.delete(key)
+            else:
+                tv.item(key, values=values(obj))
+        if None in changed.values():
+            self._update_dropdowns()
+
     def _selected_item(self, tv):
         """Return the selected Treeview item id or None if no selection.
 
@@ -349,31 +489,69 @@ class SchoolAppTk:
         return sel[0] if sel else None
 
     def _refresh_table(self, tv):
-        """Remove all rows from the provided Treeview widget.
+        """Remove all rows from the provided Treeview widget, cancelling any pending fill.
 
         :param tv: Treeview to clear.
         :type tv: ttk.Treeview
         """
-        for x in tv.get_children():
-            tv.delete(x)
+        job = self._fill_jobs.pop(tv, None)
+        if job is not None:
+            self.root.after_cancel(job)
+        tv.delete(*tv.get_children())
 
     def _refresh_courses(self, results=None):
-        """Reload courses table with optional filtered list.
+        """Reload courses table with optional filtered iterable.
 
-        :param results: Optional list of courses to show.
-        :type results: list[Course] | None
+        :param results: Optional iterable of courses to show.
+        :type results: Iterable[Course] | None
         """
-        self._refresh_table(self.c_tv)
-        data = results or list(self.school.courses.values())
-        for c in data:
-            self.c_tv.insert("", "end", values=(c.course_id, c.course_name, c.instructor_id or "", ",".join(c.enrolled_students)))
+        data = self.school.courses.values() if results is None else results
+        self._fill_table(self.c_tv, data, _course_row)
 
-    def _refresh_all_tables(self):
-        """Refresh all entity tables and update dropdowns."""
+    def _refresh_all_tables(self, on_done=None):
+        """Refresh all entity tables and update dropdowns.
+
+        :param on_done: Optional callback run once every table has finished filling.
+        """
         self._refresh_students()
         self._refresh_instructors()
         self._refresh_courses()
         self._update_dropdowns()
+        if on_done is not None:
+            self._when_filled(on_done)
+
+    def _fill_table(self, tv, rows, values):
+        """Replace a Treeview's rows, inserting them in chunks between UI events.
+
+        The first chunk is inserted immediately and the rest are scheduled with
+        ``after`` so the window stays responsive while large tables fill. A new
+        fill of the same table cancels the one still in progress.
+
+        :param tv: Treeview to fill.
+        :type tv: ttk.Treeview
+        :param rows: Entities to show (materialised immediately).
+        :param values: Maps an entity to its row values; the first one is used as the item ID.
+        """
+        self._refresh_table(tv)
+        rows = list(rows)
+
+        def step(start):
+            for obj in rows[start:start + FILL_CHUNK]:
+                row = values(obj)
+                tv.insert("", "end", iid=row[0], values=row)
+            if start + FILL_CHUNK < len(rows):
+                self._fill_jobs[tv] = self.root.after(1, step, start + FILL_CHUNK)
+            else:
+                self._fill_jobs.pop(tv, None)
+
+        step(0)
+
+    def _when_filled(self, callback):
+        """Run ``callback`` once no table fill is pending."""
+        if self._fill_jobs:
+            self.root.after(10, self._when_filled, callback)
+        else:
+            callback()
 
     def _update_dropdowns(self):
         """Update combobox options for students, instructors, and courses."""
@@ -392,12 +570,18 @@ class SchoolAppTk:
 
     # --------- Search ---------
     def _on_search(self):
-        """Execute a contains-based search and filter all three tables."""
+        """Execute a contains-based (or, with Fuzzy ticked, ranked) search and filter all three tables."""
         text = self.search_var.get()
-        res = self.school.search(text)
-        self._refresh_students(res["students"])
-        self._refresh_instructors(res["instructors"])
-        self._refresh_courses(res["courses"])
+        if self.fuzzy_var.get() and text.strip():
+            hits = {e: [o for _, o in self.school.fuzzy_search(text, e, limit=50)]
+                    for e in ("students", "instructors", "courses")}
+            self._refresh_students(hits["students"])
+            self._refresh_instructors(hits["instructors"])
+            self._refresh_courses(hits["courses"])
+            return
+        self._refresh_students(self.school.search_iter(text, "students"))
+        self._refresh_instructors(self.school.search_iter(text, "instructors"))
+        self._refresh_courses(self.school.search_iter(text, "courses"))
 
     def _on_clear_search(self):
         """Clear the search field and restore full results in all tables."""
@@ -407,6 +591,8 @@ class SchoolAppTk:
     # --------- File ops ---------
     def _save_json(self):
         """Prompt for a JSON path and save the current model to it."""
+        from tkinter import filedialog
+        from storage import save_json
         path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON","*.json")])
         if not path: return
         save_json(self.school, path)
@@ -414,13 +600,17 @@ class SchoolAppTk:
 
     def _load_json(self):
         """Prompt for a JSON path and load it into the model and UI."""
+        from tkinter import filedialog
+        from storage import load_json
         path = filedialog.askopenfilename(filetypes=[("JSON","*.json")])
         if not path: return
-        self.school = load_json(path)
+        self.engine.use(load_json(path))
         self._refresh_all_tables()
 
     def _export_csv(self):
         """Prompt for a folder and export CSV files for all entities."""
+        from tkinter import filedialog
+        from storage import export_csv
         folder = filedialog.askdirectory()
         if not folder: return
         export_csv(self.school, folder)
@@ -428,22 +618,95 @@ class SchoolAppTk:
 
     def _sync_to_db(self):
         """Synchronize the current model to the SQLite database."""
-        school_to_db(self.school)
+        self.engine.sync()
         messagebox.showinfo("Database", "Synchronized to SQLite database")
 
     def _load_from_db(self):
         """Load data from SQLite into the model and refresh the UI."""
-        self.school = db_to_school()
+        hit = self.engine.load()
         self._refresh_all_tables()
-        messagebox.showinfo("Database", "Loaded from SQLite database")
+        messagebox.showinfo("Database", "Loaded from SQLite database" + (" (startup cache)" if hit else ""))
 
     def _backup_db(self):
         """Prompt for a folder and back up the database file into it."""
+        from tkinter import filedialog
+        from storage import backup_db
         folder = filedialog.askdirectory()
         if not folder: return
         path = backup_db(folder)
         messagebox.showinfo("Backup", f"Database backed up to {path}")
 
+    # --------- Diagnostics ---------
+    def _show_diagnostics(self):
+        """Open a window showing the collected instrumentation metrics."""
+        win = tk.Toplevel(self.root)
+        win.title("Diagnostics")
+        text = tk.Text(win, wrap="none", width=110, height=24, font="TkFixedFont")
+        text.pack(expand=True, fill="both")
+
+        def summary():
+            cache = self.school._cache if self.school is not None else None
+            return metrics.summary() + ("\nSearch cache: " + cache.summary() + "\n" if cache else "")
+
+        def show(content):
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", content)
+            text.configure(state="disabled")
+
+        def toggle():
+            if metrics.is_enabled():
+                metrics.disable()
+            else:
+                metrics.enable()
+            toggle_btn.configure(text="Disable" if metrics.is_enabled() else "Enable")
+            show(summary())
+
+        def save():
+            from tkinter import filedialog
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".json", filetypes=[("JSON","*.json")])
+            if path:
+                metrics.dump(path)
+
+        btns = ttk.Frame(win, padding=6)
+        btns.pack(fill="x")
+        toggle_btn = ttk.Button(btns, text="Disable" if metrics.is_enabled() else "Enable", command=toggle)
+        toggle_btn.pack(side="left")
+        ttk.Button(btns, text="Summary", command=lambda: show(summary())).pack(side="left", padx=4)
+        ttk.Button(btns, text="Prometheus", command=lambda: show(metrics.to_prometheus())).pack(side="left")
+        ttk.Button(btns, text="Reset", command=lambda: (metrics.reset(), show(summary()))).pack(side="left", padx=4)
+        ttk.Button(btns, text="Save JSON", command=save).pack(side="left")
+        show(summary())
+
+    # --------- Statistics ---------
+    def _show_statistics(self):
+        """Open a window with enrollment, instructor load and age statistics.
+
+        The model's figures are kept current by ``Engine.aggregates``, so
+        refreshing only re-renders them; **From database** recomputes them
+        with grouped SQL over the last synced data instead.
+        """
+        if self.engine is None:
+            return
+        import aggregates
+        win = tk.Toplevel(self.root)
+        win.title("Statistics")
+        text = tk.Text(win, wrap="none", width=90, height=30, font="TkFixedFont")
+        text.pack(expand=True, fill="both")
+
+        def show(snap):
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", aggregates.format_report(snap))
+            text.configure(state="disabled")
+
+        btns = ttk.Frame(win, padding=6)
+        btns.pack(fill="x")
+        ttk.Button(btns, text="Refresh", command=lambda: show(self.engine.aggregates.snapshot())).pack(side="left")
+        ttk.Button(btns, text="From database",
+                   command=lambda: show(aggregates.db_snapshot(self.engine.path))).pack(side="left", padx=4)
+        show(self.engine.aggregates.snapshot())
+
 def main():
     """Entry point to launch the Tkinter app."""
     root = tk.Tk()
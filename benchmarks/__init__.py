@@ -0,0 +1,14 @@
+"""Benchmarks for the School Management System hot paths.
+
+``generator`` builds deterministic synthetic schools, ``run`` times the
+model, storage and UI-core operations and writes machine-readable JSON, and
+``compare`` diffs two result files to flag regressions between commits.
+``model`` times the School API alone and can run against any checkout;
+``results/`` keeps its 100k-student runs for the baseline tree and for
+the persistent collections before and after they became lazy.
+
+Run from the repository root::
+
+    python -m benchmarks.run --sizes 1k 100k --out bench.json
+    python -m benchmarks.compare old.json bench.json
+"""
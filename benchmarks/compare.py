@@ -0,0 +1,43 @@
+"""Compare two benchmark JSON files and flag regressions.
+
+Usage::
+
+    python -m benchmarks.compare base.json head.json --threshold 0.10
+
+Exits with status 1 when any benchmark's median slowed down by more than
+the threshold, so it can gate a CI job.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+
+def _medians(path: str) -> dict:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {(r["size"], r["benchmark"]): r["median"] for r in data["results"] if "median" in r}
+
+def main(argv=None) -> int:
+    """Command-line entry point; returns the process exit code."""
+    ap = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    ap.add_argument("base")
+    ap.add_argument("head")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown ratio (0.10 = 10%%)")
+    args = ap.parse_args(argv)
+
+    base, head = _medians(args.base), _medians(args.head)
+    regressed = False
+    print(f"{'size':<8}{'benchmark':<30}{'base ms':>12}{'head ms':>12}{'change':>9}")
+    for key in sorted(base.keys() & head.keys()):
+        b, h = base[key], head[key]
+        change = (h - b) / b if b else 0.0
+        flag = ""
+        if change > args.threshold:
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"{key[0]:<8}{key[1]:<30}{b * 1000:>12.3f}{h * 1000:>12.3f}{change:>+9.1%}{flag}")
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
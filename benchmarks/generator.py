@@ -0,0 +1,85 @@
+"""Deterministic synthetic school generator for benchmarks.
+
+The same arguments always produce the same School, so timings taken on
+different commits measure the code rather than the data.
+"""
+
+from __future__ import annotations
+import random
+from itertools import accumulate
+from typing import Optional, Tuple
+from models import School, Student, Instructor, Course
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+ENROLLMENTS = ("uniform", "zipf", "none")
+
+_FIRST = ("Ana", "Ben", "Chloe", "Dani", "Elie", "Farah", "Georges", "Hala", "Issa", "Jana",
+          "Karim", "Lara", "Maya", "Nadim", "Omar", "Rita", "Sami", "Tala", "Youssef", "Zeina")
+_LAST = ("Haddad", "Khoury", "Saleh", "Nasser", "Aoun", "Kanso", "Hassani", "Rahme", "Daher", "Frem")
+_DOMAINS = ("mail.aub.edu", "aub.edu.lb", "gmail.com", "outlook.com", "school.org")
+
+def parse_size(text: str) -> int:
+    """Turn ``"1k"``/``"100k"``/``"1M"`` or a plain integer into a student count."""
+    return SIZES[text] if text in SIZES else int(text)
+
+def make_school(n_students: int, n_courses: Optional[int] = None, n_instructors: Optional[int] = None,
+                enrollment: str = "uniform", courses_per_student: Tuple[int, int] = (2, 6),
+                zipf_s: float = 1.1, seed: int = 0) -> School:
+    """Build a synthetic School.
+
+    :param n_students: Number of students.
+    :type n_students: int
+    :param n_courses: Number of courses; defaults to one per 50 students (at least 10).
+    :type n_courses: int | None
+    :param n_instructors: Number of instructors; defaults to a third of the courses (at least 5).
+    :type n_instructors: int | None
+    :param enrollment: ``"uniform"`` (every course equally likely), ``"zipf"`` (a few
+        very popular courses) or ``"none"`` (no registrations).
+    :type enrollment: str
+    :param courses_per_student: Inclusive range for how many courses each student takes.
+    :type courses_per_student: tuple[int, int]
+    :param zipf_s: Skew exponent for the ``"zipf"`` distribution.
+    :type zipf_s: float
+    :param seed: Random seed.
+    :type seed: int
+    :raises ValueError: If ``enrollment`` is unknown.
+    :return: Populated School with both sides of every relationship filled in.
+    :rtype: School
+    """
+    if enrollment not in ENROLLMENTS:
+        raise ValueError(f"Unknown enrollment distribution: {enrollment}")
+    rnd = random.Random(seed)
+    n_courses = n_courses if n_courses is not None else max(10, n_students // 50)
+    n_instructors = n_instructors if n_instructors is not None else max(5, n_courses // 3)
+
+    instructors = [Instructor(name=f"{rnd.choice(_FIRST)} {rnd.choice(_LAST)}", age=rnd.randint(28, 70),
+                              _email=f"i{i}@{rnd.choice(_DOMAINS)}", instructor_id=f"I{i:06d}")
+                   for i in range(n_instructors)]
+    courses = []
+    for c in range(n_courses):
+        ins = instructors[rnd.randrange(n_instructors)] if n_instructors else None
+        course = Course(course_id=f"C{c:05d}", course_name=f"Course {c}",
+                        instructor_id=ins.instructor_id if ins else None)
+        if ins:
+            ins.assigned_courses.append(course.course_id)
+        courses.append(course)
+    students = [Student(name=f"{rnd.choice(_FIRST)} {rnd.choice(_LAST)}", age=rnd.randint(16, 35),
+                        _email=f"s{i}@{rnd.choice(_DOMAINS)}", student_id=f"S{i:07d}")
+                for i in range(n_students)]
+
+    if enrollment != "none" and courses:
+        weights = [1.0] * n_courses if enrollment == "uniform" else [1.0 / (r + 1) ** zipf_s for r in range(n_courses)]
+        cum = list(accumulate(weights))
+        lo, hi = courses_per_student
+        for s in students:
+            k = min(rnd.randint(lo, hi), n_courses)
+            picked = dict.fromkeys(rnd.choices(range(n_courses), cum_weights=cum, k=k))
+            for c in picked:
+                s.registered_courses.append(courses[c].course_id)
+                courses[c].enrolled_students.append(s.student_id)
+
+    sc = School()
+    sc.students = {s.student_id: s for s in students}
+    sc.instructors = {i.instructor_id: i for i in instructors}
+    sc.courses = {c.course_id: c for c in courses}
+    return sc
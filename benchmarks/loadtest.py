@@ -0,0 +1,156 @@
+"""Load-test the JSON API server and report requests/sec and latency percentiles.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:8080 --concurrency 32 --duration 10
+    python -m benchmarks.loadtest --spawn 1k --workers 4       # start an in-process server on a generated school
+
+Each client keeps one HTTP/1.1 keep-alive connection open and cycles
+through a mix of listing, search, single-entity and roster GETs (plus a
+share of conditional GETs to exercise ETags). Results are printed as JSON.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+async def _request(reader, writer, host: str, path: str, etag: Optional[str]) -> Tuple[int, Optional[str]]:
+    head = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+    if etag:
+        head += f"If-None-Match: {etag}\r\n"
+    writer.write((head + "\r\n").encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, new_etag = 0, None
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        k, _, v = line.decode("latin-1").partition(":")
+        k = k.strip().lower()
+        if k == "content-length":
+            length = int(v)
+        elif k == "etag":
+            new_etag = v.strip()
+    if length:
+        await reader.readexactly(length)
+    return status, new_etag
+
+async def _client(host: str, port: int, paths: List[str], deadline: float, conditional: float,
+                  seed: int, latencies: List[float], statuses: dict):
+    rnd = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    etags: dict = {}
+    try:
+        while time.perf_counter() < deadline:
+            path = rnd.choice(paths)
+            etag = etags.get(path) if rnd.random() < conditional else None
+            t0 = time.perf_counter()
+            status, new_etag = await _request(reader, writer, host, path, etag)
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+            if new_etag:
+                etags[path] = new_etag
+    finally:
+        writer.close()
+
+def _paths(ids: dict) -> List[str]:
+    paths = ["/health", "/students?limit=50", "/courses?limit=20", "/search?q=an&limit=10",
+             "/students?q=ha&offset=50&limit=25"]
+    paths += [f"/students/{sid}" for sid in ids.get("students", [])]
+    paths += [f"/courses/{cid}/students?limit=50" for cid in ids.get("courses", [])]
+    return paths
+
+async def run(url: str, concurrency: int, duration: float, conditional: float, ids: dict) -> dict:
+    """Drive the server at ``url`` and return the measured statistics.
+
+    :param url: Server base URL.
+    :param concurrency: Number of concurrent keep-alive connections.
+    :param duration: Seconds to run.
+    :param conditional: Fraction of requests sent with ``If-None-Match``.
+    :param ids: Sample ``{"students": [...], "courses": [...]}`` IDs for entity routes.
+    :rtype: dict
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    latencies: List[float] = []
+    statuses: dict = {}
+    paths = _paths(ids)
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    await asyncio.gather(*(_client(host, port, paths, deadline, conditional, i, latencies, statuses)
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "concurrency": concurrency,
+    }
+
+async def _spawned(size: str, workers: int, args) -> dict:
+    from benchmarks.generator import make_school, parse_size
+    from server import SchoolServer
+    school = make_school(parse_size(size), seed=args.seed)
+    rnd = random.Random(args.seed)
+    ids = {"students": rnd.sample(list(school.students), min(200, len(school.students))),
+           "courses": rnd.sample(list(school.courses), min(20, len(school.courses)))}
+    server = SchoolServer(school, workers=workers)
+    port = await server.start("127.0.0.1", 0)
+    try:
+        result = await run(f"http://127.0.0.1:{port}", args.concurrency, args.duration, args.conditional, ids)
+    finally:
+        server.close()
+    result.update(size=size, workers=workers)
+    return result
+
+def main(argv=None) -> int:
+    """Command-line entry point; returns the process exit code."""
+    ap = argparse.ArgumentParser(description="Load-test the school JSON API.")
+    ap.add_argument("--url", help="server to test, e.g. http://127.0.0.1:8080")
+    ap.add_argument("--spawn", metavar="SIZE", help="start an in-process server on a generated school instead")
+    ap.add_argument("--workers", type=int, default=4, help="worker threads for --spawn")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=5.0)
+    ap.add_argument("--conditional", type=float, default=0.3, help="share of requests sent with If-None-Match")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+    if bool(args.url) == bool(args.spawn):
+        ap.error("give exactly one of --url or --spawn")
+
+    if args.spawn:
+        result = asyncio.run(_spawned(args.spawn, args.workers, args))
+    else:
+        result = asyncio.run(run(args.url, args.concurrency, args.duration, args.conditional, {}))
+    print(f"{result['requests_per_sec']:.0f} req/s, p50 {result['p50_ms']:.2f} ms, "
+          f"p99 {result['p99_ms']:.2f} ms", file=sys.stderr)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        from pathlib import Path
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Time the in-memory School model through its public API only.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.model --sizes 100k --out head.json
+    python -m benchmarks.model --sizes 100k --tree ../baseline --out base.json
+    python -m benchmarks.compare base.json head.json
+
+Unlike :mod:`benchmarks.run` this needs nothing but ``models.School`` and
+its CRUD and search methods, so ``--tree`` can point it at any checkout,
+including ones from before snapshots, indexes or the generator existed.
+Benchmarks a tree does not support are recorded as skipped. Results use
+the :mod:`benchmarks.run` JSON format.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+# benchmarks.run and benchmarks.generator import models at load time, which
+# would pin them to this checkout before --tree is applied
+def _timed(fn: Callable, repeat: int, ops: int = 1) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) / ops)
+    return times
+
+def _record(results: list, size: str, n: int, name: str, times=None, **extra):
+    row = {"benchmark": name, "size": size, "n_students": n}
+    if times is not None:
+        row.update(times=times, min=min(times), median=statistics.median(times))
+    row.update(extra)
+    results.append(row)
+    shown = f"{row['median'] * 1000:10.3f} ms" if times is not None else "   skipped"
+    print(f"  {name:<36}{shown}", file=sys.stderr)
+
+def _parse_size(text: str) -> int:
+    units = {"k": 1_000, "m": 1_000_000}
+    text = text.strip().lower()
+    return int(float(text[:-1]) * units[text[-1]]) if text[-1] in units else int(text)
+
+def run_size(size: str, repeat: int, seed: int) -> list:
+    """Build a School through its API, then time searches, snapshots and writes.
+
+    :param size: Number of students, e.g. ``"100k"``.
+    :param repeat: Timings taken per benchmark.
+    :param seed: Random seed for names and enrollment.
+    :return: Result rows.
+    :rtype: list[dict]
+    """
+    from models import Course, Instructor, School, Student
+    n = _parse_size(size)
+    rnd = random.Random(seed)
+    n_courses = max(10, n // 50)
+    n_instructors = max(5, n_courses // 3)
+    results: list = []
+    print(f"[{size}] {n} students (model API)", file=sys.stderr)
+
+    def build() -> School:
+        sc = School()
+        for i in range(n_instructors):
+            sc.add_instructor(Instructor(name=f"Instructor {i}", age=40, _email=f"i{i}@bench.org",
+                                         instructor_id=f"I{i:06d}"))
+        for c in range(n_courses):
+            sc.add_course(Course(course_id=f"C{c:05d}", course_name=f"Course {c}"))
+            sc.assign_instructor_to_course(f"I{c % n_instructors:06d}", f"C{c:05d}")
+        for i in range(n):
+            sc.add_student(Student(name=f"Student {i}", age=20, _email=f"s{i}@bench.org", student_id=f"S{i:07d}"))
+        return sc
+
+    schools = []
+    _record(results, size, n, "model.build", _timed(lambda: schools.append(build()), repeat))
+    school = schools[-1]
+    del schools[:]
+    picks = [(f"S{i:07d}", f"C{c:05d}") for i in range(n) for c in rnd.sample(range(n_courses), 3)]
+    def register():
+        for sid, cid in picks:
+            school.register_student_in_course(sid, cid)
+    _record(results, size, n, "model.register", _timed(register, 1, len(picks)))
+    for label, text in (("all", ""), ("miss", "zzzz")):
+        _record(results, size, n, f"model.search[{label}]", _timed(lambda: school.search(text), repeat))
+
+    ids = list(school.students)
+    def update_batch():
+        for sid in rnd.sample(ids, 1000):
+            school.update_student(sid, age=21)
+    _record(results, size, n, "model.update_student", _timed(update_batch, repeat, 1000))
+    if not hasattr(school, "snapshot"):
+        for name in ("model.snapshot[first]", "model.snapshot[next]", "model.update_student[snapshotted]"):
+            _record(results, size, n, name, skipped="School.snapshot() not available")
+        return results
+    _record(results, size, n, "model.snapshot[first]", [_timed(school.snapshot, 1)[0]])
+    _record(results, size, n, "model.snapshot[next]", _timed(school.snapshot, repeat))
+    _record(results, size, n, "model.update_student[snapshotted]", _timed(update_batch, repeat, 1000))
+    return results
+
+def _git_commit(tree: Path):
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=tree)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None) -> int:
+    """Command-line entry point; returns the process exit code."""
+    ap = argparse.ArgumentParser(description="Benchmark the School model through its public API.")
+    ap.add_argument("--sizes", nargs="+", default=["100k"], help="student counts, e.g. 10k 100k")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--tree", help="import models from this checkout instead of the current one")
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+    tree = Path(args.tree).resolve() if args.tree else Path(__file__).resolve().parent.parent
+    sys.path.insert(0, str(tree))
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size, args.repeat, args.seed))
+    report = {
+        "meta": {
+            "commit": _git_commit(tree),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
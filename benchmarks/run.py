@@ -0,0 +1,171 @@
+"""Time the School Management System hot paths and emit JSON results.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.run --sizes 1k 100k 1M --enrollment zipf --out bench.json
+
+Every benchmark reports all repeat timings plus min/median in seconds;
+mutating benchmarks report per-operation times. The PyQt reload benchmark
+is recorded as skipped when PyQt5 is not installed.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+import storage
+from models import School, Student
+from benchmarks.generator import ENROLLMENTS, make_school, parse_size
+
+def _timed(fn: Callable, repeat: int, ops: int = 1) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) / ops)
+    return times
+
+def _record(results: list, size: str, n: int, name: str, times: Optional[List[float]] = None, **extra):
+    row = {"benchmark": name, "size": size, "n_students": n}
+    if times is not None:
+        row.update(times=times, min=min(times), median=statistics.median(times))
+    row.update(extra)
+    results.append(row)
+    shown = f"{row['median'] * 1000:10.3f} ms" if times is not None else "   skipped"
+    print(f"  {name:<28}{shown}", file=sys.stderr)
+
+def run_size(size: str, enrollment: str, repeat: int, seed: int, workdir: Path) -> list:
+    """Run every benchmark against one generated school.
+
+    :param size: Size label or integer string (see :func:`parse_size`).
+    :param enrollment: Enrollment distribution passed to the generator.
+    :param repeat: Timings taken per benchmark.
+    :param seed: Generator seed.
+    :param workdir: Scratch directory for JSON, CSV and database files.
+    :return: Result rows.
+    :rtype: list[dict]
+    """
+    n = parse_size(size)
+    results: list = []
+    rnd = random.Random(seed)
+    print(f"[{size}] {n} students, enrollment={enrollment}", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    school = make_school(n, enrollment=enrollment, seed=seed)
+    _record(results, size, n, "generate", [time.perf_counter() - t0],
+            n_courses=len(school.courses), n_instructors=len(school.instructors),
+            n_registrations=sum(len(c.enrolled_students) for c in school.courses.values()))
+
+    # ---------- read paths ----------
+    some_id = next(iter(school.students))
+    for label, text in (("all", ""), ("common", "an"), ("id", some_id), ("miss", "zzzz")):
+        _record(results, size, n, f"search[{label}]", _timed(lambda: school.search(text), repeat))
+
+    t0 = time.perf_counter()
+    school.fuzzy_search("x", "students")
+    _record(results, size, n, "fuzzy_index", [time.perf_counter() - t0])
+    name = school.students[some_id].name
+    typo = name[0] + name[2] + name[1] + name[3:]  # adjacent swap, e.g. "Jonh"
+    _record(results, size, n, "fuzzy_search[typo]", _timed(lambda: school.fuzzy_search(typo, "students"), repeat))
+    for f in School._SEARCH_FIELDS["students"]:
+        school.drop_index("students", f"{f}:trigram")  # keep the mutation timings index-free
+
+    # ---------- persistence ----------
+    json_path = workdir / f"school-{size}.json"
+    _record(results, size, n, "save_json", _timed(lambda: storage.save_json(school, json_path), repeat),
+            bytes=json_path.stat().st_size)
+    _record(results, size, n, "load_json", _timed(lambda: storage.load_json(json_path), repeat))
+    _record(results, size, n, "export_csv", _timed(lambda: storage.export_csv(school, workdir / f"csv-{size}"), repeat))
+
+    storage.DB_PATH = workdir / f"school-{size}.db"
+    _record(results, size, n, "school_to_db", _timed(lambda: storage.school_to_db(school), repeat),
+            bytes=storage.DB_PATH.stat().st_size)
+    _record(results, size, n, "db_to_school", _timed(storage.db_to_school, repeat))
+    _record(results, size, n, "export_db_csv",
+            _timed(lambda: storage.export_db_csv(workdir / f"dbcsv-{size}"), repeat))
+    try:
+        import pyqt_core
+    except ImportError as e:
+        _record(results, size, n, "pyqt_core.reload_from_db", skipped=str(e))
+    else:
+        pyqt_core.init_db(str(storage.DB_PATH))
+        _record(results, size, n, "pyqt_core.reload_from_db", _timed(pyqt_core.reload_from_db, repeat))
+        pyqt_core.engine.close()
+
+    # ---------- mutations (per operation) ----------
+    batch = 100
+    counter = iter(range(10**9))
+    def add_batch():
+        for _ in range(batch):
+            i = next(counter)
+            school.add_student(Student(name="Bench Student", age=20, _email=f"b{i}@bench.org", student_id=f"B{i}"))
+    _record(results, size, n, "add_student", _timed(add_batch, repeat, batch))
+
+    for entity, method, k in (("students", school.delete_student, 10),
+                              ("courses", school.delete_course, 2),
+                              ("instructors", school.delete_instructor, 2)):
+        keys = list(getattr(school, entity))
+        victims = iter(rnd.sample(keys, min(len(keys), k * repeat)))
+        def delete_some():
+            for _ in range(k):
+                key = next(victims, None)
+                if key is not None:
+                    method(key)
+        _record(results, size, n, f"{method.__name__}", _timed(delete_some, repeat, k))
+    return results
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                             cwd=Path(__file__).resolve().parent)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None) -> int:
+    """Command-line entry point; returns the process exit code."""
+    ap = argparse.ArgumentParser(description="Benchmark School Management System hot paths.")
+    ap.add_argument("--sizes", nargs="+", default=["1k", "100k"], help="1k, 100k, 1M or integers")
+    ap.add_argument("--enrollment", choices=ENROLLMENTS, default="uniform")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+
+    original_db = storage.DB_PATH
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="school-bench-") as tmp:
+            for size in args.sizes:
+                results.extend(run_size(size, args.enrollment, args.repeat, args.seed, Path(tmp)))
+    finally:
+        storage.DB_PATH = original_db
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "enrollment": args.enrollment,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
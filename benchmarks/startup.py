@@ -0,0 +1,144 @@
+"""Profile import time and window startup of the applications.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.startup                       # import profile of every entry module
+    python -m benchmarks.startup --repeat 9 --top 15 --out startup.json
+    python -m benchmarks.startup --gui --db big.db     # also time first paint / data / rows
+
+Each import is measured in a fresh interpreter with ``python -X importtime``;
+the fastest of ``--repeat`` runs is kept. ``--gui`` starts the Tkinter and
+PyQt5 windows in a subprocess and records the startup stages they report
+("First paint", "Data loaded", "Rows painted"); a toolkit that is not
+installed or has no display is reported as skipped. Results are printed as
+JSON.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ("app_tkinter", "pyqt_core", "engine", "storage", "models", "cli", "server")
+
+# Runs in a subprocess; prints the window's startup_times as JSON and exits.
+_TK_PROBE = """
+import json, sys, app_tkinter, tkinter
+if {db!r}:
+    import storage
+    storage.DB_PATH = storage.Path({db!r})
+root = tkinter.Tk()
+app = app_tkinter.SchoolAppTk(root)
+def poll():
+    if "Rows painted" in app.startup_times:
+        print(json.dumps(app.startup_times))
+        root.destroy()
+    else:
+        root.after(5, poll)
+root.after(5, poll)
+root.mainloop()
+"""
+
+_QT_PROBE = """
+import time
+startedAt = time.perf_counter()
+import json, sys
+from PyQt5 import QtWidgets, QtCore
+import pyqt_core
+if {db!r}:
+    pyqt_core.dbPath = {db!r}
+app = QtWidgets.QApplication(sys.argv)
+win = pyqt_core.MainWindow(startedAt)
+win.show()
+def poll():
+    if "Rows painted" in win.startupTimes:
+        print(json.dumps(win.startupTimes))
+        app.quit()
+    else:
+        QtCore.QTimer.singleShot(5, poll)
+QtCore.QTimer.singleShot(5, poll)
+app.exec_()
+"""
+
+def parse_importtime(stderr: str) -> List[tuple]:
+    """Parse ``-X importtime`` output into ``(module, self_us, cumulative_us)`` rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+def import_profile(module: str, repeat: int = 5, top: int = 10) -> dict:
+    """Measure ``import module`` in fresh interpreters and keep the fastest run.
+
+    :returns: ``{"module", "total_ms", "modules", "top"}`` where ``top`` lists
+        the modules with the largest self time, or ``{"module", "error"}``.
+    :rtype: dict
+    """
+    best: Optional[List[tuple]] = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1]}
+        rows = parse_importtime(proc.stderr)
+        if best is None or sum(r[1] for r in rows) < sum(r[1] for r in best):
+            best = rows
+    heaviest = sorted(best, key=lambda r: r[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": sum(r[1] for r in best) / 1000,
+        "modules": len(best),
+        "top": [{"name": n, "self_ms": s / 1000, "cumulative_ms": c / 1000} for n, s, c in heaviest],
+    }
+
+def gui_startup(probe: str, db: Optional[str], repeat: int = 3) -> dict:
+    """Run a GUI probe script and return the fastest reported startup stages in ms."""
+    best: Optional[Dict[str, float]] = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", probe.format(db=db or "")],
+                              cwd=ROOT, capture_output=True, text=True, timeout=600)
+        if proc.returncode != 0:
+            return {"skipped": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        times = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or times.get("Rows painted", 0) < best.get("Rows painted", 0):
+            best = times
+    return best
+
+def main(argv=None) -> int:
+    """Command-line entry point; returns the process exit code."""
+    ap = argparse.ArgumentParser(description="Profile import time and GUI startup.")
+    ap.add_argument("--modules", nargs="+", default=list(MODULES), help="modules to import-profile")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="heaviest modules to list per import")
+    ap.add_argument("--gui", action="store_true", help="also time the Tkinter and PyQt5 windows")
+    ap.add_argument("--db", help="database for --gui (default: school.db)")
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+
+    result = {"python": sys.version.split()[0], "imports": []}
+    for m in args.modules:
+        r = import_profile(m, args.repeat, args.top)
+        result["imports"].append(r)
+        print(f"{m:<12} " + (f"{r['total_ms']:8.1f} ms  ({r['modules']} modules)" if "total_ms" in r
+                             else f"error: {r['error']}"), file=sys.stderr)
+    if args.gui:
+        result["startup"] = {"tkinter": gui_startup(_TK_PROBE, args.db, args.repeat),
+                             "pyqt5": gui_startup(_QT_PROBE, args.db, args.repeat)}
+        for toolkit, times in result["startup"].items():
+            print(f"{toolkit:<12} {times}", file=sys.stderr)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Bounded result cache for search and roster queries.
+
+Entries are keyed by normalised query text and remember which entities
+they depend on, so a mutation only evicts the results it can actually
+change:
+
+* every entity ID that appears in (or was read to build) a result, and
+* optionally, per entity type, a predicate that tells whether a new or
+  modified entity would now match the query.
+
+:class:`models.School` feeds every ``_put``/``_drop`` into
+:meth:`QueryCache.invalidate` once :meth:`models.School.enable_cache` has
+been called.
+"""
+
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+def normalize(text: str) -> str:
+    """Normalise query text the way the searches compare it: lower-cased and trimmed."""
+    return (text or "").lower().strip()
+
+class _Entry:
+    __slots__ = ("value", "ids", "watch", "expires")
+
+    def __init__(self, value, ids, watch, expires):
+        self.value = value
+        self.ids = ids
+        self.watch = watch
+        self.expires = expires
+
+class QueryCache:
+    """Thread-safe LRU cache with optional TTL and dependency-based invalidation.
+
+    :param maxsize: Maximum number of cached results.
+    :type maxsize: int
+    :param ttl: Seconds an entry stays valid, or None to keep it until invalidated or evicted.
+    :type ttl: float | None
+    """
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # (entity, id) -> cache keys whose result contains or read that entity
+        self._by_id: Dict[Tuple[str, str], Set[Hashable]] = {}
+        # entity -> cache keys whose result may change when any such entity changes
+        self._by_entity: Dict[str, Set[Hashable]] = {}
+        self.hits = self.misses = self.evictions = self.invalidations = self.expirations = 0
+        # bumped on every invalidate/clear so racing computations are not stored
+        self._writes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Tuple[bool, object]:
+        """Return ``(True, value)`` on a hit or ``(False, None)`` on a miss."""
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e.expires is not None and e.expires <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                e = None
+            if e is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, e.value
+
+    def put(self, key: Hashable, value, ids: Iterable[Tuple[str, str]] = (),
+            watch: Optional[Dict[str, Optional[Callable[[object], bool]]]] = None):
+        """Store a result with its dependencies.
+
+        :param key: Cache key (include the normalised query text).
+        :param value: Result to cache; treated as immutable by callers.
+        :param ids: ``(entity, id)`` pairs whose change invalidates the entry.
+        :param watch: ``{entity: predicate}``; a written entity of that type
+            invalidates the entry if the predicate accepts it (None accepts all).
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires = self._clock() + self.ttl if self.ttl is not None else None
+            e = _Entry(value, frozenset(ids), watch or {}, expires)
+            self._entries[key] = e
+            for dep in e.ids:
+                self._by_id.setdefault(dep, set()).add(key)
+            for entity in e.watch:
+                self._by_entity.setdefault(entity, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object],
+                       deps: Callable[[object], Tuple[Iterable, Optional[dict]]]):
+        """Return the cached value or compute, cache and return it.
+
+        :param compute: Builds the value on a miss.
+        :param deps: Maps the computed value to ``(ids, watch)`` as for :meth:`put`.
+        """
+        hit, value = self.get(key)
+        if hit:
+            return value
+        writes = self._writes
+        value = compute()
+        ids, watch = deps(value)
+        if writes == self._writes:
+            self.put(key, value, ids, watch)
+        return value
+
+    def invalidate(self, entity: str, key: str, obj=None):
+        """Drop entries affected by a write to ``entity``/``key``.
+
+        :param obj: The entity's new value, or None when it was deleted.
+        """
+        with self._lock:
+            self._writes += 1
+            doomed = set(self._by_id.get((entity, key), ()))
+            if obj is not None:
+                for ck in self._by_entity.get(entity, ()):
+                    if ck not in doomed:
+                        pred = self._entries[ck].watch[entity]
+                        if pred is None or pred(obj):
+                            doomed.add(ck)
+            for ck in doomed:
+                self._remove(ck)
+            self.invalidations += len(doomed)
+
+    def clear(self):
+        """Drop every entry (statistics are kept)."""
+        with self._lock:
+            self._writes += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_id.clear()
+            self._by_entity.clear()
+
+    def _remove(self, ck: Hashable):
+        e = self._entries.pop(ck)
+        for dep in e.ids:
+            keys = self._by_id.get(dep)
+            if keys is not None:
+                keys.discard(ck)
+                if not keys:
+                    del self._by_id[dep]
+        for entity in e.watch:
+            keys = self._by_entity.get(entity)
+            if keys is not None:
+                keys.discard(ck)
+                if not keys:
+                    del self._by_entity[entity]
+
+    def summary(self) -> str:
+        """Return the statistics as one line for diagnostics views."""
+        st = self.stats()
+        return (f"hits {st['hits']}  misses {st['misses']}  hit rate {st['hit_rate']:.0%}  "
+                f"size {st['size']}/{st['maxsize']}  evictions {st['evictions']}  "
+                f"invalidations {st['invalidations']}  expirations {st['expirations']}")
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size.
+
+        :rtype: dict
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                    "evictions": self.evictions, "invalidations": self.invalidations,
+                    "expirations": self.expirations}
@@ -0,0 +1,310 @@
+"""Headless command-line interface for the School Management System.
+
+Runs bulk operations without a display, for cron jobs and pipelines::
+
+    python cli.py --db school.db import data.json
+    python cli.py sync data.json
+    python cli.py export out/ --format csv
+    python cli.py backup backups/
+    python cli.py rename students id_map.csv
+    python cli.py verify --repair
+    python cli.py stats --json
+    python cli.py stats --detail
+    python cli.py overlap --top 20 --schedule slots.csv
+    python cli.py rosters reports/ --format text --workers 8
+    python cli.py diff campus_a.json                # database -> campus_a.json
+    python cli.py merge last_sync.json campus_a.json --prefer theirs
+
+Only argparse is imported up front; each command imports the modules it
+needs. Progress is written to stderr (suppress with ``-q``).
+
+Exit codes: 0 success, 1 runtime error, 2 usage error, 3 invalid input
+data or failed verification.
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+
+EXIT_OK, EXIT_ERROR, EXIT_USAGE, EXIT_INVALID = 0, 1, 2, 3
+
+class _Progress:
+    """``progress(stage, done, total)`` callback that draws on stderr."""
+    def __init__(self, quiet: bool):
+        self.quiet = quiet
+        self.tty = sys.stderr.isatty()
+
+    def __call__(self, stage: str, done: int, total: int):
+        if self.quiet:
+            return
+        line = f"{stage}: {done}/{total}"
+        if self.tty:
+            sys.stderr.write("\r\033[K" + line + ("\n" if done == total else ""))
+        else:
+            sys.stderr.write(line + "\n")
+        sys.stderr.flush()
+
+def _log(args, msg: str):
+    if not args.quiet:
+        print(msg, file=sys.stderr)
+
+def _load_source(path: str, fmt: str):
+    """Read a School from a JSON file or a CSV export folder."""
+    from pathlib import Path
+    import storage
+    p = Path(path)
+    if fmt == "auto":
+        fmt = "csv" if p.is_dir() else "json"
+    return storage.load_csv(p) if fmt == "csv" else storage.load_json(p)
+
+# ---------------------- Commands ----------------------
+def cmd_import(args) -> int:
+    import storage
+    school = _load_source(args.source, args.format)
+    problems = school.verify(repair=args.repair)
+    if problems and not args.repair:
+        for p in problems:
+            print(p)
+        _log(args, f"{len(problems)} inconsistent link(s) in {args.source}; nothing imported (use --repair)")
+        return EXIT_INVALID
+    if problems:
+        _log(args, f"Repaired {len(problems)} inconsistent link(s) in {args.source}")
+    storage.school_to_db(school, prune=args.prune, progress=_Progress(args.quiet))
+    _log(args, f"Imported {len(school.students)} students, {len(school.instructors)} instructors, "
+               f"{len(school.courses)} courses into {storage.DB_PATH}")
+    return EXIT_OK
+
+def cmd_sync(args) -> int:
+    args.prune = True
+    return cmd_import(args)
+
+def cmd_export(args) -> int:
+    import storage
+    progress = _Progress(args.quiet)
+    if args.format == "csv":
+        # streamed from SQLite; the object graph is never built
+        storage.export_db_csv(args.dest, workers=args.workers, progress=progress)
+    else:
+        storage.save_json(storage.db_to_school(progress=progress), args.dest)
+    _log(args, f"Exported {storage.DB_PATH} to {args.dest}")
+    return EXIT_OK
+
+def cmd_rename(args) -> int:
+    import csv
+    import sqlite3
+    import storage
+    with open(args.mapping, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))[1:]
+    mapping = {r[0].strip(): r[1].strip() for r in rows if r}
+    storage.init_db()
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        with conn:
+            n = storage.rename_ids(conn, args.entity, mapping)
+    finally:
+        conn.close()
+    _log(args, f"Renamed {n} of {len(mapping)} {args.entity} in {storage.DB_PATH}")
+    return EXIT_OK
+
+def cmd_backup(args) -> int:
+    import storage
+    dest = storage.backup_db(args.dest)
+    print(dest)
+    return EXIT_OK
+
+def cmd_verify(args) -> int:
+    import storage
+    if args.snapshot and args.repair:
+        print("error: --repair cannot be used with --snapshot", file=sys.stderr)
+        return EXIT_USAGE
+    if args.snapshot:
+        target = args.snapshot
+        problems = _load_source(args.snapshot, "auto").verify()
+    else:
+        target = storage.DB_PATH
+        problems = storage.verify_db(repair=args.repair, quick=args.quick)
+    for p in problems:
+        print(p)
+    _log(args, f"{len(problems)} problem(s) found in {target}")
+    if problems and args.repair:
+        problems = storage.verify_db(quick=args.quick)
+        _log(args, f"{len(problems)} problem(s) left after repair")
+    return EXIT_INVALID if problems else EXIT_OK
+
+def cmd_stats(args) -> int:
+    import storage
+    if args.detail:
+        import aggregates
+        snap = aggregates.db_snapshot()
+        if args.json:
+            import json
+            print(json.dumps(snap, indent=2))
+        else:
+            print(aggregates.format_report(snap, top=args.top), end="")
+        return EXIT_OK
+    stats = storage.db_stats()
+    if args.json:
+        import json
+        print(json.dumps(stats, indent=2))
+    else:
+        for k, v in stats.items():
+            print(f"{k:<26}{v:>12}")
+    return EXIT_OK
+
+def cmd_overlap(args) -> int:
+    import csv
+    from aggregates import CoEnrollment
+    co = CoEnrollment.from_db()
+    result = {"top_pairs": co.top_pairs(args.top)}
+    if args.schedule:
+        with open(args.schedule, newline="", encoding="utf-8") as f:
+            schedule = {r[0].strip(): r[1].strip() for r in list(csv.reader(f))[1:] if r}
+        result["conflict_pairs"] = co.conflict_pairs(schedule)
+        result["students_with_conflicts"] = len(co.conflicts(schedule))
+    if args.json:
+        import json
+        print(json.dumps(result, indent=2))
+        return EXIT_OK
+    print("Courses sharing the most students:")
+    for a, b, n in result["top_pairs"]:
+        print(f"  {a:<14}{b:<14}{n:>8}")
+    if args.schedule:
+        print(f"Same-slot pairs sharing students: {len(result['conflict_pairs'])}; "
+              f"students with a clash: {result['students_with_conflicts']}")
+        for a, b, n in result["conflict_pairs"][:args.top]:
+            print(f"  {a:<14}{b:<14}{n:>8}")
+    return EXIT_OK
+
+def cmd_rosters(args) -> int:
+    import reports
+    manifest = reports.write_rosters(args.dest, course_ids=args.courses, fmt=args.format,
+                                     workers=args.workers, progress=_Progress(args.quiet))
+    _log(args, f"Wrote {manifest['courses']} rosters ({manifest['students']} students) to {args.dest} "
+               f"in {manifest['seconds']:.2f}s with {manifest['workers']} worker(s)")
+    return EXIT_OK
+
+def _rows(source, fmt: str = "auto"):
+    """Rows of a JSON file or CSV folder, or of the database when ``source`` is None."""
+    import diff
+    return diff.db_rows() if source is None else diff.school_rows(_load_source(source, fmt))
+
+def cmd_diff(args) -> int:
+    import json
+    import diff
+    # one argument: what the database would need to become that snapshot
+    old, new = (args.old, args.new) if args.new else (None, args.old)
+    changes = diff.diff(_rows(old, args.format), _rows(new, args.format))
+    print(json.dumps(changes.to_dict() if args.json else changes.summary(), indent=2))
+    return EXIT_OK
+
+def cmd_merge(args) -> int:
+    import json
+    import diff
+    import storage
+    changes, conflicts = diff.merge(_rows(args.base, args.format), diff.db_rows(),
+                                    _rows(args.theirs, args.format), prefer=args.prefer)
+    for c in conflicts:
+        print(json.dumps(c.to_dict()))
+    if not args.dry_run:
+        diff.apply_db(changes)
+    _log(args, f"{'Would apply' if args.dry_run else 'Applied'} {len(changes)} change(s) to {storage.DB_PATH}; "
+               f"{len(conflicts)} conflict(s) resolved in favour of {args.prefer}")
+    return EXIT_OK
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the argument parser for all subcommands."""
+    ap = argparse.ArgumentParser(prog="cli.py", description="School Management System (headless).")
+    ap.add_argument("--db", help="SQLite database path (default: school.db)")
+    ap.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="upsert a JSON file or CSV folder into the database")
+    p.add_argument("source")
+    p.add_argument("--format", choices=("auto", "json", "csv"), default="auto")
+    p.add_argument("--prune", action="store_true", help="also delete rows missing from the source")
+    p.add_argument("--repair", action="store_true", help="fix inconsistent links in the source instead of refusing it")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("sync", help="make the database mirror a JSON file or CSV folder")
+    p.add_argument("source")
+    p.add_argument("--format", choices=("auto", "json", "csv"), default="auto")
+    p.add_argument("--repair", action="store_true", help="fix inconsistent links in the source instead of refusing it")
+    p.set_defaults(func=cmd_sync)
+
+    p = sub.add_parser("export", help="write the database to JSON or a CSV folder")
+    p.add_argument("dest")
+    p.add_argument("--format", choices=("json", "csv"), default="json")
+    p.add_argument("--workers", type=int, default=3, help="CSV files written concurrently")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("rename", help="re-key IDs from a two-column CSV (header row, then old,new)")
+    p.add_argument("entity", choices=("students", "instructors", "courses"))
+    p.add_argument("mapping", help="CSV file mapping old IDs to new IDs")
+    p.set_defaults(func=cmd_rename)
+
+    p = sub.add_parser("backup", help="copy the database into a folder with a timestamp")
+    p.add_argument("dest")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("verify", help="check integrity, schema and referential consistency")
+    p.add_argument("--repair", action="store_true",
+                   help="drop dangling rows and rebuild outdated tables, then check again (database only)")
+    p.add_argument("--quick", action="store_true", help="quick_check instead of the full integrity_check")
+    p.add_argument("--snapshot", help="check the links of a JSON file or CSV folder instead of the database")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("stats", help="print row counts")
+    p.add_argument("--json", action="store_true")
+    p.add_argument("--detail", action="store_true",
+                   help="enrollment per course, instructor load, age distribution, students without courses")
+    p.add_argument("--top", type=int, default=10, help="rows per section with --detail")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("overlap", help="course pairs sharing students, and timetable clashes")
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--schedule", help="CSV (header row, then course_id,slot) to check for clashes")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_overlap)
+
+    p = sub.add_parser("rosters", help="write one roster file per course and a manifest.json")
+    p.add_argument("dest")
+    p.add_argument("--format", choices=("csv", "text"), default="csv")
+    p.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    p.add_argument("--courses", nargs="+", help="only these course IDs")
+    p.set_defaults(func=cmd_rosters)
+
+    p = sub.add_parser("diff", help="changes from OLD to NEW (from the database to OLD if NEW is omitted)")
+    p.add_argument("old", help="JSON file or CSV folder")
+    p.add_argument("new", nargs="?", help="JSON file or CSV folder")
+    p.add_argument("--format", choices=("auto", "json", "csv"), default="auto")
+    p.add_argument("--json", action="store_true", help="print the full change set, not counts")
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("merge", help="three-way merge THEIRS into the database, given their common BASE")
+    p.add_argument("base", help="JSON file or CSV folder both sides started from")
+    p.add_argument("theirs", help="JSON file or CSV folder to merge in")
+    p.add_argument("--format", choices=("auto", "json", "csv"), default="auto")
+    p.add_argument("--prefer", choices=("ours", "theirs"), default="ours", help="side that wins conflicts")
+    p.add_argument("--dry-run", action="store_true", help="report conflicts without writing")
+    p.set_defaults(func=cmd_merge)
+    return ap
+
+def main(argv=None) -> int:
+    """Command-line entry point; returns the process exit code."""
+    args = build_parser().parse_args(argv)
+    if args.db:
+        from pathlib import Path
+        import storage
+        storage.DB_PATH = Path(args.db)
+    try:
+        return args.func(args)
+    except (ValueError, KeyError) as e:
+        print(f"error: invalid data: {e}", file=sys.stderr)
+        return EXIT_INVALID
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""Snapshot diff and three-way merge for school data.
+
+Both sides of a diff are reduced to their relational facts, the same ones
+the database stores: one row tuple per student, instructor and course
+(see :data:`FIELDS`), plus the set of ``(student_id, course_id)``
+registrations. :func:`school_rows` reads them from a :class:`models.School`
+or snapshot, and :func:`db_rows` reads them straight from SQLite. The
+per-entity lists (``registered_courses``, ``assigned_courses``) are derived
+from these facts, so they are not compared separately.
+
+:func:`diff` hash-joins two sides by ID and returns a :class:`ChangeSet`
+with added rows, removed IDs, the changed fields only, and registration
+changes. :func:`merge` diffs ours and theirs against a common base and
+returns the changes to apply to ours, plus a :class:`Conflict` for every
+place where the two sides disagree. :func:`apply_db` writes a change set
+in one transaction, touching only the rows it names. Every step is one
+pass over dictionaries and sets, so the cost is linear in the number of
+entities and registrations.
+"""
+
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import metrics
+import storage
+
+FIELDS = {
+    "instructors": ("name", "age", "email"),
+    "courses": ("course_name", "instructor_id"),
+    "students": ("name", "age", "email"),
+}
+_PK = {"students": "student_id", "instructors": "instructor_id", "courses": "course_id"}
+
+Pair = Tuple[str, str]
+# {"students"|"instructors"|"courses": {id: row tuple}, "registrations": {(student_id, course_id)}}
+Rows = Dict[str, object]
+
+# ---------------------- Reading ----------------------
+def school_rows(school) -> Rows:
+    """Reduce a School (or SchoolSnapshot) to its rows and registrations.
+
+    :param school: Source model.
+    :type school: School | SchoolSnapshot
+    :rtype: dict
+    """
+    return {
+        "students": {k: (s.name, s.age, s._email) for k, s in school.students.items()},
+        "instructors": {k: (i.name, i.age, i._email) for k, i in school.instructors.items()},
+        "courses": {k: (c.course_name, c.instructor_id or None) for k, c in school.courses.items()},
+        "registrations": {(sid, k) for k, c in school.courses.items() for sid in c.enrolled_students},
+    }
+
+@metrics.instrumented()
+def db_rows(path: str | Path | None = None) -> Rows:
+    """Read rows and registrations from the database without building a School.
+
+    :param path: Database file; defaults to ``storage.DB_PATH``.
+    :type path: str | Path | None
+    :rtype: dict
+    """
+    storage.init_db(path)
+    conn = storage.get_conn(path)
+    try:
+        rows = {e: {r[0]: tuple(r[1:]) for r in conn.execute(f"SELECT {_PK[e]}, {', '.join(cols)} FROM {e}")}
+                for e, cols in FIELDS.items()}
+        rows["courses"] = {k: (name, iid or None) for k, (name, iid) in rows["courses"].items()}
+        rows["registrations"] = set(conn.execute("SELECT student_id, course_id FROM registrations"))
+    finally:
+        conn.close()
+    return rows
+
+# ---------------------- Change sets ----------------------
+@dataclass
+class ChangeSet:
+    """Differences between two sides, or the changes a merge makes to ours.
+
+    :ivar added: ``{entity: {id: row}}`` of new entities.
+    :vartype added: dict[str, dict[str, tuple]]
+    :ivar changed: ``{entity: {id: {field: new value}}}``, changed fields only.
+    :vartype changed: dict[str, dict[str, dict]]
+    :ivar removed: ``{entity: {id}}`` of deleted entities.
+    :vartype removed: dict[str, set[str]]
+    :ivar enrolled: Registrations to add.
+    :vartype enrolled: set[tuple[str, str]]
+    :ivar dropped: Registrations to remove.
+    :vartype dropped: set[tuple[str, str]]
+    """
+    added: Dict[str, Dict[str, tuple]] = field(default_factory=lambda: {e: {} for e in FIELDS})
+    changed: Dict[str, Dict[str, dict]] = field(default_factory=lambda: {e: {} for e in FIELDS})
+    removed: Dict[str, Set[str]] = field(default_factory=lambda: {e: set() for e in FIELDS})
+    enrolled: Set[Pair] = field(default_factory=set)
+    dropped: Set[Pair] = field(default_factory=set)
+
+    def __len__(self) -> int:
+        return (sum(len(self.added[e]) + len(self.changed[e]) + len(self.removed[e]) for e in FIELDS)
+                + len(self.enrolled) + len(self.dropped))
+
+    def summary(self) -> dict:
+        """Return ``{entity: {"added", "changed", "removed"}}`` counts."""
+        counts = {e: {"added": len(self.added[e]), "changed": len(self.changed[e]),
+                      "removed": len(self.removed[e])} for e in FIELDS}
+        counts["registrations"] = {"added": len(self.enrolled), "removed": len(self.dropped)}
+        return counts
+
+    def to_dict(self) -> dict:
+        """Return a JSON-ready form; rows become ``{field: value}`` objects."""
+        out = {e: {"added": {k: dict(zip(FIELDS[e], row)) for k, row in self.added[e].items()},
+                   "changed": self.changed[e],
+                   "removed": sorted(self.removed[e])} for e in FIELDS}
+        out["registrations"] = {"added": sorted(self.enrolled), "removed": sorted(self.dropped)}
+        return out
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChangeSet":
+        cs = cls()
+        for e, fields in FIELDS.items():
+            part = data.get(e, {})
+            cs.added[e] = {k: tuple(row.get(f) for f in fields) for k, row in part.get("added", {}).items()}
+            cs.changed[e] = {k: dict(v) for k, v in part.get("changed", {}).items()}
+            cs.removed[e] = set(part.get("removed", ()))
+        regs = data.get("registrations", {})
+        cs.enrolled = {tuple(p) for p in regs.get("added", ())}
+        cs.dropped = {tuple(p) for p in regs.get("removed", ())}
+        return cs
+
+def _changed_fields(fields: tuple, new: tuple, old: tuple) -> dict:
+    return {f: v for f, v, w in zip(fields, new, old) if v != w}
+
+@metrics.instrumented()
+def diff(old: Rows, new: Rows) -> ChangeSet:
+    """Return the changes that turn ``old`` into ``new``.
+
+    :param old: Rows from :func:`school_rows` or :func:`db_rows`.
+    :type old: dict
+    :param new: Rows from :func:`school_rows` or :func:`db_rows`.
+    :type new: dict
+    :rtype: ChangeSet
+    """
+    cs = ChangeSet()
+    for e, fields in FIELDS.items():
+        before, after = old[e], new[e]
+        added, changed = cs.added[e], cs.changed[e]
+        for k, row in after.items():
+            prev = before.get(k)
+            if prev is None:
+                added[k] = row
+            elif prev != row:
+                changed[k] = _changed_fields(fields, row, prev)
+        cs.removed[e] = before.keys() - after.keys()
+    cs.enrolled = new["registrations"] - old["registrations"]
+    cs.dropped = old["registrations"] - new["registrations"]
+    metrics.record("diff.diff", rows=len(cs))
+    return cs
+
+def patch(rows: Rows, changes: ChangeSet) -> Rows:
+    """Return a copy of ``rows`` with ``changes`` applied.
+
+    Registrations of removed students and courses are removed as well, as
+    the database's cascading deletes would.
+    """
+    out = {}
+    for e, fields in FIELDS.items():
+        table = dict(rows[e])
+        for k in changes.removed[e]:
+            table.pop(k, None)
+        for k, updates in changes.changed[e].items():
+            if k in table:
+                table[k] = tuple(updates.get(f, v) for f, v in zip(fields, table[k]))
+        table.update(changes.added[e])
+        out[e] = table
+    gone_students, gone_courses = changes.removed["students"], changes.removed["courses"]
+    out["registrations"] = {p for p in chain(rows["registrations"] - changes.dropped, changes.enrolled)
+                            if p[0] not in gone_students and p[1] not in gone_courses}
+    gone = changes.removed["instructors"]
+    if gone:
+        out["courses"] = {k: (name, None if iid in gone else iid) for k, (name, iid) in out["courses"].items()}
+    return out
+
+# ---------------------- Merge ----------------------
+@dataclass
+class Conflict:
+    """One place where ours and theirs changed the same data differently.
+
+    ``kind`` names what each side did, ours first: ``"add/add"`` (both
+    added the ID with different rows), ``"modify/modify"`` (both changed
+    ``field``), ``"modify/delete"`` and ``"delete/modify"``,
+    ``"reference/delete"`` (ours started referring to an entity theirs
+    deleted), and ``"delete/reference"`` (the reverse).
+    """
+    kind: str
+    entity: str
+    key: str
+    field: Optional[str] = None
+    base: object = None
+    ours: object = None
+    theirs: object = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def _references(changes: ChangeSet) -> Dict[str, Set[str]]:
+    """IDs that the additions and changes of ``changes`` refer to, per entity."""
+    instructors = {row[1] for row in changes.added["courses"].values() if row[1]}
+    instructors.update(f["instructor_id"] for f in changes.changed["courses"].values() if f.get("instructor_id"))
+    return {"students": {s for s, _ in changes.enrolled}, "courses": {c for _, c in changes.enrolled},
+            "instructors": instructors}
+
+@metrics.instrumented()
+def merge(base: Rows, ours: Rows, theirs: Rows, prefer: str = "ours") -> Tuple[ChangeSet, List[Conflict]]:
+    """Three-way merge of ``theirs`` into ``ours``, both descended from ``base``.
+
+    Changes made on one side only are taken. Where both sides changed the
+    same thing differently, a :class:`Conflict` is reported and ``prefer``
+    decides which side wins. Changes to different fields of one entity do
+    not conflict. Registrations are a set, so they only conflict when one side
+    enrolls a student or course the other side deleted.
+
+    :param base: Common ancestor rows.
+    :type base: dict
+    :param ours: Rows to merge into, e.g. :func:`db_rows`.
+    :type ours: dict
+    :param theirs: Incoming rows, e.g. :func:`school_rows` of a campus export.
+    :type theirs: dict
+    :param prefer: ``"ours"`` or ``"theirs"``, the side that wins conflicts.
+    :type prefer: str
+    :raises ValueError: If ``prefer`` is neither.
+    :return: The changes to apply to ours, and the conflicts found.
+    :rtype: tuple[ChangeSet, list[Conflict]]
+    """
+    if prefer not in ("ours", "theirs"):
+        raise ValueError(f"prefer must be 'ours' or 'theirs', not {prefer!r}")
+    take = prefer == "theirs"
+    mine, their = diff(base, ours), diff(base, theirs)
+    ours_refs = _references(mine)
+    out, conflicts = ChangeSet(), []
+    kept: Dict[str, Set[str]] = {e: set() for e in FIELDS}       # deleted by theirs, kept by the merge
+    reported: Set[Tuple[str, str]] = set()                       # deleted by ours, conflict already raised
+
+    for e, fields in FIELDS.items():
+        b, o, t = base[e], ours[e], theirs[e]
+        position = {f: n for n, f in enumerate(fields)}
+        for k, row in their.added[e].items():
+            mine_row = o.get(k)
+            if mine_row is None:
+                out.added[e][k] = row
+            elif mine_row != row:
+                conflicts.append(Conflict("add/add", e, k, None, None, mine_row, row))
+                if take:
+                    out.changed[e][k] = _changed_fields(fields, row, mine_row)
+        for k, updates in their.changed[e].items():
+            mine_row = o.get(k)
+            if mine_row is None:
+                conflicts.append(Conflict("delete/modify", e, k, None, b[k], None, t[k]))
+                reported.add((e, k))
+                if take:
+                    out.added[e][k] = t[k]
+                continue
+            base_row, taken = b[k], {}
+            for name, value in updates.items():
+                n = position[name]
+                if mine_row[n] == value:
+                    continue
+                if mine_row[n] != base_row[n]:
+                    conflicts.append(Conflict("modify/modify", e, k, name, base_row[n], mine_row[n], value))
+                    if not take:
+                        continue
+                taken[name] = value
+            if taken:
+                out.changed[e][k] = taken
+        for k in their.removed[e]:
+            mine_row = o.get(k)
+            if mine_row is None:
+                continue
+            if mine_row != b[k]:
+                conflicts.append(Conflict("modify/delete", e, k, None, b[k], mine_row, None))
+            elif k in ours_refs[e]:
+                conflicts.append(Conflict("reference/delete", e, k, None, b[k], mine_row, None))
+            else:
+                out.removed[e].add(k)
+                continue
+            if take:
+                out.removed[e].add(k)
+            else:
+                kept[e].add(k)
+
+    def restore(e: str, k: str) -> bool:
+        """Bring back an entity ours deleted that theirs refers to; False if it stays deleted."""
+        if k in ours[e] or k in out.added[e]:
+            return True
+        if (e, k) not in reported:
+            conflicts.append(Conflict("delete/reference", e, k, None, base[e].get(k), None, theirs[e][k]))
+            reported.add((e, k))
+        if take:
+            out.added[e][k] = theirs[e][k]
+        return take
+
+    mine_regs = ours["registrations"]
+    for pair in their.enrolled:
+        if pair in mine_regs:
+            continue
+        student, course = restore("students", pair[0]), restore("courses", pair[1])
+        if student and course:
+            out.enrolled.add(pair)
+    # courses theirs added, re-pointed or had restored may name an instructor ours deleted
+    for course, iid in [(k, row[1]) for k, row in out.added["courses"].items()] + \
+                       [(k, f["instructor_id"]) for k, f in out.changed["courses"].items() if "instructor_id" in f]:
+        if iid and not restore("instructors", iid):
+            if course in out.added["courses"]:
+                out.added["courses"][course] = (out.added["courses"][course][0], None)
+            else:
+                del out.changed["courses"][course]["instructor_id"]
+                if not out.changed["courses"][course]:
+                    del out.changed["courses"][course]
+    out.dropped = {p for p in their.dropped
+                   if p in mine_regs and p[0] not in kept["students"] and p[1] not in kept["courses"]}
+
+    # ours' own new references to entities the merge removes go with them
+    gone = out.removed
+    out.dropped.update(p for p in mine.enrolled if p[0] in gone["students"] or p[1] in gone["courses"])
+    for k, (_, iid) in ours["courses"].items():
+        if out.changed["courses"].get(k, {}).get("instructor_id", iid) in gone["instructors"] \
+                and k not in gone["courses"]:
+            out.changed["courses"].setdefault(k, {})["instructor_id"] = None
+    metrics.record("diff.merge", rows=len(out))
+    return out, conflicts
+
+# ---------------------- Applying ----------------------
+@metrics.instrumented()
+def apply_db(changes: ChangeSet, path: str | Path | None = None) -> int:
+    """Write a change set to the database in one transaction.
+
+    Only the rows named by ``changes`` are touched: new rows are inserted,
+    each changed field is updated with one statement per field, and removed
+    entities are deleted with their registrations (and their courses'
+    instructor cleared), children before parents.
+
+    :param changes: Output of :func:`diff` or :func:`merge`.
+    :type changes: ChangeSet
+    :param path: Database file; defaults to ``storage.DB_PATH``.
+    :type path: str | Path | None
+    :return: Number of changes applied.
+    :rtype: int
+    """
+    storage.init_db(path)
+    conn = storage.get_conn(path)
+    try:
+        with conn:
+            for e, fields in FIELDS.items():
+                pk = _PK[e]
+                conn.executemany(f"INSERT INTO {e}({pk}, {', '.join(fields)}) VALUES ({', '.join('?' * (len(fields) + 1))})",
+                                 ((k, *row) for k, row in changes.added[e].items()))
+                for f in fields:
+                    conn.executemany(f"UPDATE {e} SET {f}=? WHERE {pk}=?",
+                                     ((u[f], k) for k, u in changes.changed[e].items() if f in u))
+            conn.executemany("INSERT OR IGNORE INTO registrations(student_id, course_id) VALUES (?, ?)",
+                             sorted(changes.enrolled))
+            conn.executemany("DELETE FROM registrations WHERE student_id=? AND course_id=?", sorted(changes.dropped))
+            for e, ref in (("students", "student_id"), ("courses", "course_id")):
+                keys = [(k,) for k in changes.removed[e]]
+                conn.executemany(f"DELETE FROM registrations WHERE {ref}=?", keys)
+                conn.executemany(f"DELETE FROM {e} WHERE {_PK[e]}=?", keys)
+            keys = [(k,) for k in changes.removed["instructors"]]
+            conn.executemany("UPDATE courses SET instructor_id=NULL WHERE instructor_id=?", keys)
+            conn.executemany("DELETE FROM instructors WHERE instructor_id=?", keys)
+    finally:
+        conn.close()
+    metrics.record("diff.apply_db", rows=len(changes))
+    return len(changes)
@@ -0,0 +1,542 @@
+"""Shared data engine for the PyQt5 and Tkinter front ends.
+
+One in-memory :class:`models.School` (with its indexes and result cache)
+over one SQLite schema (:func:`storage.init_db`). Both windows go through
+an :class:`Engine` instead of keeping their own object graphs:
+
+* :meth:`Engine.load` hydrates the model from SQLite or the startup cache;
+* the write-through methods (``add_*``, ``update_*``, ``delete``,
+  ``register``, ``assign_instructor``) apply a change to the model and write
+  exactly the rows it touched in one transaction; the PyQt window works
+  this way;
+* the bulk methods (``delete_many``, ``assign_instructor_many``,
+  ``register_many``, ``rename_many``) run one set-based statement per table
+  for a whole selection;
+* edits made directly on :attr:`Engine.school` stay in memory until
+  :meth:`Engine.sync`, which is how the Tkinter window works.
+"""
+
+from __future__ import annotations
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import metrics
+import storage
+from cache import QueryCache, normalize
+from models import School, Student, Instructor, Course
+
+# a JSON array of IDs bound as one parameter, so a bulk statement has no variable limit
+_KEYS = "(SELECT value FROM json_each(?))"
+
+class Engine:
+    """SQLite-backed School shared by both user interfaces.
+
+    :param path: Database file; defaults to ``storage.DB_PATH``.
+    :type path: str | Path | None
+    :param cache_size: Maximum cached search/roster results.
+    :type cache_size: int
+    :param email_check: Email rule for adds and edits, set on every model the
+        engine uses; defaults to the School's own (:func:`utils.is_valid_email`).
+    :type email_check: Callable[[str], bool] | None
+    :ivar school: The live model; replaced by :meth:`load` and :meth:`use`.
+    :vartype school: School
+    :ivar cache_hit: Whether the last :meth:`load` came from the startup cache.
+    :vartype cache_hit: bool
+    """
+    def __init__(self, path: str | Path | None = None, cache_size: int = 1024,
+                 email_check: Optional[Callable[[str], bool]] = None):
+        self.path = Path(path) if path is not None else storage.DB_PATH
+        self.cache_size = cache_size
+        self.email_check = email_check
+        self.conn: Optional[sqlite3.Connection] = None
+        self.school = School()
+        self.cache: Optional[QueryCache] = None
+        self.cache_hit = False
+        # (entity, key) -> new value or None, collected while a write-through runs
+        self._dirty: Optional[Dict[Tuple[str, str], object]] = None
+        # True while the model equals the database, so it may be saved as the startup cache
+        self._in_sync = False
+        self._fingerprint: Optional[dict] = None
+        # (on_write, on_reset) pairs registered with watch()
+        self._watchers: List[Tuple[Callable, Optional[Callable]]] = []
+        self._aggregates = None
+        self.use(self.school)
+
+    # ---------------------- Lifecycle ----------------------
+    def open(self):
+        """Create the schema if needed and open the write connection."""
+        if self.conn is None:
+            storage.init_db(self.path)
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA foreign_keys = ON")
+
+    def close(self):
+        """Save the startup cache if still valid and close the connection."""
+        self.save_startup_cache()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def use(self, school: School):
+        """Make ``school`` the live model (e.g. after loading a JSON file).
+
+        The database is not touched; call :meth:`sync` to write it.
+        """
+        if self.school is not school:
+            self.school.unsubscribe(self._on_write)
+        self.school = school
+        if self.email_check is not None:
+            school.email_check = self.email_check
+        self.cache = school.enable_cache(self.cache_size)
+        school.subscribe(self._on_write)
+        self._in_sync = False
+        for _, on_reset in self._watchers:
+            if on_reset is not None:
+                on_reset(school)
+
+    def watch(self, on_write: Callable[[str, str, object], None],
+              on_reset: Optional[Callable[[School], None]] = None):
+        """Follow the live model across reloads.
+
+        ``on_write(entity, key, obj)`` is called for every entity the model
+        stores or removes (``obj`` is None when removed), whichever model is
+        live at the time. ``on_reset(school)`` is called now and whenever
+        :meth:`load` or :meth:`use` replaces the model, including the reload
+        after SQLite fails a transaction.
+        """
+        self._watchers.append((on_write, on_reset))
+        if on_reset is not None:
+            on_reset(self.school)
+
+    @metrics.instrumented("engine.load")
+    def load(self, use_cache: bool = True, progress: storage.Progress = None) -> bool:
+        """Replace the model with the database contents.
+
+        :param use_cache: Try the startup cache before reading SQLite.
+        :type use_cache: bool
+        :param progress: Optional ``progress(stage, done, total)`` callback.
+        :return: True if the startup cache was used.
+        :rtype: bool
+        """
+        self.open()
+        if use_cache:
+            school, hit = storage.db_to_school_cached(progress, self.path)
+        else:
+            school, hit = storage.db_to_school(progress, self.path), False
+        self.use(school)
+        self._in_sync = True
+        self._fingerprint = storage.db_fingerprint(self.path)
+        self.cache_hit = hit
+        metrics.record("engine.load", rows=len(school.students) + len(school.instructors) + len(school.courses))
+        return hit
+
+    def load_startup_cache(self) -> bool:
+        """Adopt the startup cache as the model if it matches the database.
+
+        Unlike :meth:`load`, nothing is read from SQLite on a miss and the
+        current model is kept.
+
+        :return: True if the cache was used.
+        :rtype: bool
+        """
+        school = storage.load_startup_cache(self.path)
+        if not isinstance(school, School):
+            return False
+        self.use(school)
+        self._in_sync = True
+        self._fingerprint = storage.db_fingerprint(self.path)
+        self.cache_hit = True
+        return True
+
+    def sync(self, prune: bool = False, progress: storage.Progress = None):
+        """Write the whole model to the database (see :func:`storage.school_to_db`)."""
+        storage.school_to_db(self.school, prune, progress, self.path)
+        if prune:
+            self._in_sync = True
+        self._fingerprint = storage.db_fingerprint(self.path)
+
+    def save_startup_cache(self) -> bool:
+        """Save the model as the startup cache if it still equals the database.
+
+        :return: True if the cache was written.
+        :rtype: bool
+        """
+        fp = storage.db_fingerprint(self.path)
+        if not self._in_sync or fp is None or fp != self._fingerprint:
+            return False
+        storage.save_startup_cache(self.school, self.path, fp)
+        return True
+
+    @property
+    def aggregates(self):
+        """Statistics over the live model (:class:`aggregates.Aggregates`).
+
+        Built on first use, then kept current by every write and reload.
+        """
+        if self._aggregates is None:
+            from aggregates import Aggregates
+            self._aggregates = Aggregates()
+            self.watch(self._aggregates.on_write, self._aggregates.reset)
+        return self._aggregates
+
+    # ---------------------- Write-through ----------------------
+    def _on_write(self, entity: str, key: str, obj):
+        if self._dirty is not None:
+            self._dirty[(entity, key)] = obj
+        else:
+            self._in_sync = False
+        for on_write, _ in self._watchers:
+            on_write(entity, key, obj)
+
+    @contextmanager
+    def transaction(self, flush: bool = True):
+        """Apply model writes made inside the block to SQLite in one transaction.
+
+        Every entity the model stores or removes is written once, with the
+        same row writers :class:`storage.SqliteSchool` uses. Foreign keys are
+        checked at commit, so rows can be written in any order. If the block
+        raises, e.g. a ``ValueError`` from validation, the transaction is
+        rolled back and only the entities the block wrote are read back from
+        the database. If SQLite itself raises, the whole model is reloaded.
+
+        :param flush: If False, the block writes SQLite itself through
+            :attr:`conn` (set-based statements) and the model writes it makes
+            are not written again row by row.
+        :type flush: bool
+        """
+        if self._dirty is not None:
+            yield self
+            return
+        self.open()
+        self._dirty = {}
+        try:
+            cur = self.conn.cursor()
+            cur.execute("PRAGMA defer_foreign_keys = ON")
+            yield self
+            if flush:
+                for (entity, key), obj in self._dirty.items():
+                    if obj is None:
+                        for sql in storage._TABLES[entity][5]:
+                            cur.execute(sql, (key,))
+                    else:
+                        storage._TABLES[entity][4](cur, obj)
+            self.conn.commit()
+            metrics.record("engine.transaction", rows=len(self._dirty))
+        except sqlite3.Error:
+            self.conn.rollback()
+            self._dirty = None
+            self.load()
+            raise
+        except BaseException:
+            # the database is fine; put back only the entities the block wrote
+            self.conn.rollback()
+            dirty, self._dirty = self._dirty, None
+            try:
+                self._restore(dirty)
+            except sqlite3.Error:
+                self.load()
+            raise
+        finally:
+            self._dirty = None
+        self._fingerprint = storage.db_fingerprint(self.path)
+
+    def _restore(self, dirty: Dict[Tuple[str, str], object]):
+        """Reset the model entities in ``dirty`` to their rows in the database.
+
+        Goes through the School API, so indexes, the query cache and watchers
+        see the restored values.
+        """
+        in_sync = self._in_sync
+        for entity, key in dirty:
+            _, pk, select, hydrate = storage._TABLES[entity][:4]
+            row = self.conn.execute(f"{select} WHERE t.{pk}=?", (key,)).fetchone()
+            if row is not None:
+                self.school._put(entity, key, self.school._own(hydrate(row)))
+            elif key in getattr(self.school, entity):
+                self.school._drop(entity, key)
+        self._in_sync = in_sync
+
+    def exists(self, entity: str, key: str) -> bool:
+        """Return whether ``key`` exists, answered from the model's ID map.
+
+        The write-through methods keep the model equal to the database, so
+        no query is needed.
+        """
+        return key in getattr(self.school, entity)
+
+    @metrics.instrumented("engine.add")
+    def add_student(self, s: Student) -> bool:
+        """Insert a new student; False if the ID is taken.
+
+        :raises ValueError: If the student is invalid.
+        """
+        if self.exists("students", s.student_id):
+            return False
+        with self.transaction():
+            self.school.add_student(s)
+        return True
+
+    @metrics.instrumented("engine.add")
+    def add_instructor(self, i: Instructor) -> bool:
+        """Insert a new instructor; False if the ID is taken.
+
+        :raises ValueError: If the instructor is invalid.
+        """
+        if self.exists("instructors", i.instructor_id):
+            return False
+        with self.transaction():
+            self.school.add_instructor(i)
+        return True
+
+    @metrics.instrumented("engine.add")
+    def add_course(self, c: Course) -> bool:
+        """Insert a new course taught by an existing instructor; False otherwise.
+
+        :raises ValueError: If the course is invalid.
+        """
+        iid = c.instructor_id
+        if self.exists("courses", c.course_id) or not iid or not self.exists("instructors", iid):
+            return False
+        c.instructor_id = None
+        with self.transaction():
+            self.school.add_course(c)
+            self.school.assign_instructor_to_course(iid, c.course_id)
+        return True
+
+    @metrics.instrumented("engine.link")
+    def register(self, student_id: str, course_id: str) -> bool:
+        """Enroll a student in a course; False if either does not exist."""
+        if not self.exists("students", student_id) or not self.exists("courses", course_id):
+            return False
+        with self.transaction():
+            self.school.register_student_in_course(student_id, course_id)
+        return True
+
+    @metrics.instrumented("engine.link")
+    def assign_instructor(self, course_id: str, instructor_id: str) -> bool:
+        """Make an instructor teach a course; False if either does not exist."""
+        if not self.exists("courses", course_id) or not self.exists("instructors", instructor_id):
+            return False
+        with self.transaction():
+            self.school.assign_instructor_to_course(instructor_id, course_id)
+        return True
+
+    def _index_references(self):
+        """Hash-index every field that holds another entity's ID.
+
+        Deletes and renames find referrers through these instead of scanning
+        a whole collection. Built on first use (about a second at 100k
+        students) and then kept current by the model.
+        """
+        for refs in School._REFERENCES.values():
+            for entity, field_name in refs:
+                self.school.create_index(entity, field_name, "hash")
+
+    @metrics.instrumented("engine.update")
+    def update_student(self, student_id: str, new_id: str, **fields) -> bool:
+        """Update a student's fields and optionally its ID; False if ``new_id`` is taken.
+
+        :raises ValueError: If the updated student is invalid.
+        """
+        if new_id != student_id and self.exists("students", new_id):
+            return False
+        mapping = self.school._check_renames("students", {student_id: new_id})
+        self._index_references()
+        with self.transaction(flush=False):
+            self.school.update_student(student_id, **fields)
+            storage._TABLES["students"][4](self.conn.cursor(), self.school.students[student_id])
+            self._rename("students", mapping)
+        return True
+
+    @metrics.instrumented("engine.update")
+    def update_instructor(self, instructor_id: str, new_id: str, **fields) -> bool:
+        """Update an instructor's fields and optionally its ID; False if ``new_id`` is taken.
+
+        :raises ValueError: If the updated instructor is invalid.
+        """
+        if new_id != instructor_id and self.exists("instructors", new_id):
+            return False
+        mapping = self.school._check_renames("instructors", {instructor_id: new_id})
+        self._index_references()
+        with self.transaction(flush=False):
+            self.school.update_instructor(instructor_id, **fields)
+            storage._TABLES["instructors"][4](self.conn.cursor(), self.school.instructors[instructor_id])
+            self._rename("instructors", mapping)
+        return True
+
+    @metrics.instrumented("engine.update")
+    def update_course(self, course_id: str, new_id: str, course_name: str, instructor_id: str) -> bool:
+        """Update a course; False if ``new_id`` is taken or the instructor does not exist."""
+        if new_id != course_id and self.exists("courses", new_id):
+            return False
+        if not self.exists("instructors", instructor_id):
+            return False
+        mapping = self.school._check_renames("courses", {course_id: new_id})
+        self._index_references()
+        with self.transaction(flush=False):
+            self.school.update_course(course_id, course_name=course_name)
+            self._rename("courses", mapping)
+            self.school.assign_instructor_to_course(instructor_id, new_id)
+            self.conn.execute("UPDATE courses SET course_name=?, instructor_id=? WHERE course_id=?",
+                              (course_name, instructor_id, new_id))
+        return True
+
+    def _rename(self, entity: str, mapping: Dict[str, str]):
+        """Apply a checked ``{old_id: new_id}`` mapping to SQLite and the model.
+
+        Call inside ``transaction(flush=False)``; :func:`storage.rename_ids`
+        updates each table with one statement.
+        """
+        storage.rename_ids(self.conn, entity, mapping)
+        self.school.rename_many(entity, mapping)
+
+    @metrics.instrumented("engine.rename")
+    def rename_many(self, entity: str, mapping) -> int:
+        """Re-key many entities in one transaction, e.g. every student after an ID migration.
+
+        References in other tables follow: through ``ON UPDATE CASCADE``
+        where the schema declares it, otherwise through one ``UPDATE`` per
+        referencing column. Chains and swaps are allowed.
+
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param mapping: ``{old_id: new_id}`` mapping or ``(old_id, new_id)`` pairs.
+        :raises KeyError: If an old ID does not exist (nothing is written).
+        :raises ValueError: If a new ID is empty, given twice, or taken (nothing is written).
+        :return: Number of entities renamed.
+        :rtype: int
+        """
+        mapping = self.school._check_renames(entity, dict(mapping))
+        if not mapping:
+            return 0
+        self._index_references()
+        with self.transaction(flush=False):
+            self._rename(entity, mapping)
+        metrics.record("engine.rename", rows=len(mapping))
+        return len(mapping)
+
+    @metrics.instrumented("engine.delete")
+    def delete(self, entity: str, key: str) -> bool:
+        """Delete an entity and its references; False if it does not exist."""
+        if key not in getattr(self.school, entity):
+            return False
+        self._index_references()
+        with self.transaction():
+            getattr(self.school, "delete_" + entity[:-1])(key)
+        return True
+
+    # ---------------------- Bulk ----------------------
+    def _existing(self, entity: str, keys) -> List[str]:
+        """Distinct ``keys`` that exist, in order."""
+        table = getattr(self.school, entity)
+        return [k for k in dict.fromkeys(keys) if k in table]
+
+    @metrics.instrumented("engine.bulk")
+    def delete_many(self, entity: str, keys) -> List[str]:
+        """Delete many entities and their references in one transaction.
+
+        Each table is cleared with one ``IN (...)`` statement over all keys
+        instead of one statement per entity.
+
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param keys: IDs to delete; unknown IDs are ignored.
+        :return: The IDs that were deleted.
+        :rtype: list[str]
+        """
+        keys = self._existing(entity, keys)
+        if not keys:
+            return []
+        self._index_references()
+        with self.transaction(flush=False):
+            arg = (json.dumps(keys),)
+            for sql in storage._TABLES[entity][5]:
+                # "... WHERE student_id=?" -> "... WHERE student_id IN (<keys>)"
+                self.conn.execute(sql[:-2] + " IN " + _KEYS, arg)
+            self.school.delete_many(entity, keys)
+        metrics.record("engine.bulk", rows=len(keys))
+        return keys
+
+    @metrics.instrumented("engine.bulk")
+    def assign_instructor_many(self, course_ids, instructor_id: str) -> List[str]:
+        """Make one instructor teach many courses in one statement and transaction.
+
+        :return: The course IDs that were reassigned (empty if the instructor does not exist).
+        :rtype: list[str]
+        """
+        cids = self._existing("courses", course_ids)
+        if not cids or not self.exists("instructors", instructor_id):
+            return []
+        with self.transaction(flush=False):
+            self.conn.execute("UPDATE courses SET instructor_id=? WHERE course_id IN " + _KEYS,
+                              (instructor_id, json.dumps(cids)))
+            self.school.assign_instructor_to_courses(instructor_id, cids)
+        metrics.record("engine.bulk", rows=len(cids))
+        return cids
+
+    @metrics.instrumented("engine.bulk")
+    def register_many(self, student_ids, course_id: str) -> List[str]:
+        """Enroll many students in one course in one statement and transaction.
+
+        Students already enrolled are left as they are.
+
+        :return: The student IDs now enrolled (empty if the course does not exist).
+        :rtype: list[str]
+        """
+        sids = self._existing("students", student_ids)
+        if not sids or not self.exists("courses", course_id):
+            return []
+        with self.transaction(flush=False):
+            self.conn.execute("INSERT OR IGNORE INTO registrations(student_id, course_id) "
+                              "SELECT value, ? FROM json_each(?)", (course_id, json.dumps(sids)))
+            self.school.register_students_in_course(sids, course_id)
+        metrics.record("engine.bulk", rows=len(sids))
+        return sids
+
+    # ---------------------- Queries ----------------------
+    # entity -> collections whose writes can change a related search over it
+    _RELATED = {"students": ("students", "courses"), "instructors": ("instructors", "courses"),
+                "courses": ("courses", "instructors")}
+
+    @metrics.instrumented("engine.search")
+    def related_search(self, text: str, entity: str) -> List[object]:
+        """Contains-search that also matches through related entities.
+
+        Students and instructors match on name, ID, email, or the ID or name
+        of one of their courses; courses match on ID, name, or their
+        instructor's ID or name. Results are cached in the model's result
+        cache and dropped on any write to the collections involved.
+
+        :param text: Search term (case-insensitive).
+        :type text: str
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :rtype: list
+        """
+        t = normalize(text)
+        sc = self.school
+
+        def compute():
+            if entity == "courses":
+                out = []
+                for c in sc.courses.values():
+                    ins = sc.instructors.get(c.instructor_id) if c.instructor_id else None
+                    if (t in c.course_id.lower() or t in c.course_name.lower()
+                            or (ins is not None and (t in ins.instructor_id.lower() or t in ins.name.lower()))):
+                        out.append(c)
+                return out
+            id_field, links = (("student_id", "registered_courses") if entity == "students"
+                               else ("instructor_id", "assigned_courses"))
+            # match the courses once, then test each person's course IDs against the set
+            hit_courses = {c.course_id for c in sc.courses.values()
+                           if t in c.course_id.lower() or t in c.course_name.lower()}
+            return [o for o in getattr(sc, entity).values()
+                    if t in o.name.lower() or t in getattr(o, id_field).lower() or t in o._email.lower()
+                    or (hit_courses and not hit_courses.isdisjoint(getattr(o, links)))]
+
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(("related", entity, t), compute,
+                                         lambda rows: ((), {e: None for e in Engine._RELATED[entity]}))
@@ -0,0 +1,363 @@
+"""Append-only change journal for a School, with crash recovery and compaction.
+
+A journal folder holds numbered generations::
+
+    snapshot-000003.json    the School when generation 3 began
+    journal-000003.log      every change made since, one line per entity
+
+:class:`Journal` subscribes to its School and collects each stored or
+removed entity. :meth:`Journal.commit` appends them as one batch and
+fsyncs once, so a save costs O(entities changed) however large the School
+is. An entity written many times between commits is written once.
+
+Each line is ``<crc32> <json>``. A record is the entity's whole new state,
+or just its key when it was removed, so replaying it is idempotent and
+also captures the partial effects of an operation that raised. A batch
+ends with a commit line that gives its record count. :meth:`Journal.open`
+loads the newest complete snapshot and replays the journals from that
+generation on. It stops at the first torn or corrupt line and truncates
+the file back to the last complete batch.
+
+:meth:`Journal.compact` starts a new generation. It commits, takes an O(1)
+:meth:`School.snapshot` and switches appends to a fresh journal. A
+background thread then writes the snapshot and deletes the older
+generation. A crash at any point leaves a snapshot and the journals that
+follow it.
+
+Only changes made through the School API reach the journal. Entities
+mutated in place without being stored again are not recorded.
+"""
+
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import metrics
+from models import Course, Instructor, School, Student
+
+_SNAPSHOT = "snapshot-{:06d}.json"
+_JOURNAL = "journal-{:06d}.log"
+_NAME = re.compile(r"(snapshot|journal)-(\d{6})\.(json|log)$")
+
+# ---------------------- Records ----------------------
+# entity -> (record tag, entity class, fields stored after the key)
+_LAYOUT = {
+    "students": ("s", Student, ("name", "age", "_email", "registered_courses")),
+    "instructors": ("i", Instructor, ("name", "age", "_email", "assigned_courses")),
+    "courses": ("c", Course, ("course_name", "instructor_id", "enrolled_students")),
+}
+_ENTITY = {tag: entity for entity, (tag, _, _) in _LAYOUT.items()}
+_ID_FIELDS = {"students": "student_id", "instructors": "instructor_id", "courses": "course_id"}
+_COMMIT = "C"
+
+def _line(record: list) -> bytes:
+    payload = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+def _encode(entity: str, key: str, obj) -> bytes:
+    tag, _, fields = _LAYOUT[entity]
+    if obj is None:
+        return _line([tag, key])
+    return _line([tag, key, *(getattr(obj, f) for f in fields)])
+
+def _decode(record: list) -> Tuple[str, str, object]:
+    entity = _ENTITY[record[0]]
+    if len(record) == 2:
+        return entity, record[1], None
+    _, cls, fields = _LAYOUT[entity]
+    values = dict(zip(fields, record[2:]))
+    values[_ID_FIELDS[entity]] = record[1]
+    return entity, record[1], cls(**values)
+
+def read_batches(path: str | Path) -> Tuple[List[List[tuple]], int]:
+    """Read the complete batches of a journal file.
+
+    :param path: Journal file.
+    :type path: str | Path
+    :return: The batches as lists of ``(entity, key, obj or None)``, and the
+        byte offset just past the last complete batch. Anything after that
+        offset is a torn or corrupt tail.
+    :rtype: tuple[list[list[tuple]], int]
+    """
+    batches, pending, offset, good = [], [], 0, 0
+    with open(path, "rb") as f:
+        for raw in f:
+            offset += len(raw)
+            crc, _, payload = raw.rstrip(b"\n").partition(b" ")
+            try:
+                if not raw.endswith(b"\n") or len(crc) != 8 or int(crc, 16) != zlib.crc32(payload):
+                    break
+                record = json.loads(payload)
+                if record[0] != _COMMIT:
+                    pending.append(_decode(record))
+                    continue
+                if record[1] != len(pending):
+                    break
+            except (ValueError, KeyError, IndexError, TypeError):
+                # a line that passes the CRC but does not decode is as corrupt as a torn one
+                break
+            batches.append(pending)
+            pending, good = [], offset
+    return batches, good
+
+def _fsync_dir(folder: Path):
+    # makes renames and new files durable; directories cannot be opened on Windows
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _generations(folder: Path) -> Dict[str, List[int]]:
+    found = {"snapshot": [], "journal": []}
+    for p in folder.iterdir():
+        m = _NAME.match(p.name)
+        if m:
+            found[m.group(1)].append(int(m.group(2)))
+    return {kind: sorted(gens) for kind, gens in found.items()}
+
+# ---------------------- Journal ----------------------
+class Journal:
+    """Write-ahead journal of one School's changes in a folder.
+
+    Use :meth:`open` to recover (or start) a folder, then change
+    :attr:`school` through its API and call :meth:`commit` at the points
+    that must survive a crash.
+
+    :ivar school: The journaled model.
+    :vartype school: School
+    :ivar folder: Journal folder.
+    :vartype folder: Path
+    :ivar generation: Current generation number.
+    :vartype generation: int
+    """
+    def __init__(self, folder: str | Path, school: School, generation: int):
+        self.folder = Path(folder)
+        self.school = school
+        self.generation = generation
+        # (entity, key) -> new value or None, collected since the last commit
+        self._pending: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._compact_error: Optional[BaseException] = None
+        self._file: Optional[BinaryIO] = open(self.folder / _JOURNAL.format(generation), "ab")
+        school.subscribe(self._on_write)
+
+    @classmethod
+    @metrics.instrumented("journal.open")
+    def open(cls, folder: str | Path, school: Optional[School] = None) -> "Journal":
+        """Recover the School kept in ``folder``, or start journaling a new one.
+
+        The newest snapshot is loaded and every journal from its generation
+        on is replayed. A torn tail is cut off the last journal, and older
+        generations are deleted. If the folder holds no generations yet, its
+        first snapshot is ``school`` (default: an empty School), written now.
+
+        :param folder: Journal folder; created if missing.
+        :type folder: str | Path
+        :param school: Initial model for a new folder; ignored if the folder has data.
+        :type school: School | None
+        :return: The journal; its recovered model is :attr:`school`.
+        :rtype: Journal
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        for tmp in folder.glob("*.tmp"):
+            tmp.unlink()
+        gens = _generations(folder)
+        if not gens["snapshot"]:
+            school = school if school is not None else School()
+            generation = max(gens["journal"], default=-1) + 1
+            _write_snapshot(folder, generation, school)
+            return cls(folder, school, generation)
+
+        base = gens["snapshot"][-1]
+        with open(folder / _SNAPSHOT.format(base), encoding="utf-8") as f:
+            school = School.from_dict(json.load(f))
+        replayed, generation, torn = 0, base, False
+        for g in (g for g in gens["journal"] if g >= base):
+            path = folder / _JOURNAL.format(g)
+            if torn:
+                # follows a torn journal, so its batches build on lost changes
+                path.unlink()
+                continue
+            generation = g
+            batches, good = read_batches(path)
+            for batch in batches:
+                for entity, key, obj in batch:
+                    if obj is None:
+                        school._drop(entity, key)
+                    else:
+                        school._put(entity, key, school._own(obj))
+                replayed += len(batch)
+            if good < path.stat().st_size:
+                with open(path, "r+b") as f:
+                    f.truncate(good)
+                    f.flush()
+                    os.fsync(f.fileno())
+                torn = True
+        _remove_before(folder, base)
+        metrics.record("journal.open", rows=replayed)
+        return cls(folder, school, generation)
+
+    # ---------------------- Writing ----------------------
+    def _on_write(self, entity: str, key: str, obj):
+        self._pending[(entity, key)] = obj
+
+    @property
+    def pending(self) -> int:
+        """Entities changed since the last commit."""
+        return len(self._pending)
+
+    @metrics.instrumented("journal.commit")
+    def commit(self) -> int:
+        """Append the changes since the last commit as one batch and fsync.
+
+        If writing or syncing fails, the file is truncated back to the end
+        of the previous batch and the changes stay pending for the next
+        commit.
+
+        :raises OSError: If the batch could not be written and synced.
+        :return: Records written; 0 (and no fsync) when nothing changed.
+        :rtype: int
+        """
+        with self._lock:
+            return self._commit()
+
+    def _commit(self) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        f = self._file
+        start = f.tell()
+        try:
+            data = b"".join(_encode(e, k, obj) for (e, k), obj in pending.items()) + _line([_COMMIT, len(pending)])
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            # cut off any part of the batch that reached the file, so later
+            # batches do not land behind torn bytes, and keep its changes
+            # pending, ahead of any made since
+            pending.update(self._pending)
+            self._pending = pending
+            self._rollback(start)
+            raise
+        metrics.record("journal.commit", rows=len(pending), nbytes=len(data))
+        return len(pending)
+
+    def _rollback(self, offset: int):
+        """Reopen the journal truncated to ``offset`` after a failed append.
+
+        The truncation becomes durable with the next commit's fsync; until
+        then a crash can at worst bring back bytes that recovery cuts off.
+        """
+        path = self.folder / _JOURNAL.format(self.generation)
+        try:
+            self._file.close()
+        except OSError:
+            pass  # its buffered bytes are exactly the ones being discarded
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+        self._file = open(path, "ab")
+
+    # ---------------------- Compaction ----------------------
+    def compact(self, wait: bool = False) -> bool:
+        """Fold the journal into a new snapshot, writing it in the background.
+
+        Commits pending changes, takes an O(1) snapshot of the School and
+        starts generation ``n + 1`` with an empty journal. A thread then writes
+        the snapshot and deletes generation ``n``. Later changes go to the new
+        journal meanwhile.
+
+        :param wait: Block until the snapshot is written.
+        :type wait: bool
+        :raises OSError: If the previous compaction failed to write its snapshot.
+        :return: False if a compaction was already running.
+        :rtype: bool
+        """
+        with self._lock:
+            self._raise_compact_error()
+            if self._compactor is not None and self._compactor.is_alive():
+                return False
+            self._commit()
+            snapshot = self.school.snapshot()
+            self.generation += 1
+            self._file.close()
+            self._file = open(self.folder / _JOURNAL.format(self.generation), "ab")
+            _fsync_dir(self.folder)
+            self._compactor = threading.Thread(target=self._compact, args=(snapshot, self.generation),
+                                               name="journal-compaction", daemon=True)
+            self._compactor.start()
+        if wait:
+            self.wait()
+        return True
+
+    @metrics.instrumented("journal.compact")
+    def _compact(self, snapshot, generation: int):
+        try:
+            _write_snapshot(self.folder, generation, snapshot)
+            _remove_before(self.folder, generation)
+        except BaseException as e:  # reported by the next compact(), wait() or close()
+            self._compact_error = e
+
+    def _raise_compact_error(self):
+        if self._compact_error is not None:
+            error, self._compact_error = self._compact_error, None
+            raise error
+
+    def wait(self):
+        """Block until a running compaction has finished.
+
+        :raises OSError: If it failed to write its snapshot.
+        """
+        if self._compactor is not None:
+            self._compactor.join()
+        self._raise_compact_error()
+
+    def close(self):
+        """Commit pending changes, finish compaction and stop journaling."""
+        if self._file is None:
+            return
+        self.commit()
+        self.school.unsubscribe(self._on_write)
+        try:
+            self.wait()
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _write_snapshot(folder: Path, generation: int, school) -> Path:
+    """Write ``school`` as the snapshot of ``generation``, atomically and durably."""
+    dest = folder / _SNAPSHOT.format(generation)
+    tmp = dest.with_name(dest.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(school.to_dict(), f, separators=(",", ":"), ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, dest)
+    _fsync_dir(folder)
+    metrics.record("journal.snapshot", rows=len(school.students) + len(school.instructors) + len(school.courses),
+                   nbytes=dest.stat().st_size)
+    return dest
+
+def _remove_before(folder: Path, generation: int):
+    """Delete the snapshots and journals of generations older than ``generation``."""
+    gens = _generations(folder)
+    for kind, pattern in (("snapshot", _SNAPSHOT), ("journal", _JOURNAL)):
+        for g in gens[kind]:
+            if g < generation:
+                (folder / pattern.format(g)).unlink(missing_ok=True)
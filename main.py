@@ -1,10 +1,12 @@
+import time
+startedAt = time.perf_counter()
 import sys
 from PyQt5 import QtWidgets
 from pyqt_core import MainWindow
 
+# MainWindow reports "First paint", "Data loaded" and "Rows painted" on stderr and in the status bar
 app = QtWidgets.QApplication(sys.argv)
-mainWin = MainWindow()
+mainWin = MainWindow(startedAt)
 mainWin.resize(1100, 800)
 mainWin.show()
 sys.exit(app.exec_())
-
@@ -0,0 +1,190 @@
+"""Opt-in instrumentation for the School Management System.
+
+Records call latencies (as histograms), row counts, byte counts and errors
+for instrumented functions, and exports them as Prometheus text or JSON.
+Recording is off unless the ``SCHOOL_METRICS`` environment variable is set
+to ``1`` or :func:`enable` is called; while disabled an instrumented call
+costs one extra function frame and a flag check.
+"""
+
+from __future__ import annotations
+import functools
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+_enabled = os.environ.get("SCHOOL_METRICS") == "1"
+_lock = threading.Lock()
+
+class _OpStats:
+    """Histogram and counters for one instrumented operation."""
+    __slots__ = ("buckets", "count", "total", "max", "rows", "bytes", "errors")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+_ops: Dict[str, _OpStats] = {}
+
+def enable():
+    """Start recording metrics."""
+    global _enabled
+    _enabled = True
+
+def disable():
+    """Stop recording metrics (collected values are kept)."""
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    """Return True when metrics are being recorded."""
+    return _enabled
+
+def reset():
+    """Discard all collected metrics."""
+    with _lock:
+        _ops.clear()
+
+def _stats(name: str) -> _OpStats:
+    st = _ops.get(name)
+    if st is None:
+        st = _ops.setdefault(name, _OpStats())
+    return st
+
+def record(name: str, rows: int = 0, nbytes: int = 0):
+    """Add row and byte counts to an operation; a no-op while disabled.
+
+    :param name: Operation name, usually the instrumented function's.
+    :type name: str
+    :param rows: Rows (entities, CSV lines, SQL rows) processed.
+    :type rows: int
+    :param nbytes: Bytes read or written.
+    :type nbytes: int
+    """
+    if not _enabled:
+        return
+    with _lock:
+        st = _stats(name)
+        st.rows += rows
+        st.bytes += nbytes
+
+def instrumented(name: Optional[str] = None) -> Callable:
+    """Decorator recording latency and errors of every call while enabled.
+
+    :param name: Operation name; defaults to ``module.qualname`` of the function.
+    :type name: str | None
+    """
+    def deco(fn):
+        op = name or f"{fn.__module__}.{fn.__qualname__}"
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - t0
+                with _lock:
+                    st = _stats(op)
+                    st.observe(elapsed)
+                    st.errors += failed
+        wrapper.metric_name = op
+        return wrapper
+    return deco
+
+# ---------------------- Export ----------------------
+def to_json() -> dict:
+    """Return all metrics as a JSON-serialisable dictionary.
+
+    :return: ``{"enabled": bool, "ops": {name: {...}}}`` with cumulative bucket counts.
+    :rtype: dict
+    """
+    with _lock:
+        ops = {}
+        for op, st in sorted(_ops.items()):
+            cumulative, acc = {}, 0
+            for bound, n in zip(BUCKETS, st.buckets):
+                acc += n
+                cumulative["+Inf" if bound == math.inf else repr(bound)] = acc
+            ops[op] = {"count": st.count, "sum_seconds": st.total, "max_seconds": st.max,
+                       "rows": st.rows, "bytes": st.bytes, "errors": st.errors, "buckets": cumulative}
+    return {"enabled": _enabled, "ops": ops}
+
+def to_prometheus() -> str:
+    """Return all metrics in the Prometheus text exposition format.
+
+    :rtype: str
+    """
+    data = to_json()["ops"]
+    lines = ["# HELP school_op_seconds Latency of instrumented operations.",
+             "# TYPE school_op_seconds histogram"]
+    for op, st in data.items():
+        for le, n in st["buckets"].items():
+            lines.append(f'school_op_seconds_bucket{{op="{op}",le="{le}"}} {n}')
+        lines.append(f'school_op_seconds_sum{{op="{op}"}} {st["sum_seconds"]}')
+        lines.append(f'school_op_seconds_count{{op="{op}"}} {st["count"]}')
+    for metric, key, help_text in (("school_op_rows_total", "rows", "Rows processed."),
+                                   ("school_op_bytes_total", "bytes", "Bytes read or written."),
+                                   ("school_op_errors_total", "errors", "Calls that raised.")):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{op="{op}"}} {st[key]}' for op, st in data.items() if st[key]]
+    return "\n".join(lines) + "\n"
+
+def summary() -> str:
+    """Return a short human-readable table for diagnostics dialogs.
+
+    :rtype: str
+    """
+    data = to_json()
+    if not data["ops"]:
+        state = "enabled" if data["enabled"] else "disabled (set SCHOOL_METRICS=1 or enable in this dialog)"
+        return f"No metrics recorded. Instrumentation is {state}.\n"
+    lines = [f"{'operation':<44}{'calls':>8}{'avg ms':>10}{'max ms':>10}{'rows':>10}{'bytes':>12}{'errors':>8}"]
+    for op, st in data["ops"].items():
+        avg = st["sum_seconds"] / st["count"] * 1000 if st["count"] else 0.0
+        lines.append(f"{op:<44}{st['count']:>8}{avg:>10.2f}{st['max_seconds'] * 1000:>10.2f}"
+                     f"{st['rows']:>10}{st['bytes']:>12}{st['errors']:>8}")
+    return "\n".join(lines) + "\n"
+
+def dump(path: str | Path, fmt: str = "json"):
+    """Write metrics to a file as ``"json"`` or ``"prometheus"`` text.
+
+    :param path: Destination file.
+    :type path: str | Path
+    :param fmt: Output format.
+    :type fmt: str
+    :raises ValueError: If the format is unknown.
+    """
+    if fmt == "json":
+        text = json.dumps(to_json(), indent=2)
+    elif fmt == "prometheus":
+        text = to_prometheus()
+    else:
+        raise ValueError(f"Unknown metrics format: {fmt}")
+    Path(path).write_text(text, encoding="utf-8")
@@ -6,9 +6,16 @@ School class that manages collections and relationships between them.
 """
 
 from __future__ import annotations
-from dataclasses import dataclass, field, asdict
-from typing import Dict, List, Optional
-from utils import is_valid_email, non_negative_int
+import copy
+from dataclasses import dataclass, field, asdict, replace
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Set
+import metrics
+from cache import QueryCache, normalize
+from persistent import PersistentDict
+from query import INDEX_KINDS, Query, fuzzy_rank
+from utils import (is_valid_email, non_negative_int, validate_emails, validate_non_negative_ints,
+                   validate_required)
 
 @dataclass
 class Person:
@@ -46,26 +53,29 @@ class Person:
 
     @email.setter
     def email(self, value: str):
-        """Set the email address with validation.
+        """Set the email address.
+        
+        Not validated here: the rule depends on the School (see
+        :attr:`School.email_check`), which checks it in ``add_*`` and
+        ``update_*``.
         
         :param value: New email address.
         :type value: str
-        :raises ValueError: If email format is invalid.
         """
-        if not is_valid_email(value):
-            raise ValueError("Invalid email format")
         self._email = value
 
-    def validate(self):
+    def validate(self, email_check: Callable[[str], bool] = is_valid_email):
         """Validate all person fields.
         
+        :param email_check: Email rule; :attr:`School.email_check` is passed here.
+        :type email_check: Callable[[str], bool]
         :raises ValueError: If any field is invalid (empty name, negative age, bad email).
         """
         if not self.name.strip():
             raise ValueError("Name is required")
         if not non_negative_int(self.age):
             raise ValueError("Age must be a non-negative integer")
-        if not is_valid_email(self._email):
+        if not email_check(self._email):
             raise ValueError("Invalid email format")
 
 @dataclass
@@ -141,26 +151,297 @@ class Instructor(Person):
         if course_id not in self.assigned_courses:
             self.assigned_courses.append(course_id)
 
+def _clone(obj):
+    """Return a copy of an entity whose list fields are no longer shared."""
+    dup = copy.copy(obj)
+    for name, value in vars(dup).items():
+        if isinstance(value, list):
+            setattr(dup, name, list(value))
+    return dup
+
+def _updated(obj, updates: dict):
+    """Return a copy of an entity with ``updates`` applied, leaving ``obj`` untouched.
+    
+    ``email`` is accepted for the ``_email`` field behind the property.
+    
+    :raises TypeError: If an update names a field the entity does not have.
+    """
+    if "email" in updates:
+        updates = {("_email" if k == "email" else k): v for k, v in updates.items()}
+    return _clone(replace(obj, **updates))
+
 class School:
     """Central data model managing students, instructors, and courses.
     
     Provides CRUD operations, relationship management, search functionality,
     and serialization to/from dictionaries for JSON/database persistence.
     
-    :ivar students: Dictionary mapping student IDs to Student objects.
-    :vartype students: dict[str, Student]
-    :ivar instructors: Dictionary mapping instructor IDs to Instructor objects.
-    :vartype instructors: dict[str, Instructor]
-    :ivar courses: Dictionary mapping course IDs to Course objects.
-    :vartype courses: dict[str, Course]
+    The collections are plain dicts until the first :meth:`snapshot`, which
+    turns them into persistent maps; from then on snapshots are O(1).
+    Entities shared with a live snapshot are copied on their first write
+    through the School API, which keeps every snapshot unchanged.
+    
+    :ivar students: Mapping of student IDs to Student objects.
+    :vartype students: dict[str, Student] | PersistentDict[str, Student]
+    :ivar instructors: Mapping of instructor IDs to Instructor objects.
+    :vartype instructors: dict[str, Instructor] | PersistentDict[str, Instructor]
+    :ivar courses: Mapping of course IDs to Course objects.
+    :vartype courses: dict[str, Course] | PersistentDict[str, Course]
+    :ivar email_check: Email rule for people added or updated through the
+        API (default :func:`utils.is_valid_email`). Loaders do not re-check.
+    :vartype email_check: Callable[[str], bool]
+    :cvar cheap_snapshots: Whether :meth:`snapshot` is O(1) once taken, so it
+        is fine to take one per read. False for ``storage.SqliteSchool``.
+    :vartype cheap_snapshots: bool
     """
+    cheap_snapshots = True
+    email_check: Callable[[str], bool] = staticmethod(is_valid_email)
+
     def __init__(self):
         """Initialize empty collections for all entity types."""
-        self.students: Dict[str, Student] = {}
-        self.instructors: Dict[str, Instructor] = {}
-        self.courses: Dict[str, Course] = {}
+        # plain dicts until snapshot() first needs persistent maps
+        self.students: MutableMapping[str, Student] = {}
+        self.instructors: MutableMapping[str, Instructor] = {}
+        self.courses: MutableMapping[str, Course] = {}
+        # ids of entities created since the last snapshot; None = no snapshot yet
+        self._owned: Optional[Set[int]] = None
+        # entity -> field -> HashIndex/SortedIndex
+        self._indexes: Dict[str, Dict[str, object]] = {}
+        # search/roster result cache, see enable_cache()
+        self._cache: Optional[QueryCache] = None
+        # write listeners, see subscribe()
+        self._observers: List[Callable[[str, str, object], None]] = []
+
+    def __getstate__(self):
+        # the result cache, listeners and snapshot bookkeeping are per-process
+        state = self.__dict__.copy()
+        state["_cache"] = None
+        state["_owned"] = None
+        state["_observers"] = []
+        return state
+
+    def subscribe(self, observer: Callable[[str, str, object], None]):
+        """Call ``observer(entity, key, obj)`` after every stored or removed entity.
+        
+        ``obj`` is the entity's new value, or None when it was removed. Used by
+        :class:`engine.Engine` to write changes through to SQLite.
+        
+        :param observer: Callback run synchronously inside the write.
+        """
+        self._observers.append(observer)
+
+    def unsubscribe(self, observer: Callable[[str, str, object], None]):
+        """Stop calling a callback registered with :meth:`subscribe`."""
+        self._observers.remove(observer)
+
+    def _own(self, obj):
+        """Mark a newly stored entity as private to the live model."""
+        if self._owned is not None:
+            self._owned.add(id(obj))
+        return obj
+
+    def _writable(self, entity: str, key: str):
+        """Return the entity at ``key``, copied first if a snapshot shares it.
+        
+        The caller must hand the object back through :meth:`_put` once it
+        has been modified.
+        
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :param key: Entity ID.
+        :raises KeyError: If the ID is not in the collection.
+        :return: Entity that may be mutated in place.
+        """
+        obj = getattr(self, entity)[key]
+        if self._owned is None or id(obj) in self._owned:
+            return obj
+        return self._own(_clone(obj))
+
+    def _put(self, entity: str, key: str, obj):
+        """Store an added or modified entity in its collection."""
+        getattr(self, entity)[key] = obj
+        indexes = self._indexes.get(entity)
+        if indexes:
+            for idx in indexes.values():
+                idx.update(key, obj)
+        if self._cache is not None:
+            self._cache.invalidate(entity, key, obj)
+        for observer in self._observers:
+            observer(entity, key, obj)
+
+    def _put_many(self, entity: str, pairs: List[tuple]):
+        """Store many ``(key, entity)`` pairs and index them in one pass."""
+        table = getattr(self, entity)
+        if hasattr(table, "extend"):
+            table.extend(pairs)
+        else:
+            table.update(pairs)
+        for idx in self._indexes.get(entity, {}).values():
+            idx.bulk_load(pairs)
+        if self._cache is not None:
+            for key, obj in pairs:
+                self._cache.invalidate(entity, key, obj)
+        for observer in self._observers:
+            for key, obj in pairs:
+                observer(entity, key, obj)
+
+    def _drop(self, entity: str, key: str):
+        """Remove an entity from its collection if present."""
+        getattr(self, entity).pop(key, None)
+        for idx in self._indexes.get(entity, {}).values():
+            idx.remove(key)
+        if self._cache is not None:
+            self._cache.invalidate(entity, key)
+        for observer in self._observers:
+            observer(entity, key, None)
+
+    def _referrers(self, entity: str, field_name: str, key: str) -> List[str]:
+        """Return IDs in ``entity`` whose ``field_name`` equals or lists ``key``.
+        
+        Used by the delete cascades; answered from an index when one exists.
+        """
+        idx = self._indexes.get(entity, {}).get(field_name)
+        if idx is not None:
+            return idx.lookup(key)
+        out = []
+        for k, obj in getattr(self, entity).items():
+            v = getattr(obj, field_name)
+            if v == key or (isinstance(v, list) and key in v):
+                out.append(k)
+        return out
+
+    # ---------- Indexes & queries ----------
+    def create_index(self, entity: str, field_name: str, kind: str = "sorted"):
+        """Create a secondary index that is maintained on every mutation.
+        
+        ``"hash"`` indexes answer equality; ``"sorted"`` indexes also answer
+        ranges and ordered scans. ``"trigram"`` indexes serve
+        :meth:`fuzzy_search` and are stored under ``"<field>:trigram"`` so they
+        can coexist with an exact index on the same field. List fields
+        (e.g. ``registered_courses``) index each element. Creating an
+        existing index is a no-op.
+        
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param field_name: Entity attribute to index.
+        :type field_name: str
+        :param kind: ``"sorted"``, ``"hash"`` or ``"trigram"``.
+        :type kind: str
+        :raises ValueError: If the entity or index kind is unknown.
+        """
+        if entity not in ("students", "instructors", "courses"):
+            raise ValueError(f"Unknown entity: {entity}")
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {kind}")
+        name = f"{field_name}:trigram" if kind == "trigram" else field_name
+        existing = self._indexes.get(entity, {}).get(name)
+        if existing is not None and existing.kind == kind:
+            return existing
+        idx = INDEX_KINDS[kind](field_name)
+        idx.bulk_load(getattr(self, entity).items())
+        self._indexes.setdefault(entity, {})[name] = idx
+        return idx
+
+    def drop_index(self, entity: str, field_name: str):
+        """Remove a secondary index if it exists (use ``"<field>:trigram"`` for trigram indexes)."""
+        self._indexes.get(entity, {}).pop(field_name, None)
+
+    def query(self, entity: str) -> Query:
+        """Start an index-aware query over one collection.
+        
+        Example: ``school.query("students").between("age", 18, 21).order_by("name").offset(780).limit(20)``
+        
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :return: Query builder; iterate it for results.
+        :rtype: Query
+        """
+        return Query(self, entity)
+
+    # ---------- Result cache ----------
+    def enable_cache(self, maxsize: int = 1024, ttl: Optional[float] = None) -> QueryCache:
+        """Cache :meth:`search_iter`/:meth:`search` and :meth:`roster` results.
+        
+        Entries are invalidated precisely by every write made through the
+        School API: a result is dropped when one of its entities changes or
+        when a written entity would now match the query. Writes that bypass
+        the API (e.g. another process editing the database) are not seen;
+        use ``ttl`` or :meth:`QueryCache.clear` for those.
+        
+        :param maxsize: Maximum cached results.
+        :type maxsize: int
+        :param ttl: Seconds before an entry expires, or None.
+        :type ttl: float | None
+        :return: The cache, whose :meth:`QueryCache.stats` reports hits and misses.
+        :rtype: QueryCache
+        """
+        self._cache = QueryCache(maxsize, ttl)
+        return self._cache
+
+    def disable_cache(self):
+        """Stop caching query results and drop the cache."""
+        self._cache = None
+
+    def _cached_search(self, entity: str, text: str, limit: Optional[int], compute):
+        """Return ``compute()`` as a list, cached under the normalised query."""
+        cache = getattr(self, "_cache", None)
+        if cache is None:
+            return compute()
+        text = normalize(text)
+        fields = School._SEARCH_FIELDS[entity]
+        key_field = School._ID_FIELDS[entity]
+        def matches(o):
+            return any(text in v.lower() for v in (getattr(o, f) for f in fields) if isinstance(v, str))
+        def deps(rows):
+            # an incomplete page can also change when a non-matching entity starts matching
+            return ((entity, getattr(o, key_field)) for o in rows), {entity: matches if text else None}
+        return iter(cache.get_or_compute(("search", entity, text, limit), lambda: list(compute()), deps))
+
+    @metrics.instrumented()
+    def roster(self, course_id: str) -> List[Student]:
+        """Return the students enrolled in a course, in enrollment order.
+        
+        Cached when :meth:`enable_cache` is on; the entry is invalidated when
+        the course or any listed student changes.
+        
+        :param course_id: Course ID.
+        :type course_id: str
+        :raises KeyError: If the course does not exist.
+        :return: Enrolled students (unknown IDs are skipped).
+        :rtype: list[Student]
+        """
+        cache = getattr(self, "_cache", None)
+        def compute():
+            students = self.students
+            return [students[sid] for sid in self.courses[course_id].enrolled_students if sid in students]
+        if cache is None:
+            return compute()
+        def deps(rows):
+            ids = [("courses", course_id)] + [("students", sid) for sid in self.courses[course_id].enrolled_students]
+            return ids, None
+        return list(cache.get_or_compute(("roster", course_id), compute, deps))
+
+    # ---------- Snapshots ----------
+    def snapshot(self) -> "SchoolSnapshot":
+        """Return an immutable, structurally shared view of the current data.
+        
+        The first snapshot converts the collections to persistent maps in
+        O(n); every later one is O(1). Readers may iterate it from other
+        threads without locks while this School keeps changing; later writes
+        copy only the entities and trie paths they touch. Schools that never
+        take a snapshot keep plain dicts and pay nothing for this.
+        
+        :return: Read-only snapshot.
+        :rtype: SchoolSnapshot
+        """
+        for entity in ("students", "instructors", "courses"):
+            table = getattr(self, entity)
+            if not isinstance(table, PersistentDict):
+                setattr(self, entity, PersistentDict(table))
+        self._owned = set()
+        return SchoolSnapshot(self.students.freeze(), self.instructors.freeze(), self.courses.freeze())
 
     # ---------- CRUD: Students ----------
+    @metrics.instrumented()
     def add_student(self, s: Student):
         """Add a new student to the school.
         
@@ -168,11 +449,63 @@ class School:
         :type s: Student
         :raises ValueError: If student data is invalid or ID is missing.
         """
-        s.validate()
+        s.validate(self.email_check)
         if not s.student_id:
             raise ValueError("student_id is required")
-        self.students[s.student_id] = s
+        self._put("students", s.student_id, self._own(s))
+
+    @metrics.instrumented()
+    def add_students_bulk(self, student_ids: Sequence[str], names: Sequence[str], ages: Sequence,
+                          emails: Sequence[str], skip_invalid: bool = False) -> List[int]:
+        """Validate and add many students given as parallel columns.
+        
+        Columns are validated with the batch validators from :mod:`utils`
+        (emails with :attr:`email_check`, as :meth:`add_student` does) before
+        anything is inserted, then all valid rows are stored in one pass.
+        Existing IDs are overwritten, as with :meth:`add_student`.
+        
+        :param student_ids: Student IDs.
+        :type student_ids: Sequence[str]
+        :param names: Full names.
+        :type names: Sequence[str]
+        :param ages: Ages (anything ``int()`` accepts).
+        :type ages: Sequence
+        :param emails: Email addresses.
+        :type emails: Sequence[str]
+        :param skip_invalid: Insert the valid rows and report the rest instead of raising.
+        :type skip_invalid: bool
+        :raises ValueError: If the columns differ in length, or a row is invalid and ``skip_invalid`` is False.
+        :return: Indices of rejected rows.
+        :rtype: list[int]
+        """
+        n = len(student_ids)
+        if not len(names) == len(ages) == len(emails) == n:
+            raise ValueError("Column lengths differ")
+        checks = (("student_id is required", validate_required(student_ids)[0]),
+                  ("Name is required", validate_required(names)[0]),
+                  ("Age must be a non-negative integer", validate_non_negative_ints(ages)[0]),
+                  ("Invalid email format", self._check_emails(emails)))
+        rejected = [i for i, row in enumerate(zip(*(mask for _, mask in checks))) if not all(row)]
+        if rejected and not skip_invalid:
+            first = rejected[0]
+            reason = next(msg for msg, mask in checks if not mask[first])
+            raise ValueError(f"{len(rejected)} invalid rows; row {first}: {reason}")
+        skip = set(rejected)
+        pairs = [(student_ids[i], self._own(Student(name=names[i], age=int(ages[i]), _email=emails[i],
+                                                     student_id=student_ids[i])))
+                 for i in range(n) if i not in skip]
+        self._put_many("students", pairs)
+        return rejected
+
+    def _check_emails(self, emails: Sequence[str]) -> List[bool]:
+        """Validity mask for a column of emails under :attr:`email_check`."""
+        check = self.email_check
+        if check is is_valid_email:
+            # the default rule has a batch form that checks each domain once
+            return validate_emails(emails)[0]
+        return [isinstance(e, str) and bool(check(e)) for e in emails]
 
+    @metrics.instrumented()
     def update_student(self, student_id: str, **updates):
         """Update an existing student's fields.
         
@@ -180,110 +513,481 @@ class School:
         :type student_id: str
         :param updates: Field names and new values.
         :raises KeyError: If student ID not found.
-        :raises ValueError: If updated data is invalid.
+        :raises ValueError: If updated data is invalid; the student is left unchanged.
         """
-        s = self.students[student_id]
-        for k,v in updates.items():
-            setattr(s, k, v)
-        s.validate()
+        # validate a copy so a rejected update leaves the stored entity alone
+        s = _updated(self.students[student_id], updates)
+        s.validate(self.email_check)
+        self._put("students", student_id, self._own(s))
 
+    @metrics.instrumented()
     def delete_student(self, student_id: str):
         """Remove a student and all their course enrollments.
         
         :param student_id: ID of student to delete.
         :type student_id: str
         """
-        self.students.pop(student_id, None)
+        affected = self._referrers("courses", "enrolled_students", student_id)
+        self._drop("students", student_id)
         # remove from courses
-        for c in self.courses.values():
+        for cid in affected:
+            c = self._writable("courses", cid)
             if student_id in c.enrolled_students:
                 c.enrolled_students.remove(student_id)
+            self._put("courses", cid, c)
 
     # ---------- CRUD: Instructors ----------
+    @metrics.instrumented()
     def add_instructor(self, ins: Instructor):
-        ins.validate()
+        ins.validate(self.email_check)
         if not ins.instructor_id:
             raise ValueError("instructor_id is required")
-        self.instructors[ins.instructor_id] = ins
+        self._put("instructors", ins.instructor_id, self._own(ins))
 
+    @metrics.instrumented()
     def update_instructor(self, instructor_id: str, **updates):
-        i = self.instructors[instructor_id]
-        for k,v in updates.items():
-            setattr(i, k, v)
-        i.validate()
+        i = _updated(self.instructors[instructor_id], updates)
+        i.validate(self.email_check)
+        self._put("instructors", instructor_id, self._own(i))
 
+    @metrics.instrumented()
     def delete_instructor(self, instructor_id: str):
-        self.instructors.pop(instructor_id, None)
+        affected = self._referrers("courses", "instructor_id", instructor_id)
+        self._drop("instructors", instructor_id)
         # unassign in courses
-        for c in self.courses.values():
-            if c.instructor_id == instructor_id:
-                c.instructor_id = None
+        for cid in affected:
+            c = self._writable("courses", cid)
+            c.instructor_id = None
+            self._put("courses", cid, c)
 
     # ---------- CRUD: Courses ----------
+    @metrics.instrumented()
     def add_course(self, c: Course):
         if not c.course_id.strip():
             raise ValueError("course_id is required")
         if not c.course_name.strip():
             raise ValueError("course_name is required")
-        self.courses[c.course_id] = c
+        self._put("courses", c.course_id, self._own(c))
 
+    @metrics.instrumented()
     def update_course(self, course_id: str, **updates):
-        c = self.courses[course_id]
-        for k,v in updates.items():
-            setattr(c, k, v)
+        c = _updated(self.courses[course_id], updates)
+        self._put("courses", course_id, self._own(c))
 
+    @metrics.instrumented()
     def delete_course(self, course_id: str):
-        self.courses.pop(course_id, None)
+        affected = self._referrers("students", "registered_courses", course_id)
+        for iid in self._referrers("instructors", "assigned_courses", course_id):
+            i = self._writable("instructors", iid)
+            i.assigned_courses.remove(course_id)
+            self._put("instructors", iid, i)
+        self._drop("courses", course_id)
         # remove from student registrations
-        for s in self.students.values():
+        for sid in affected:
+            s = self._writable("students", sid)
             if course_id in s.registered_courses:
                 s.registered_courses.remove(course_id)
+            self._put("students", sid, s)
 
     # ---------- Relationships ----------
+    @metrics.instrumented()
     def register_student_in_course(self, student_id: str, course_id: str):
-        s = self.students[student_id]
-        c = self.courses[course_id]
+        s = self._writable("students", student_id)
+        c = self._writable("courses", course_id)
         s.register_course(course_id)
         c.add_student(student_id)
+        self._put("students", student_id, s)
+        self._put("courses", course_id, c)
 
+    @metrics.instrumented()
     def assign_instructor_to_course(self, instructor_id: str, course_id: str):
-        i = self.instructors[instructor_id]
-        c = self.courses[course_id]
+        i = self._writable("instructors", instructor_id)
+        c = self._writable("courses", course_id)
+        previous = c.instructor_id
+        if previous and previous != instructor_id and previous in self.instructors:
+            p = self._writable("instructors", previous)
+            if course_id in p.assigned_courses:
+                p.assigned_courses.remove(course_id)
+            self._put("instructors", previous, p)
         i.assign_course(course_id)
         c.instructor_id = instructor_id
+        self._put("instructors", instructor_id, i)
+        self._put("courses", course_id, c)
+
+    # ---------- Bulk ----------
+    @metrics.instrumented()
+    def delete_many(self, entity: str, keys: Iterable[str]) -> List[str]:
+        """Delete many entities and every reference to them.
+        
+        Same result as calling ``delete_<entity>`` per key, but an entity
+        that refers to several of the deleted keys is rewritten once.
+        
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param keys: IDs to delete; unknown IDs are ignored.
+        :type keys: Iterable[str]
+        :return: The IDs that were deleted.
+        :rtype: list[str]
+        """
+        table = getattr(self, entity)
+        keys = [k for k in dict.fromkeys(keys) if k in table]
+        gone = set(keys)
+        for ref_entity, field_name in School._REFERENCES[entity]:
+            touched = dict.fromkeys(rk for k in keys for rk in self._referrers(ref_entity, field_name, k))
+            for rk in touched:
+                ref = self._writable(ref_entity, rk)
+                v = getattr(ref, field_name)
+                setattr(ref, field_name, [x for x in v if x not in gone] if isinstance(v, list) else None)
+                self._put(ref_entity, rk, ref)
+        for k in keys:
+            self._drop(entity, k)
+        return keys
+
+    @metrics.instrumented()
+    def register_students_in_course(self, student_ids: Iterable[str], course_id: str):
+        """Enroll many students in one course, storing the course once.
+        
+        :raises KeyError: If the course or a student does not exist.
+        """
+        c = self._writable("courses", course_id)
+        for sid in student_ids:
+            s = self._writable("students", sid)
+            s.register_course(course_id)
+            c.add_student(sid)
+            self._put("students", sid, s)
+        self._put("courses", course_id, c)
+
+    @metrics.instrumented()
+    def assign_instructor_to_courses(self, instructor_id: str, course_ids: Iterable[str]):
+        """Make one instructor teach many courses, storing each instructor once.
+        
+        :raises KeyError: If the instructor or a course does not exist.
+        """
+        i = self._writable("instructors", instructor_id)
+        # previous instructor -> courses they lose
+        previous: Dict[str, Set[str]] = {}
+        for cid in course_ids:
+            c = self._writable("courses", cid)
+            if c.instructor_id and c.instructor_id != instructor_id and c.instructor_id in self.instructors:
+                previous.setdefault(c.instructor_id, set()).add(cid)
+            i.assign_course(cid)
+            c.instructor_id = instructor_id
+            self._put("courses", cid, c)
+        for pid, lost in previous.items():
+            p = self._writable("instructors", pid)
+            p.assigned_courses = [x for x in p.assigned_courses if x not in lost]
+            self._put("instructors", pid, p)
+        self._put("instructors", instructor_id, i)
+
+    # ---------- Renames ----------
+    # entity -> (referring entity, field) pairs that hold its IDs
+    _REFERENCES = {
+        "students": (("courses", "enrolled_students"),),
+        "instructors": (("courses", "instructor_id"),),
+        "courses": (("students", "registered_courses"), ("instructors", "assigned_courses")),
+    }
+
+    @metrics.instrumented()
+    def rename(self, entity: str, old_id: str, new_id: str):
+        """Change an entity's ID and rewrite every reference to it.
+        
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param old_id: Current ID.
+        :type old_id: str
+        :param new_id: New ID.
+        :type new_id: str
+        :raises KeyError: If ``old_id`` does not exist.
+        :raises ValueError: If ``new_id`` is empty or already taken.
+        """
+        self.rename_many(entity, {old_id: new_id})
+
+    def _check_renames(self, entity: str, mapping: Mapping[str, str]) -> Dict[str, str]:
+        """Validate an ``{old_id: new_id}`` mapping and drop unchanged IDs.
+        
+        New IDs may reuse old IDs that are renamed in the same mapping.
+        
+        :raises KeyError: If an old ID does not exist.
+        :raises ValueError: If a new ID is empty, given twice, or already taken.
+        """
+        table = getattr(self, entity)
+        mapping = {o: n for o, n in mapping.items() if n != o}
+        seen: Set[str] = set()
+        for old_id, new_id in mapping.items():
+            if old_id not in table:
+                raise KeyError(old_id)
+            if not new_id:
+                raise ValueError(f"{School._ID_FIELDS[entity]} is required")
+            if new_id in seen or (new_id in table and new_id not in mapping):
+                raise ValueError(f"{new_id} already exists")
+            seen.add(new_id)
+        return mapping
+
+    @metrics.instrumented()
+    def rename_many(self, entity: str, mapping: Mapping[str, str]):
+        """Change many IDs at once and rewrite every reference to them.
+        
+        An entity that refers to several renamed IDs is rewritten once.
+        Chains and swaps (``{"a": "b", "b": "a"}``) are allowed.
+        
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param mapping: ``{old_id: new_id}``.
+        :type mapping: Mapping[str, str]
+        :raises KeyError: If an old ID does not exist.
+        :raises ValueError: If a new ID is empty, given twice, or already taken.
+        """
+        mapping = self._check_renames(entity, mapping)
+        if not mapping:
+            return
+        id_field = School._ID_FIELDS[entity]
+        refs = School._REFERENCES[entity]
+        touched = {ref: dict.fromkeys(rk for old_id in mapping for rk in self._referrers(*ref, old_id))
+                   for ref in refs}
+        moved = {old_id: self._writable(entity, old_id) for old_id in mapping}
+        # store the new rows before their referrers so write-through storage never sees a dangling ID
+        for old_id, obj in moved.items():
+            setattr(obj, id_field, mapping[old_id])
+            self._put(entity, mapping[old_id], obj)
+        for ref_entity, field_name in refs:
+            for key in touched[(ref_entity, field_name)]:
+                ref = self._writable(ref_entity, key)
+                v = getattr(ref, field_name)
+                setattr(ref, field_name, [mapping.get(x, x) for x in v] if isinstance(v, list) else mapping.get(v, v))
+                self._put(ref_entity, key, ref)
+        reused = set(mapping.values())
+        for old_id in mapping:
+            if old_id not in reused:
+                self._drop(entity, old_id)
+
+    # ---------- Integrity ----------
+    # entity -> list field holding the IDs it links to
+    _LINK_FIELDS = {"students": "registered_courses", "instructors": "assigned_courses",
+                    "courses": "enrolled_students"}
+
+    @metrics.instrumented()
+    def verify(self, repair: bool = False) -> List[str]:
+        """Check that both sides of every link agree and name existing IDs.
+
+        Registrations are stored twice (``registered_courses`` and
+        ``enrolled_students``) and teaching once per side (``instructor_id``
+        and ``assigned_courses``). :meth:`from_dict` trusts both sides, so they
+        can drift apart. Each student's courses are checked against one set
+        per course, and each instructor's courses against one set per
+        instructor. The reverse pass, which builds a set per student, only
+        runs when the counts do not match. A healthy model therefore costs
+        one hashed pass over its links.
+
+        Repair keeps every link that one side records and that names two
+        existing entities, and adds it to the other side. Links to missing
+        IDs and duplicate list entries are dropped. An ID that does not match
+        its key is set to the key. If an instructor lists a course that names
+        no existing instructor, the first such instructor becomes its
+        instructor.
+
+        :param repair: Fix the problems found through the School API, so
+            snapshots, indexes and observers see the repaired entities.
+        :type repair: bool
+        :return: Human-readable problem descriptions; empty when consistent.
+        :rtype: list[str]
+        """
+        students, instructors, courses = self.students, self.instructors, self.courses
+        problems: List[str] = []
+        drop: Dict[tuple, Set[str]] = {}       # (entity, key) -> IDs to remove from its list
+        add: Dict[tuple, List[str]] = {}       # (entity, key) -> IDs to append to its list
+        touched: Dict[tuple, None] = {}        # (entity, key) of every entity to rewrite, in order
+        instructor_of: Dict[str, Optional[str]] = {}  # course -> repaired instructor_id
+
+        def fix(entity: str, key: str, removed: Optional[str] = None, added: Optional[str] = None):
+            touched[(entity, key)] = None
+            if removed is not None:
+                drop.setdefault((entity, key), set()).add(removed)
+            if added is not None:
+                add.setdefault((entity, key), []).append(added)
+
+        def misfiled(entity: str, key: str, obj):
+            problems.append(f"{entity} {key} is stored with {School._ID_FIELDS[entity]} "
+                            f"{getattr(obj, School._ID_FIELDS[entity])}")
+            fix(entity, key)
+
+        def duplicated(entity: str, key: str, ids: List[str]):
+            problems.append(f"{entity[:-1]} {key} lists an ID more than once")
+            fix(entity, key)
+            return dict.fromkeys(ids)
+
+        # registrations: students' lists against per-course sets, the reverse only if the counts differ
+        enrolled = {}
+        for cid, c in courses.items():
+            if c.course_id != cid:
+                misfiled("courses", cid, c)
+            ids = c.enrolled_students
+            members = enrolled[cid] = set(ids)
+            if len(members) != len(ids):
+                duplicated("courses", cid, ids)
+        matched = 0
+        for sid, s in students.items():
+            if s.student_id != sid:
+                misfiled("students", sid, s)
+            regs = s.registered_courses
+            if len(regs) > 1 and len(set(regs)) != len(regs):
+                regs = duplicated("students", sid, regs)
+            for cid in regs:
+                members = enrolled.get(cid)
+                if members is not None and sid in members:
+                    matched += 1
+                elif members is None:
+                    problems.append(f"student {sid} lists missing course {cid}")
+                    fix("students", sid, removed=cid)
+                else:
+                    problems.append(f"student {sid} lists course {cid}, which does not list them")
+                    fix("courses", cid, added=sid)
+        if matched != sum(map(len, enrolled.values())):
+            registered = {sid: set(s.registered_courses) for sid, s in students.items()}
+            for cid, c in courses.items():
+                for sid in dict.fromkeys(c.enrolled_students):
+                    regs = registered.get(sid)
+                    if regs is None:
+                        problems.append(f"course {cid} lists missing student {sid}")
+                        fix("courses", cid, removed=sid)
+                    elif cid not in regs:
+                        problems.append(f"course {cid} lists student {sid}, who does not list it")
+                        fix("students", sid, added=cid)
+
+        # teaching: instructors' lists against the courses naming them, the reverse only if the counts differ
+        taught: Dict[str, Set[str]] = {}
+        for cid, c in courses.items():
+            if c.instructor_id:
+                taught.setdefault(c.instructor_id, set()).add(cid)
+        matched = 0
+        for iid, ins in instructors.items():
+            if ins.instructor_id != iid:
+                misfiled("instructors", iid, ins)
+            mine = taught.get(iid, ())
+            ids = ins.assigned_courses
+            if len(ids) > 1 and len(set(ids)) != len(ids):
+                ids = duplicated("instructors", iid, ids)
+            for cid in ids:
+                if cid in mine:
+                    matched += 1
+                    continue
+                c = courses.get(cid)
+                owner = instructor_of.get(cid, c.instructor_id if c is not None else None)
+                if c is None:
+                    problems.append(f"instructor {iid} lists missing course {cid}")
+                    fix("instructors", iid, removed=cid)
+                elif owner and owner in instructors:
+                    problems.append(f"instructor {iid} lists course {cid}, taught by {owner}")
+                    fix("instructors", iid, removed=cid)
+                else:
+                    problems.append(f"instructor {iid} lists course {cid}, which names "
+                                    + (f"missing instructor {owner}" if owner else "no instructor"))
+                    instructor_of[cid] = iid
+                    fix("courses", cid)
+        if matched != sum(len(cids) for iid, cids in taught.items() if iid in instructors) \
+                or not taught.keys() <= instructors.keys():
+            for iid, cids in taught.items():
+                ins = instructors.get(iid)
+                claimed = set(ins.assigned_courses) if ins is not None else ()
+                for cid in cids:
+                    if ins is None and cid not in instructor_of:
+                        problems.append(f"course {cid} names missing instructor {iid}")
+                        instructor_of[cid] = None
+                        fix("courses", cid)
+                    elif ins is not None and cid not in claimed:
+                        problems.append(f"course {cid} is taught by {iid}, who does not list it")
+                        fix("instructors", iid, added=cid)
+
+        if repair:
+            for entity, key in touched:
+                obj = self._writable(entity, key)
+                setattr(obj, School._ID_FIELDS[entity], key)
+                field_name = School._LINK_FIELDS[entity]
+                gone = drop.get((entity, key), ())
+                ids = dict.fromkeys(getattr(obj, field_name) + add.get((entity, key), []))
+                setattr(obj, field_name, [x for x in ids if x not in gone])
+                if entity == "courses" and key in instructor_of:
+                    obj.instructor_id = instructor_of[key]
+                self._put(entity, key, obj)
+        metrics.record("models.School.verify", rows=len(problems))
+        return problems
 
     # ---------- Search ----------
+    _ID_FIELDS = {"students": "student_id", "instructors": "instructor_id", "courses": "course_id"}
+    _SEARCH_FIELDS = {
+        "students": ("name", "student_id"),
+        "instructors": ("name", "instructor_id"),
+        "courses": ("course_id", "course_name", "instructor_id"),
+    }
+    # entity -> (rows, lowercase text) -> rows matching on _SEARCH_FIELDS; spelled out
+    # inline because a predicate call per row costs as much as the comparison itself
+    _SEARCH_SCAN = {
+        "students": lambda rows, t: (s for s in rows if t in s.name.lower() or t in s.student_id.lower()),
+        "instructors": lambda rows, t: (i for i in rows if t in i.name.lower() or t in i.instructor_id.lower()),
+        "courses": lambda rows, t: (c for c in rows if t in c.course_id.lower() or t in c.course_name.lower()
+                                    or (c.instructor_id and t in c.instructor_id.lower())),
+    }
+
+    def search_iter(self, text: str, entity: str, limit: Optional[int] = None):
+        """Lazily yield entities of one collection containing the given text.
+        
+        Matches the same fields as :meth:`search` and stops after ``limit``
+        hits, so showing the first page costs only that page.
+        
+        :param text: Search term (case-insensitive); empty yields everything.
+        :type text: str
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param limit: Maximum number of results, or None for all.
+        :type limit: int | None
+        :return: Iterator of matching entities.
+        """
+        text = normalize(text)
+        def compute():
+            # a plain scan; query() only pays off once an index or ordering is involved
+            rows = iter(getattr(self, entity).values())
+            if text:
+                rows = School._SEARCH_SCAN[entity](rows, text)
+            return rows if limit is None else islice(rows, max(0, limit))
+        return self._cached_search(entity, text, limit, compute)
+
+    @metrics.instrumented()
+    def fuzzy_search(self, text: str, entity: str, limit: int = 10, min_score: float = 0.3) -> List[tuple]:
+        """Rank entities of one collection by typo-tolerant similarity to ``text``.
+        
+        Uses trigram indexes on the collection's search fields, creating any
+        that are missing on first use (after that they are maintained on
+        every write like other indexes), so ``"Jonh"`` finds ``"John"``
+        without comparing against every row.
+        
+        :param text: Search term.
+        :type text: str
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param limit: Maximum number of results.
+        :type limit: int
+        :param min_score: Minimum word similarity in ``[0, 1]``.
+        :type min_score: float
+        :return: ``(score, entity)`` pairs, best first.
+        :rtype: list[tuple[float, object]]
+        """
+        indexes = [self.create_index(entity, f, "trigram") for f in School._SEARCH_FIELDS[entity]]
+        table = getattr(self, entity)
+        return [(sc, table[key]) for sc, key in fuzzy_rank(indexes, text, limit, min_score)]
+
+    @metrics.instrumented()
     def search(self, text: str):
         """Search for entities containing the given text.
         
         Searches names and IDs of students, instructors, and courses.
-        If text is empty, returns all entities.
+        If text is empty, returns all entities. Use :meth:`search_iter` to
+        avoid building the full lists.
         
         :param text: Search term (case-insensitive).
         :type text: str
         :return: Dictionary with lists of matching students, instructors, courses.
         :rtype: dict[str, list]
         """
-        text = (text or "").lower().strip()
-        results = {"students": [], "instructors": [], "courses": []}
-        if not text:
-            results["students"] = list(self.students.values())
-            results["instructors"] = list(self.instructors.values())
-            results["courses"] = list(self.courses.values())
-            return results
-
-        for s in self.students.values():
-            if text in s.name.lower() or text in s.student_id.lower():
-                results["students"].append(s)
-        for i in self.instructors.values():
-            if text in i.name.lower() or text in i.instructor_id.lower():
-                results["instructors"].append(i)
-        for c in self.courses.values():
-            if (text in c.course_id.lower() or 
-                text in c.course_name.lower() or
-                (c.instructor_id and text in c.instructor_id.lower())):
-                results["courses"].append(c)
-        return results
+        return {e: list(self.search_iter(text, e)) for e in ("students", "instructors", "courses")}
 
     # ---------- Serialization ----------
     def to_dict(self) -> dict:
@@ -296,13 +1000,43 @@ class School:
     @classmethod
     def from_dict(cls, data: dict) -> "School":
         sc = cls()
-        for s in data.get("students", []):
-            st = Student(**{k:v for k,v in s.items() if k in {"name","age","_email","student_id","registered_courses"}})
-            sc.students[st.student_id] = st
-        for i in data.get("instructors", []):
-            ins = Instructor(**{k:v for k,v in i.items() if k in {"name","age","_email","instructor_id","assigned_courses"}})
-            sc.instructors[ins.instructor_id] = ins
-        for c in data.get("courses", []):
-            co = Course(**{k:v for k,v in c.items() if k in {"course_id","course_name","instructor_id","enrolled_students"}})
-            sc.courses[co.course_id] = co
+        sts = [Student(**{k:v for k,v in s.items() if k in {"name","age","_email","student_id","registered_courses"}})
+               for s in data.get("students", [])]
+        sc.students = {st.student_id: st for st in sts}
+        inss = [Instructor(**{k:v for k,v in i.items() if k in {"name","age","_email","instructor_id","assigned_courses"}})
+                for i in data.get("instructors", [])]
+        sc.instructors = {ins.instructor_id: ins for ins in inss}
+        cos = [Course(**{k:v for k,v in c.items() if k in {"course_id","course_name","instructor_id","enrolled_students"}})
+               for c in data.get("courses", [])]
+        sc.courses = {co.course_id: co for co in cos}
         return sc
+
+class SchoolSnapshot:
+    """Immutable point-in-time view of a :class:`School`.
+    
+    Returned by :meth:`School.snapshot`. Supports the read-only School API
+    (``search``, ``to_dict``), so it can be passed to ``save_json`` or
+    ``export_csv`` while the live School keeps being edited. Entities must not
+    be mutated through a snapshot.
+    
+    :ivar students: Mapping of student IDs to Student objects.
+    :vartype students: PMap[str, Student]
+    :ivar instructors: Mapping of instructor IDs to Instructor objects.
+    :vartype instructors: PMap[str, Instructor]
+    :ivar courses: Mapping of course IDs to Course objects.
+    :vartype courses: PMap[str, Course]
+    """
+    __slots__ = ("students", "instructors", "courses")
+
+    def __init__(self, students: Mapping[str, Student], instructors: Mapping[str, Instructor],
+                 courses: Mapping[str, Course]):
+        self.students = students
+        self.instructors = instructors
+        self.courses = courses
+
+    search = School.search
+    search_iter = School.search_iter
+    _cached_search = School._cached_search
+    roster = School.roster
+    to_dict = School.to_dict
+    query = School.query
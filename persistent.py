@@ -0,0 +1,365 @@
+"""Persistent (immutable) mappings for the School Management System.
+
+Provides an insertion-ordered persistent map built from a hash array mapped
+trie (HAMT) for key lookup and a 32-way vector trie for ordered storage.
+Every update copies only the nodes on the path to the changed slot, so old
+versions stay valid and can be shared freely between threads.
+"""
+
+from __future__ import annotations
+from itertools import chain
+from collections.abc import ItemsView, Mapping, MutableMapping, ValuesView
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_MASK = (1 << 64) - 1
+_MISSING = object()
+_TOMB = object()
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(x: int) -> int:
+        return bin(x).count("1")
+
+# ---------------------- HAMT (key -> position) ----------------------
+class _Node:
+    """Bitmap-indexed trie node; slots are ``(hash, key, pos)`` tuples or child nodes."""
+    __slots__ = ("bitmap", "items")
+
+    def __init__(self, bitmap: int, items: tuple):
+        self.bitmap = bitmap
+        self.items = items
+
+class _Collision:
+    """Leaf holding several keys whose full 64-bit hashes are equal."""
+    __slots__ = ("h", "pairs")
+
+    def __init__(self, h: int, pairs: tuple):
+        self.h = h
+        self.pairs = pairs
+
+_EMPTY_NODE = _Node(0, ())
+
+def _slot_hash(slot) -> int:
+    return slot[0] if type(slot) is tuple else slot.h
+
+def _merge(shift: int, a, b) -> _Node:
+    """Build the smallest subtree holding two slots with different hashes."""
+    ia = (_slot_hash(a) >> shift) & _MASK
+    ib = (_slot_hash(b) >> shift) & _MASK
+    if ia == ib:
+        return _Node(1 << ia, (_merge(shift + _BITS, a, b),))
+    if ia < ib:
+        return _Node((1 << ia) | (1 << ib), (a, b))
+    return _Node((1 << ia) | (1 << ib), (b, a))
+
+def _lookup(node, h: int, key):
+    shift = 0
+    while True:
+        if type(node) is _Collision:
+            for k, pos in node.pairs:
+                if k is key or k == key:
+                    return pos
+            return _MISSING
+        bit = 1 << ((h >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return _MISSING
+        slot = node.items[_popcount(node.bitmap & (bit - 1))]
+        if type(slot) is tuple:
+            if slot[0] == h and (slot[1] is key or slot[1] == key):
+                return slot[2]
+            return _MISSING
+        node = slot
+        shift += _BITS
+
+def _assoc(node, shift: int, h: int, key, pos: int):
+    """Return ``node`` with ``key`` mapped to ``pos`` (path-copied)."""
+    if type(node) is _Collision:
+        if node.h == h:
+            pairs = tuple(p for p in node.pairs if not (p[0] is key or p[0] == key))
+            return _Collision(h, pairs + ((key, pos),))
+        return _merge(shift, node, (h, key, pos))
+    bit = 1 << ((h >> shift) & _MASK)
+    idx = _popcount(node.bitmap & (bit - 1))
+    items = node.items
+    if not node.bitmap & bit:
+        return _Node(node.bitmap | bit, items[:idx] + ((h, key, pos),) + items[idx:])
+    slot = items[idx]
+    if type(slot) is tuple:
+        if slot[0] == h and (slot[1] is key or slot[1] == key):
+            new = (h, key, pos)
+        elif slot[0] == h:
+            new = _Collision(h, ((slot[1], slot[2]), (key, pos)))
+        else:
+            new = _merge(shift + _BITS, slot, (h, key, pos))
+    else:
+        new = _assoc(slot, shift + _BITS, h, key, pos)
+    return _Node(node.bitmap, items[:idx] + (new,) + items[idx + 1:])
+
+def _dissoc(node, shift: int, h: int, key):
+    """Return ``node`` without ``key``; ``None`` when the node becomes empty."""
+    if type(node) is _Collision:
+        pairs = tuple(p for p in node.pairs if not (p[0] is key or p[0] == key))
+        if len(pairs) == 1:
+            return (h, pairs[0][0], pairs[0][1])
+        return _Collision(h, pairs)
+    bit = 1 << ((h >> shift) & _MASK)
+    idx = _popcount(node.bitmap & (bit - 1))
+    slot = node.items[idx]
+    if type(slot) is tuple:
+        new = None
+    else:
+        new = _dissoc(slot, shift + _BITS, h, key)
+        # pull a lone entry up so lookups stay short
+        if type(new) is _Node and len(new.items) == 1 and type(new.items[0]) is tuple:
+            new = new.items[0]
+    if new is None:
+        if node.bitmap == bit:
+            return None
+        return _Node(node.bitmap ^ bit, node.items[:idx] + node.items[idx + 1:])
+    return _Node(node.bitmap, node.items[:idx] + (new,) + node.items[idx + 1:])
+
+def _build(slots: list, shift: int):
+    """Build a HAMT node bottom-up from ``(hash, key, pos)`` slots."""
+    if not slots:
+        return _EMPTY_NODE
+    if shift >= 64:
+        return _Collision(slots[0][0], tuple((k, pos) for _, k, pos in slots))
+    buckets = {}
+    for slot in slots:
+        buckets.setdefault((slot[0] >> shift) & _MASK, []).append(slot)
+    bitmap = 0
+    items = []
+    for i in sorted(buckets):
+        bitmap |= 1 << i
+        group = buckets[i]
+        items.append(group[0] if len(group) == 1 else _build(group, shift + _BITS))
+    return _Node(bitmap, tuple(items))
+
+# ---------------------- Vector trie (position -> entry) ----------------------
+def _vec_get(root: tuple, shift: int, i: int):
+    node = root
+    while shift:
+        node = node[(i >> shift) & _MASK]
+        shift -= _BITS
+    return node[i & _MASK]
+
+def _vec_set(node, shift: int, i: int, value) -> tuple:
+    """Return ``node`` with slot ``i`` set; appends when ``i`` is one past the end."""
+    node = node or ()
+    idx = (i >> shift) & _MASK
+    if shift:
+        child = _vec_set(node[idx] if idx < len(node) else None, shift - _BITS, i, value)
+    else:
+        child = value
+    return node[:idx] + (child,) + node[idx + 1:]
+
+def _vec_iter(node: tuple, shift: int):
+    if not shift:
+        yield from node
+        return
+    for child in node:
+        yield from _vec_iter(child, shift - _BITS)
+
+def _vec_build(entries: list):
+    """Build a vector trie bottom-up from a list; returns ``(root, shift)``."""
+    level = [tuple(entries[i:i + _WIDTH]) for i in range(0, len(entries), _WIDTH)] or [()]
+    shift = 0
+    while len(level) > 1:
+        level = [tuple(level[i:i + _WIDTH]) for i in range(0, len(level), _WIDTH)]
+        shift += _BITS
+    return level[0], shift
+
+# ---------------------- Public maps ----------------------
+class PMap(Mapping):
+    """Immutable, insertion-ordered mapping with O(log32 n) path-copying updates.
+
+    ``set`` and ``delete`` return a new map and leave the receiver untouched,
+    so a ``PMap`` can be iterated from any thread without locking.
+    """
+    __slots__ = ("_index", "_root", "_shift", "_count", "_len")
+
+    def __init__(self):
+        self._index = _EMPTY_NODE
+        self._root = ()
+        self._shift = 0
+        self._count = 0
+        self._len = 0
+
+    @classmethod
+    def from_items(cls, items) -> "PMap":
+        """Build a map from ``(key, value)`` pairs in one pass.
+
+        :param items: Iterable of key/value pairs; later duplicates win.
+        :return: New map.
+        :rtype: PMap
+        """
+        positions = {}
+        entries = []
+        for k, v in items:
+            pos = positions.get(k)
+            if pos is None:
+                positions[k] = len(entries)
+                entries.append((k, v))
+            else:
+                entries[pos] = (k, v)
+        m = cls()
+        m._index = _build([(hash(k) & _HASH_MASK, k, pos) for k, pos in positions.items()], 0)
+        m._root, m._shift = _vec_build(entries)
+        m._count = m._len = len(entries)
+        return m
+
+    def _copy(self, index, root, shift, count, length) -> "PMap":
+        m = PMap.__new__(PMap)
+        m._index, m._root, m._shift, m._count, m._len = index, root, shift, count, length
+        return m
+
+    def __getitem__(self, key):
+        pos = _lookup(self._index, hash(key) & _HASH_MASK, key)
+        if pos is _MISSING:
+            raise KeyError(key)
+        return _vec_get(self._root, self._shift, pos)[1]
+
+    def __contains__(self, key) -> bool:
+        return _lookup(self._index, hash(key) & _HASH_MASK, key) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _entries(self):
+        for e in _vec_iter(self._root, self._shift):
+            if e is not _TOMB:
+                yield e
+
+    def __iter__(self):
+        for e in self._entries():
+            yield e[0]
+
+    def values(self):
+        return _PValuesView(self)
+
+    def items(self):
+        return _PItemsView(self)
+
+    def set(self, key, value) -> "PMap":
+        """Return a copy of the map with ``key`` bound to ``value``.
+
+        :param key: Hashable key.
+        :param value: Value to store.
+        :return: New map sharing all untouched nodes with this one.
+        :rtype: PMap
+        """
+        h = hash(key) & _HASH_MASK
+        pos = _lookup(self._index, h, key)
+        if pos is not _MISSING:
+            root = _vec_set(self._root, self._shift, pos, (key, value))
+            return self._copy(self._index, root, self._shift, self._count, self._len)
+        pos = self._count
+        root, shift = self._root, self._shift
+        if pos == 1 << (shift + _BITS):
+            root, shift = (root,), shift + _BITS
+        root = _vec_set(root, shift, pos, (key, value))
+        index = _assoc(self._index, 0, h, key, pos)
+        return self._copy(index, root, shift, pos + 1, self._len + 1)
+
+    def delete(self, key) -> "PMap":
+        """Return a copy of the map without ``key``.
+
+        :param key: Key to remove.
+        :raises KeyError: If the key is not present.
+        :return: New map.
+        :rtype: PMap
+        """
+        h = hash(key) & _HASH_MASK
+        pos = _lookup(self._index, h, key)
+        if pos is _MISSING:
+            raise KeyError(key)
+        if self._len == 1:
+            return PMap()
+        # compact once tombstones outnumber live entries
+        if self._count - self._len + 1 > max(self._len, _WIDTH):
+            return PMap.from_items((k, v) for k, v in self._entries() if not (k is key or k == key))
+        index = _dissoc(self._index, 0, h, key) or _EMPTY_NODE
+        root = _vec_set(self._root, self._shift, pos, _TOMB)
+        return self._copy(index, root, self._shift, self._count, self._len - 1)
+
+    def __reduce__(self):
+        # string hashes are salted per process, so rebuild the trie on load
+        return (PMap.from_items, (list(self._entries()),))
+
+    def __repr__(self) -> str:
+        return f"PMap({dict(self._entries())!r})"
+
+class _PValuesView(ValuesView):
+    def __iter__(self):
+        for e in self._mapping._entries():
+            yield e[1]
+
+class _PItemsView(ItemsView):
+    def __iter__(self):
+        return self._mapping._entries()
+
+class PersistentDict(MutableMapping):
+    """Mutable dict-like facade over a :class:`PMap`.
+
+    Writes swap in a new :class:`PMap`; :meth:`freeze` hands out the current
+    version in O(1) and it never changes afterwards.
+    """
+    __slots__ = ("_map",)
+
+    def __init__(self, items=()):
+        self._map = PMap.from_items(items.items() if isinstance(items, Mapping) else items)
+
+    def freeze(self) -> PMap:
+        """Return the current contents as an immutable map.
+
+        :return: Snapshot of this mapping.
+        :rtype: PMap
+        """
+        return self._map
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def __setitem__(self, key, value):
+        self._map = self._map.set(key, value)
+
+    def extend(self, items):
+        """Insert many ``(key, value)`` pairs, rebuilding in one pass for large batches.
+
+        :param items: Pairs to insert; later duplicates win, as with ``dict.update``.
+        """
+        items = list(items)
+        if len(items) > len(self._map):
+            self._map = PMap.from_items(chain(self._map.items(), items))
+            return
+        m = self._map
+        for k, v in items:
+            m = m.set(k, v)
+        self._map = m
+
+    def __delitem__(self, key):
+        self._map = self._map.delete(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._map
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def values(self):
+        return self._map.values()
+
+    def items(self):
+        return self._map.items()
+
+    def __reduce__(self):
+        return (PersistentDict, (list(self._map._entries()),))
+
+    def __repr__(self) -> str:
+        return f"PersistentDict({dict(self._map._entries())!r})"
@@ -1,372 +1,204 @@
 import sys
-import json
-import csv
-import re
-import os
-import sqlite3
-import shutil
-from datetime import datetime
+import time
 from PyQt5 import QtWidgets, QtCore
-
-class Person:
-    def __init__(self, name, age, _email):
-        self.name = name
-        self.age = age
-        self._email = _email
-    def introduce(self):
-        print("My name is " + self.name + ". I am " + str(self.age) + " years old.")
-
-class Student(Person):
-    def __init__(self, name, age, _email, student_id):
-        Person.__init__(self, name, age, _email)
-        self.student_id = student_id
-        self.registered_courses = []
-    def register_course(self, course):
-        self.registered_courses.append(course)
-
-class Instructor(Person):
-    def __init__(self, name, age, _email, instructor_id):
-        Person.__init__(self, name, age, _email)
-        self.instructor_id = instructor_id
-        self.assigned_courses = []
-    def assign_course(self, course):
-        self.assigned_courses.append(course)
-
-class Course:
-    def __init__(self, course_id, course_name, instructor):
-        self.course_id = course_id
-        self.course_name = course_name
-        self.instructor = instructor
-        self.enrolled_students = []
-    def add_student(self, student):
-        self.enrolled_students.append(student)
-
-
-
-def is_valid_email(x):
-    p = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
-    m = re.match(p, x)
-    if m:
-        return True
-    else:
-        return False
-
-
-
-def is_valid_age(x):
-    try:
-        v = int(x)
-    except:
-        return False
-    if v >= 0:
-        
-        return True
-    else:
-        return False
-
-
-students = []
-instructors = []
-courses = []
+import metrics
+from utils import is_loose_email as is_valid_email, non_negative_int as is_valid_age
+# csv, shutil, datetime, models and engine are imported where they are used so
+# the window can be shown before they load
 
 dbPath = "school.db"
-conn = None
+# engine.Engine over dbPath, created by init_db; its School is the only copy of the data
+engine = None
 
+@metrics.instrumented()
 def init_db(path):
-    global conn
-    needCreate = not os.path.exists(path)
-    conn = sqlite3.connect(path)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS students(
-        student_id TEXT PRIMARY KEY,
-        name TEXT,
-        age INTEGER,
-        email TEXT
-    )""")
-    
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS instructors(
-        instructor_id TEXT PRIMARY KEY,
-        name TEXT,
-        age INTEGER,
-        email TEXT
-    )""")
-    
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS courses(
-        course_id TEXT PRIMARY KEY,
-        course_name TEXT,
-        instructor_id TEXT,
-        FOREIGN KEY(instructor_id) REFERENCES instructors(instructor_id)
-            ON UPDATE CASCADE ON DELETE SET NULL
-    )""")
-    
-    conn.execute("""
-    CREATE TABLE IF NOT EXISTS registrations(
-        student_id TEXT,
-        course_id TEXT,
-        PRIMARY KEY(student_id, course_id),
-        FOREIGN KEY(student_id) REFERENCES students(student_id)
-            ON UPDATE CASCADE ON DELETE CASCADE,
-        FOREIGN KEY(course_id) REFERENCES courses(course_id)
-            ON UPDATE CASCADE ON DELETE CASCADE
-    )""")
-    
-    conn.commit()
-
-def reload_from_db():
-    students[:] = []
-    instructors[:] = []
-    courses[:] = []
-    insById = {}
-    crsById = {}
-    stuById = {}
-    
-    c1 = conn.execute("SELECT instructor_id, name, age, email FROM instructors")
-    for r in c1.fetchall():
-        ins = Instructor(r["name"], r["age"], r["email"], r["instructor_id"])
-        instructors.append(ins)
-        insById[ins.instructor_id] = ins
-    c2 = conn.execute("SELECT course_id, course_name, instructor_id FROM courses")
-    
-    for r in c2.fetchall():
-        insObj = None
-        if r["instructor_id"] in insById:
-            insObj = insById[r["instructor_id"]]
-        c = Course(r["course_id"], r["course_name"], insObj)
-        courses.append(c)
-        crsById[c.course_id] = c
-        if insObj:
-            found = False
-            for k in insObj.assigned_courses:
-                if k.course_id == c.course_id:
-                    found = True
-            if not found:
-                
-                insObj.assign_course(c)
-    c3 = conn.execute("SELECT student_id, name, age, email FROM students")
-    
-    
-    
-    
-    for r in c3.fetchall():
-        s = Student(r["name"], r["age"], r["email"], r["student_id"])
-        students.append(s)
-        stuById[s.student_id] = s
-    c4 = conn.execute("SELECT student_id, course_id FROM registrations")
-    
-    
-    
-    
-    
-    
-    
-    for r in c4.fetchall():
-        s = stuById.get(r["student_id"])
-        c = crsById.get(r["course_id"])
-        if s and c:
-            foundA = False
-            for k in s.registered_courses:
-                if k.course_id == c.course_id:
-                    foundA = True
-            if not foundA:
-                s.register_course(c)
-            foundB = False
-            for k in c.enrolled_students:
-                if k.student_id == s.student_id:
-                    foundB = True
-            if not foundB:
-                c.add_student(s)
-                
-
+    global engine
+    from engine import Engine
+    if engine is None or str(engine.path) != str(path):
+        # the window has always accepted any "x@y.z" address; keep it able to add and edit those
+        engine = Engine(path, email_check=is_valid_email)
+    engine.open()
+
+@metrics.instrumented()
+def reload_from_db(useCache=False):
+    hit = engine.load(use_cache=useCache)
+    sc = engine.school
+    metrics.record("pyqt_core.reload_from_db", rows=len(sc.students) + len(sc.instructors) + len(sc.courses))
+    return hit
+
+def fuzzy_hits(k, t, limit=50):
+    return [o for score, o in engine.school.fuzzy_search(t, ENTITY[k], limit)]
+
+# search type combo text -> School collection
+ENTITY = {"Student": "students", "Instructor": "instructors", "Course": "courses"}
+
+@metrics.instrumented()
 def exists_student(sid):
-    q = conn.execute("SELECT 1 FROM students WHERE student_id = ?", (sid,))
-    r = q.fetchone()
-    if r:
-        return True
-    else:
-        return False
+    return engine.exists("students", sid)
 
+@metrics.instrumented()
 def exists_instructor(iid):
-    q = conn.execute("SELECT 1 FROM instructors WHERE instructor_id = ?", (iid,))
-    r = q.fetchone()
-    if r:
-        return True
-    else:
-        return False
-    
+    return engine.exists("instructors", iid)
+
+@metrics.instrumented()
 def exists_course(cid):
-    q = conn.execute("SELECT 1 FROM courses WHERE course_id = ?", (cid,))
-    r = q.fetchone()
-    if r:
-        return True
-    else:
-        
-        return False
+    return engine.exists("courses", cid)
 
+@metrics.instrumented()
 def db_add_student(n, a, e, sid):
-    if exists_student(sid):
-        
-        return False
-    conn.execute("INSERT INTO students(student_id, name, age, email) VALUES(?,?,?,?)", (sid, n, int(a), e))
-    conn.commit()
-    return True
+    from models import Student
+    return engine.add_student(Student(name=n, age=int(a), _email=e, student_id=sid))
 
+@metrics.instrumented()
 def db_add_instructor(n, a, e, iid):
-    if exists_instructor(iid):
-        
-        return False
-    conn.execute("INSERT INTO instructors(instructor_id, name, age, email) VALUES(?,?,?,?)", (iid, n, int(a), e))
-    conn.commit()
-    return True
+    from models import Instructor
+    return engine.add_instructor(Instructor(name=n, age=int(a), _email=e, instructor_id=iid))
 
+@metrics.instrumented()
 def db_add_course(cid, cname, insId):
-    if exists_course(cid):
-        return False
-    okIns = exists_instructor(insId)
-    if not okIns:
-        return False
-    conn.execute("INSERT INTO courses(course_id, course_name, instructor_id) VALUES(?,?,?)", (cid, cname, insId))
-    conn.commit()
-    return True
+    from models import Course
+    return engine.add_course(Course(course_id=cid, course_name=cname, instructor_id=insId))
 
+@metrics.instrumented()
 def db_register(sid, cid):
-    okS = exists_student(sid)
-    
-    if not okS:
-        return False
-    okC = exists_course(cid)
-    if not okC:
-        return False
-    q = conn.execute("SELECT 1 FROM registrations WHERE student_id=? AND course_id=?", (sid, cid))
-    r = q.fetchone()
-    if r:
-        return True
-    conn.execute("INSERT INTO registrations(student_id, course_id) VALUES(?,?)", (sid, cid))
-    conn.commit()
-    return True
+    return engine.register(sid, cid)
 
+@metrics.instrumented()
 def db_assign_instructor(cid, iid):
-    okC = exists_course(cid)
-    if not okC:
-        return False
-    
-    okI = exists_instructor(iid)
-    if not okI:
-        return False
-    conn.execute("UPDATE courses SET instructor_id = ? WHERE course_id = ?", (iid, cid))
-    conn.commit()
-    return True
+    return engine.assign_instructor(cid, iid)
 
+@metrics.instrumented()
 def db_update_student(oldId, newName, newAge, newEmail, newId):
-    if newId != oldId:
-        if exists_student(newId):
-            return False
-    conn.execute("UPDATE registrations SET student_id=? WHERE student_id=?", (newId, oldId))
-    conn.execute("UPDATE students SET student_id=?, name=?, age=?, email=? WHERE student_id=?", (newId, newName, int(newAge), newEmail, oldId))
-    conn.commit()
-    
-    return True
+    return engine.update_student(oldId, newId, name=newName, age=int(newAge), _email=newEmail)
 
+@metrics.instrumented()
 def db_update_instructor(oldId, newName, newAge, newEmail, newId):
-    if newId != oldId:
-        if exists_instructor(newId):
-            return False
-    conn.execute("UPDATE instructors SET instructor_id=?, name=?, age=?, email=? WHERE instructor_id=?", (newId, newName, int(newAge), newEmail, oldId))
-    conn.commit()
-    return True
+    return engine.update_instructor(oldId, newId, name=newName, age=int(newAge), _email=newEmail)
 
+@metrics.instrumented()
 def db_update_course(oldId, newId, newName, newInsId):
-    if newId != oldId:
-        if exists_course(newId):
-            return False
-        
-    okI = exists_instructor(newInsId)
-    if not okI:
-        return False
-    conn.execute("UPDATE registrations SET course_id=? WHERE course_id=?", (newId, oldId))
-    conn.execute("UPDATE courses SET course_id=?, course_name=?, instructor_id=? WHERE course_id=?", (newId, newName, newInsId, oldId))
-    conn.commit()
-    
-    return True
-
-def db_delete_student(sid):
-    conn.execute("DELETE FROM students WHERE student_id = ?", (sid,))
-    conn.commit()
-    
-    return True
-
-def db_delete_instructor(iid):
-    conn.execute("UPDATE courses SET instructor_id = NULL WHERE instructor_id = ?", (iid,))
-    conn.execute("DELETE FROM instructors WHERE instructor_id = ?", (iid,))
-    conn.commit()
-    
-    return True
-
-
-def db_delete_course(cid):
-    conn.execute("DELETE FROM courses WHERE course_id = ?", (cid,))
-    conn.commit()
-    return True
+    return engine.update_course(oldId, newId, newName, newInsId)
 
+@metrics.instrumented()
+def db_delete_many(entity, ids):
+    return engine.delete_many(entity, ids)
+
+@metrics.instrumented()
+def db_register_many(sids, cid):
+    return engine.register_many(sids, cid)
+
+@metrics.instrumented()
+def db_assign_instructor_many(cids, iid):
+    return engine.assign_instructor_many(cids, iid)
+
+@metrics.instrumented()
 def backup_db():
+    import shutil
+    from datetime import datetime
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     outName = "backup_school_" + ts + ".db"
-    shutil.copyfile(dbPath, outName)
+    shutil.copyfile(engine.path, outName)
     return outName
 
+# the window's CSV format; every edit is already written through, so export straight from SQLite
+QT_CSV_LAYOUT = {
+    "students.csv": (["student_id","name","age","email","courses"],
+                     """SELECT s.student_id, s.name, s.age, s.email,
+                               (SELECT group_concat(r.course_id) FROM registrations r WHERE r.student_id = s.student_id)
+                        FROM students s""", "students"),
+    "instructors.csv": (["instructor_id","name","age","email","courses"],
+                        """SELECT i.instructor_id, i.name, i.age, i.email, g.ids FROM instructors i
+                           LEFT JOIN (SELECT instructor_id, group_concat(course_id) AS ids FROM courses
+                                      GROUP BY instructor_id) g ON g.instructor_id = i.instructor_id""", "instructors"),
+    "courses.csv": (["course_id","course_name","instructor_id","enrolled_count"],
+                    """SELECT c.course_id, c.course_name, c.instructor_id, coalesce(g.n, 0) FROM courses c
+                       LEFT JOIN (SELECT course_id, count(*) AS n FROM registrations
+                                  GROUP BY course_id) g ON g.course_id = c.course_id""", "courses"),
+}
+
+@metrics.instrumented()
 def export_csv_qt():
+    import storage
     try:
-        with open("students.csv", "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["student_id","name","age","email","courses"])
-            for s in students:
-                cids = []
-                for c in s.registered_courses:
-                    cids.append(c.course_id)
-                    
-                    
-                    
-                    
-                    
-                    
-                    
-                w.writerow([s.student_id, s.name, s.age, s._email, ",".join(cids)])
-        with open("instructors.csv", "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["instructor_id","name","age","email","courses"])
-            
-            
-            for ins in instructors:
-                
-                
-                
-                
-                
-                cids = []
-                for c in ins.assigned_courses:
-                    cids.append(c.course_id)
-                w.writerow([ins.instructor_id, ins.name, ins.age, ins._email, ",".join(cids)])
-        with open("courses.csv", "w", newline="", encoding="utf-8") as f:
-            
-            w = csv.writer(f)
-            
-            
-            w.writerow(["course_id","course_name","instructor_id","enrolled_count"])
-            for c in courses:
-                iid = ""
-                if c.instructor:
-                    iid = c.instructor.instructor_id
-                w.writerow([c.course_id, c.course_name, iid, len(c.enrolled_students)])
+        storage.export_db_csv(".", engine.path, QT_CSV_LAYOUT)
         QtWidgets.QMessageBox.information(None, "Export", "CSV files written")
     except:
         QtWidgets.QMessageBox.critical(None, "Error", "Export failed")
 
+def student_cells(s):
+    return (s.student_id, s.name, str(s.age), s._email, ",".join(s.registered_courses))
+
+def instructor_cells(ins):
+    return (ins.instructor_id, ins.name, str(ins.age), ins._email, ",".join(ins.assigned_courses))
+
+def course_cells(c):
+    return (c.course_id, c.course_name, c.instructor_id or "", str(len(c.enrolled_students)))
+
+# rows added to the tables per event-loop turn while they fill
+FILL_CHUNK = 500
+
+class IdListModel(QtCore.QAbstractListModel):
+    # one per entity type, shared by every ID combo and completer; kept current
+    # from the engine's writes row by row instead of being rebuilt on refresh
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ids = []
+        self.rowOf = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.ids)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if index.isValid() and role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return self.ids[index.row()]
+        return None
+
+    def reset(self, keys):
+        self.beginResetModel()
+        self.ids = list(keys)
+        self.rowOf = {k: n for n, k in enumerate(self.ids)}
+        self.endResetModel()
+
+    def add(self, key):
+        if key in self.rowOf:
+            return
+        n = len(self.ids)
+        self.beginInsertRows(QtCore.QModelIndex(), n, n)
+        self.ids.append(key)
+        self.rowOf[key] = n
+        self.endInsertRows()
+
+    def remove(self, key):
+        # the last ID takes the removed one's row, so nothing after it shifts
+        r = self.rowOf.pop(key, None)
+        if r is None:
+            return
+        last = len(self.ids) - 1
+        moved = self.ids[last]
+        self.beginRemoveRows(QtCore.QModelIndex(), last, last)
+        self.ids.pop()
+        self.endRemoveRows()
+        if r != last:
+            self.ids[r] = moved
+            self.rowOf[moved] = r
+            self.dataChanged.emit(self.index(r), self.index(r))
+
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, startedAt=None):
         super().__init__()
+        self.startedAt = startedAt
+        self.startupTimes = {}
+        self.cacheHit = None
+        self.fillJob = None
+        self.fillDone = None
+        self.fillTimer = QtCore.QTimer(self)
+        self.fillTimer.setSingleShot(True)
+        self.fillTimer.timeout.connect(self.step_fill)
+        # School collection -> IdListModel, filled by watch_engine
+        self.idModels = {e: IdListModel(self) for e in ENTITY.values()}
+        self.watchedEngine = None
+        # (entity, key) -> new value or None, collected while run_bulk runs
+        self.pendingRows = None
         
         
         
@@ -436,7 +268,7 @@ class MainWindow(QtWidgets.QMainWindow):
         addLay.addLayout(cRow)
         self.courseIdEdit = QtWidgets.QLineEdit()
         self.courseNameEdit = QtWidgets.QLineEdit()
-        self.courseInstructorCombo = QtWidgets.QComboBox()
+        self.courseInstructorCombo = self.id_combo("instructors")
         cRow.addWidget(QtWidgets.QLabel("Course ID"))
         cRow.addWidget(self.courseIdEdit)
         
@@ -453,8 +285,8 @@ class MainWindow(QtWidgets.QMainWindow):
         
         lay.addWidget(opsBox)
         opsLay = QtWidgets.QHBoxLayout(opsBox)
-        self.studentSelectCombo = QtWidgets.QComboBox()
-        self.courseSelectCombo = QtWidgets.QComboBox()
+        self.studentSelectCombo = self.id_combo("students")
+        self.courseSelectCombo = self.id_combo("courses")
         self.registerBtn = QtWidgets.QPushButton("Register Student")
         opsLay.addWidget(QtWidgets.QLabel("Student"))
         opsLay.addWidget(self.studentSelectCombo)
@@ -462,9 +294,13 @@ class MainWindow(QtWidgets.QMainWindow):
         opsLay.addWidget(self.courseSelectCombo)
         opsLay.addWidget(self.registerBtn)
         self.registerBtn.clicked.connect(self.register_student_qt)
+        self.registerManyBtn = QtWidgets.QPushButton("Register Selected Students")
+        self.registerManyBtn.setToolTip("Register every selected row of the students table in the course")
+        opsLay.addWidget(self.registerManyBtn)
+        self.registerManyBtn.clicked.connect(self.register_selected_qt)
 
-        self.instructorSelectCombo = QtWidgets.QComboBox()
-        self.courseAssignCombo = QtWidgets.QComboBox()
+        self.instructorSelectCombo = self.id_combo("instructors")
+        self.courseAssignCombo = self.id_combo("courses")
         
         self.assignBtn = QtWidgets.QPushButton("Assign Instructor")
         opsLay.addWidget(QtWidgets.QLabel("Instructor"))
@@ -474,6 +310,10 @@ class MainWindow(QtWidgets.QMainWindow):
         opsLay.addWidget(self.courseAssignCombo)
         opsLay.addWidget(self.assignBtn)
         self.assignBtn.clicked.connect(self.assign_instructor_qt)
+        self.assignManyBtn = QtWidgets.QPushButton("Assign to Selected Courses")
+        self.assignManyBtn.setToolTip("Make the instructor teach every selected row of the courses table")
+        opsLay.addWidget(self.assignManyBtn)
+        self.assignManyBtn.clicked.connect(self.assign_selected_qt)
         
 
         recBox = QtWidgets.QGroupBox("Records")
@@ -491,6 +331,13 @@ class MainWindow(QtWidgets.QMainWindow):
         
         self.courseTable.setHorizontalHeaderLabels(["course_id","course_name","instructor_id","enrolled_count"])
         recLay.addWidget(self.courseTable)
+        # School collection -> (table, row cells)
+        self.tables = {"students": (self.studentTable, student_cells),
+                       "instructors": (self.instructorTable, instructor_cells),
+                       "courses": (self.courseTable, course_cells)}
+        for table, _ in self.tables.values():
+            table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+            table.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
 
         actRow = QtWidgets.QHBoxLayout()
         recLay.addLayout(actRow)
@@ -499,6 +346,9 @@ class MainWindow(QtWidgets.QMainWindow):
         actRow.addWidget(self.editBtn)
         
         actRow.addWidget(self.deleteBtn)
+        # clicking them must not take focus from the table they act on
+        self.editBtn.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.deleteBtn.setFocusPolicy(QtCore.Qt.NoFocus)
         self.editBtn.clicked.connect(self.edit_selected_qt)
         self.deleteBtn.clicked.connect(self.delete_selected_qt)
 
@@ -510,11 +360,14 @@ class MainWindow(QtWidgets.QMainWindow):
         self.searchTypeCombo = QtWidgets.QComboBox()
         self.searchTypeCombo.addItems(["Student","Instructor","Course"])
         self.searchBtn = QtWidgets.QPushButton("Search")
+        self.fuzzyCheck = QtWidgets.QCheckBox("Fuzzy")
+        self.fuzzyCheck.setToolTip("Rank by similarity so typos like 'Jonh' still match")
         self.resetBtn = QtWidgets.QPushButton("Reset")
         sLay.addWidget(QtWidgets.QLabel("Term"))
         
         sLay.addWidget(self.searchEdit)
         sLay.addWidget(self.searchTypeCombo)
+        sLay.addWidget(self.fuzzyCheck)
         sLay.addWidget(self.searchBtn)
         sLay.addWidget(self.resetBtn)
         
@@ -529,84 +382,136 @@ class MainWindow(QtWidgets.QMainWindow):
         self.loadBtn = QtWidgets.QPushButton("Load")
         self.exportBtn = QtWidgets.QPushButton("Export CSV")
         self.backupBtn = QtWidgets.QPushButton("Backup DB")
+        self.diagBtn = QtWidgets.QPushButton("Diagnostics")
+        self.statsBtn = QtWidgets.QPushButton("Statistics")
         ioRow.addWidget(self.saveBtn)
         ioRow.addWidget(self.loadBtn)
         ioRow.addWidget(self.exportBtn)
         ioRow.addWidget(self.backupBtn)
+        ioRow.addWidget(self.diagBtn)
+        ioRow.addWidget(self.statsBtn)
         self.saveBtn.clicked.connect(self.save_now)
         self.loadBtn.clicked.connect(self.load_now)
         self.exportBtn.clicked.connect(export_csv_qt)
         self.backupBtn.clicked.connect(self.backup_now)
+        self.diagBtn.clicked.connect(self.show_diagnostics_qt)
+        self.statsBtn.clicked.connect(self.show_statistics_qt)
 
+        # only the empty shell is built here; showEvent loads the data once the window is up
+        self.loadPending = True
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.loadPending:
+            self.loadPending = False
+            QtCore.QTimer.singleShot(0, self.load_initial)
+
+    def load_initial(self):
+        self.repaint()
+        self.report_startup("First paint")
         init_db(dbPath)
-        reload_from_db()
-        self.refresh_views()
+        self.cacheHit = reload_from_db(useCache=True)
+        self.watch_engine()
+        self.report_startup("Data loaded (startup cache %s)" % ("hit" if self.cacheHit else "miss"), "Data loaded")
+        self.refresh_views(onDone=lambda: self.report_startup("Rows painted"))
 
-    def refresh_views(self, fs=None, fi=None, fc=None):
-        self.courseInstructorCombo.clear()
-        for ins in instructors:
-            self.courseInstructorCombo.addItem(ins.instructor_id)
-        self.studentSelectCombo.clear()
-        for s in students:
-            
-            self.studentSelectCombo.addItem(s.student_id)
-        self.courseSelectCombo.clear()
-        for c in courses:
-            self.courseSelectCombo.addItem(c.course_id)
-        self.instructorSelectCombo.clear()
-        for ins in instructors:
-            self.instructorSelectCombo.addItem(ins.instructor_id)
-            
-        self.courseAssignCombo.clear()
-        for c in courses:
-            self.courseAssignCombo.addItem(c.course_id)
-        self.studentTable.setRowCount(0)
-        useS = students
+    def report_startup(self, msg, stage=None):
+        if self.startedAt is None:
+            return
+        ms = (time.perf_counter() - self.startedAt) * 1000
+        self.startupTimes[stage or msg] = ms
+        msg = "%s after %.0f ms" % (msg, ms)
+        self.statusBar().showMessage(msg, 10000)
+        print(msg, file=sys.stderr)
+
+    def closeEvent(self, event):
+        if engine is not None:
+            # writes the startup cache if the model still matches the database
+            engine.close()
+        super().closeEvent(event)
+
+    def id_combo(self, entity, parent=None):
+        # editable combo over the shared ID model; typing filters it by substring
+        box = QtWidgets.QComboBox(parent)
+        box.setEditable(True)
+        box.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+        # sizing to contents would measure every ID
+        box.setSizeAdjustPolicy(QtWidgets.QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        box.setMinimumContentsLength(12)
+        box.setModel(self.idModels[entity])
+        box.view().setUniformItemSizes(True)
+        comp = QtWidgets.QCompleter(self.idModels[entity], box)
+        comp.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        comp.setFilterMode(QtCore.Qt.MatchContains)
+        comp.popup().setUniformItemSizes(True)
+        box.setCompleter(comp)
+        return box
+
+    def watch_engine(self):
+        # once per engine; the models then follow every write and reload
+        if self.watchedEngine is engine:
+            return
+        self.watchedEngine = engine
+        engine.watch(self.on_engine_write, self.on_engine_reset)
+
+    def on_engine_write(self, entity, key, obj):
+        if self.pendingRows is not None:
+            self.pendingRows[(entity, key)] = obj
+        m = self.idModels[entity]
+        if obj is None:
+            m.remove(key)
+        else:
+            m.add(key)
+
+    def on_engine_reset(self, school):
+        for entity, m in self.idModels.items():
+            m.reset(getattr(school, entity))
+
+    def refresh_views(self, fs=None, fi=None, fc=None, onDone=None):
+        # a newer refresh replaces any fill still in progress; the ID combos
+        # follow the engine on their own
+        self.fillTimer.stop()
+        sc = engine.school
+        useS = sc.students.values()
         if fs is not None:
             useS = fs
-        for s in useS:
-            cids = []
-            for c in s.registered_courses:
-                cids.append(c.course_id)
-            r = self.studentTable.rowCount()
-            self.studentTable.insertRow(r)
-            self.studentTable.setItem(r, 0, QtWidgets.QTableWidgetItem(s.student_id))
-            self.studentTable.setItem(r, 1, QtWidgets.QTableWidgetItem(s.name))
-            
-            self.studentTable.setItem(r, 2, QtWidgets.QTableWidgetItem(str(s.age)))
-            self.studentTable.setItem(r, 3, QtWidgets.QTableWidgetItem(s._email))
-            self.studentTable.setItem(r, 4, QtWidgets.QTableWidgetItem(",".join(cids)))
-            
-        self.instructorTable.setRowCount(0)
-        useI = instructors
+        useI = sc.instructors.values()
         if fi is not None:
             useI = fi
-        for ins in useI:
-            cids = []
-            for c in ins.assigned_courses:
-                cids.append(c.course_id)
-            r = self.instructorTable.rowCount()
-            self.instructorTable.insertRow(r)
-            self.instructorTable.setItem(r, 0, QtWidgets.QTableWidgetItem(ins.instructor_id))
-            self.instructorTable.setItem(r, 1, QtWidgets.QTableWidgetItem(ins.name))
-            self.instructorTable.setItem(r, 2, QtWidgets.QTableWidgetItem(str(ins.age)))
-            self.instructorTable.setItem(r, 3, QtWidgets.QTableWidgetItem(ins._email))
-            
-            self.instructorTable.setItem(r, 4, QtWidgets.QTableWidgetItem(",".join(cids)))
-        self.courseTable.setRowCount(0)
-        useC = courses
+        useC = sc.courses.values()
         if fc is not None:
             useC = fc
-        for c in useC:
-            iid = ""
-            if c.instructor:
-                iid = c.instructor.instructor_id
-            r = self.courseTable.rowCount()
-            self.courseTable.insertRow(r)
-            self.courseTable.setItem(r, 0, QtWidgets.QTableWidgetItem(c.course_id))
-            self.courseTable.setItem(r, 1, QtWidgets.QTableWidgetItem(c.course_name))
-            self.courseTable.setItem(r, 2, QtWidgets.QTableWidgetItem(iid))
-            self.courseTable.setItem(r, 3, QtWidgets.QTableWidgetItem(str(len(c.enrolled_students))))
+        self.studentTable.setRowCount(0)
+        self.instructorTable.setRowCount(0)
+        self.courseTable.setRowCount(0)
+        # copies, so a reload while the tables fill cannot change what is being drawn
+        self.fillJob = self.fill_rows([(self.studentTable, list(useS), student_cells),
+                                       (self.instructorTable, list(useI), instructor_cells),
+                                       (self.courseTable, list(useC), course_cells)])
+        self.fillDone = onDone
+        self.step_fill()
+
+    def fill_rows(self, jobs):
+        for table, rows, cells in jobs:
+            for start in range(0, len(rows), FILL_CHUNK):
+                part = rows[start:start + FILL_CHUNK]
+                table.setRowCount(start + len(part))
+                for r, o in enumerate(part, start):
+                    for col, text in enumerate(cells(o)):
+                        table.setItem(r, col, QtWidgets.QTableWidgetItem(text))
+                yield
+
+    def step_fill(self):
+        # one chunk per call; the single-shot timer hands control back to the event loop in between
+        try:
+            next(self.fillJob)
+        except StopIteration:
+            self.fillJob = None
+            done, self.fillDone = self.fillDone, None
+            if done:
+                done()
+            return
+        self.fillTimer.start(0)
 
     def add_student_qt(self):
         n = self.studentNameEdit.text().strip()
@@ -632,7 +537,6 @@ class MainWindow(QtWidgets.QMainWindow):
         self.studentAgeEdit.clear()
         self.studentEmailEdit.clear()
         self.studentIdEdit.clear()
-        reload_from_db()
         self.refresh_views()
 
     def add_instructor_qt(self):
@@ -658,7 +562,6 @@ class MainWindow(QtWidgets.QMainWindow):
         self.instructorAgeEdit.clear()
         self.instructorEmailEdit.clear()
         self.instructorIdEdit.clear()
-        reload_from_db()
         self.refresh_views()
 
     def add_course_qt(self):
@@ -677,7 +580,6 @@ class MainWindow(QtWidgets.QMainWindow):
             return
         self.courseIdEdit.clear()
         self.courseNameEdit.clear()
-        reload_from_db()
         self.refresh_views()
 
     def register_student_qt(self):
@@ -705,7 +607,6 @@ class MainWindow(QtWidgets.QMainWindow):
         if not ok:
             QtWidgets.QMessageBox.critical(self, "Error", "Invalid selection")
             return
-        reload_from_db()
         self.refresh_views()
         QtWidgets.QMessageBox.information(self, "OK", "Student registered")
 
@@ -720,7 +621,6 @@ class MainWindow(QtWidgets.QMainWindow):
         if not ok:
             QtWidgets.QMessageBox.critical(self, "Error", "Invalid selection")
             return
-        reload_from_db()
         self.refresh_views()
         QtWidgets.QMessageBox.information(self, "OK", "Instructor assigned")
         
@@ -734,45 +634,16 @@ class MainWindow(QtWidgets.QMainWindow):
         if t == "" or k == "":
             QtWidgets.QMessageBox.critical(self, "Error", "Enter term and type")
             return
+        if self.fuzzyCheck.isChecked():
+            found = fuzzy_hits(k, t)
+        else:
+            found = engine.related_search(t, ENTITY[k])
         if k == "Student":
-            lst = []
-            for s in students:
-                hit = False
-                if t in s.name.lower() or t in s.student_id.lower() or t in s._email.lower():
-                    hit = True
-                if not hit:
-                    for c in s.registered_courses:
-                        if t in c.course_id.lower() or t in c.course_name.lower():
-                            hit = True
-                if hit:
-                    lst.append(s)
-            self.refresh_views(fs=lst, fi=None, fc=None)
-            return
-        if k == "Instructor":
-            lst = []
-            for ins in instructors:
-                hit = False
-                if t in ins.name.lower() or t in ins.instructor_id.lower() or t in ins._email.lower():
-                    hit = True
-                if not hit:
-                    for c in ins.assigned_courses:
-                        if t in c.course_id.lower() or t in c.course_name.lower():
-                            hit = True
-                if hit:
-                    lst.append(ins)
-            self.refresh_views(fs=None, fi=lst, fc=None)
-            return
-        lst = []
-        for c in courses:
-            hit = False
-            if t in c.course_id.lower() or t in c.course_name.lower():
-                hit = True
-            if not hit and c.instructor:
-                if t in c.instructor.instructor_id.lower() or t in c.instructor.name.lower():
-                    hit = True
-            if hit:
-                lst.append(c)
-        self.refresh_views(fs=None, fi=None, fc=lst)
+            self.refresh_views(fs=found, fi=None, fc=None)
+        elif k == "Instructor":
+            self.refresh_views(fs=None, fi=found, fc=None)
+        else:
+            self.refresh_views(fs=None, fi=None, fc=found)
 
     def reset_search_qt(self):
         self.searchEdit.clear()
@@ -793,10 +664,7 @@ class MainWindow(QtWidgets.QMainWindow):
             if r < 0:
                 return
             sid = self.studentTable.item(r, 0).text()
-            target = None
-            for s in students:
-                if s.student_id == sid:
-                    target = s
+            target = engine.school.students.get(sid)
             if target is None:
                 return
             d = QtWidgets.QDialog(self)
@@ -832,7 +700,6 @@ class MainWindow(QtWidgets.QMainWindow):
                 
                 
                 
-                reload_from_db()
                 self.refresh_views()
                 d.accept()
             bb.accepted.connect(do_save)
@@ -844,17 +711,7 @@ class MainWindow(QtWidgets.QMainWindow):
             if r < 0:
                 return
             iid = self.instructorTable.item(r, 0).text()
-            target = None
-            
-            
-            
-            
-            
-            
-            
-            for ins in instructors:
-                if ins.instructor_id == iid:
-                    target = ins
+            target = engine.school.instructors.get(iid)
             if target is None:
                 return
             d = QtWidgets.QDialog(self)
@@ -892,7 +749,6 @@ class MainWindow(QtWidgets.QMainWindow):
                 ok = db_update_instructor(target.instructor_id, newName, newAge, newEmail, newId)
                 if not ok:
                     return
-                reload_from_db()
                 self.refresh_views()
                 d.accept()
             bb.accepted.connect(do_save)
@@ -912,10 +768,7 @@ class MainWindow(QtWidgets.QMainWindow):
             if r < 0:
                 return
             cid = self.courseTable.item(r, 0).text()
-            target = None
-            for c in courses:
-                if c.course_id == cid:
-                    target = c
+            target = engine.school.courses.get(cid)
             if target is None:
                 return
             d = QtWidgets.QDialog(self)
@@ -923,13 +776,8 @@ class MainWindow(QtWidgets.QMainWindow):
             fl = QtWidgets.QFormLayout(d)
             idEdit = QtWidgets.QLineEdit(target.course_id)
             nameEdit = QtWidgets.QLineEdit(target.course_name)
-            insEdit = QtWidgets.QComboBox()
-            for ins in instructors:
-                insEdit.addItem(ins.instructor_id)
-            if target.instructor:
-                idx = insEdit.findText(target.instructor.instructor_id)
-                if idx >= 0:
-                    insEdit.setCurrentIndex(idx)
+            insEdit = self.id_combo("instructors", d)
+            insEdit.setCurrentIndex(self.idModels["instructors"].rowOf.get(target.instructor_id, -1))
             fl.addRow("Course ID", idEdit)
             fl.addRow("Course Name", nameEdit)
             fl.addRow("Instructor ID", insEdit)
@@ -966,7 +814,6 @@ class MainWindow(QtWidgets.QMainWindow):
                 
                 
                 
-                reload_from_db()
                 self.refresh_views()
                 d.accept()
             bb.accepted.connect(do_save)
@@ -974,45 +821,99 @@ class MainWindow(QtWidgets.QMainWindow):
             d.exec_()
 
     def delete_selected_qt(self):
-        if self.studentTable.hasFocus():
-            r = self.studentTable.currentRow()
-            if r < 0:
-                
+        for entity, (table, _) in self.tables.items():
+            if table.hasFocus():
+                ids = self.selected_ids(table)
+                if ids:
+                    self.run_bulk(db_delete_many, entity, ids)
                 return
-            sid = self.studentTable.item(r, 0).text()
-            db_delete_student(sid)
-            reload_from_db()
-            self.refresh_views()
+
+    def register_selected_qt(self):
+        sids = self.selected_ids(self.studentTable)
+        cid = self.courseSelectCombo.currentText().strip()
+        if not sids or cid == "":
+            QtWidgets.QMessageBox.critical(self, "Error", "Select students in the table and a course")
             return
-        if self.instructorTable.hasFocus():
-            r = self.instructorTable.currentRow()
-            if r < 0:
-                return
-            iid = self.instructorTable.item(r, 0).text()
-            db_delete_instructor(iid)
-            reload_from_db()
-            self.refresh_views()
+        done = self.run_bulk(db_register_many, sids, cid)
+        if done is None:
             return
-        
-        if self.courseTable.hasFocus():
-            r = self.courseTable.currentRow()
-            if r < 0:
-                return
-            cid = self.courseTable.item(r, 0).text()
-            db_delete_course(cid)
-            reload_from_db()
+        if not done:
+            QtWidgets.QMessageBox.critical(self, "Error", "Invalid selection")
+            return
+        self.statusBar().showMessage("%d students registered in %s" % (len(done), cid))
+
+    def assign_selected_qt(self):
+        cids = self.selected_ids(self.courseTable)
+        iid = self.instructorSelectCombo.currentText().strip()
+        if not cids or iid == "":
+            QtWidgets.QMessageBox.critical(self, "Error", "Select courses in the table and an instructor")
+            return
+        done = self.run_bulk(db_assign_instructor_many, cids, iid)
+        if done is None:
+            return
+        if not done:
+            QtWidgets.QMessageBox.critical(self, "Error", "Invalid selection")
+            return
+        self.statusBar().showMessage("%d courses assigned to %s" % (len(done), iid))
+
+    def selected_ids(self, table):
+        return [table.item(ix.row(), 0).text() for ix in table.selectionModel().selectedRows()
+                if table.item(ix.row(), 0) is not None]
+
+    def run_bulk(self, op, *args):
+        # one engine transaction, then only the rows it wrote are repainted; None if it failed
+        self.pendingRows = {}
+        try:
+            result = op(*args)
+        except Exception as e:
+            # the engine has rolled back; re-raising from a slot would abort the application
+            self.refresh_views()
+            QtWidgets.QMessageBox.critical(self, "Error", "Operation failed: %s" % e)
+            return None
+        finally:
+            changed, self.pendingRows = self.pendingRows, None
+        self.apply_rows(changed)
+        return result
+
+    def apply_rows(self, changed):
+        if self.fillJob is not None:
+            # rows still being filled would come from the old objects
             self.refresh_views()
+            return
+        for entity, (table, cells) in self.tables.items():
+            mine = [(key, obj) for (e, key), obj in changed.items() if e == entity]
+            if not mine:
+                continue
+            rowOf = {}
+            for r in range(table.rowCount()):
+                item = table.item(r, 0)
+                if item is not None:
+                    rowOf[item.text()] = r
+            gone = []
+            table.setUpdatesEnabled(False)
+            for key, obj in mine:
+                r = rowOf.get(key)
+                if r is None:
+                    continue
+                if obj is None:
+                    gone.append(r)
+                else:
+                    for col, text in enumerate(cells(obj)):
+                        table.setItem(r, col, QtWidgets.QTableWidgetItem(text))
+            for r in sorted(gone, reverse=True):
+                table.removeRow(r)
+            table.setUpdatesEnabled(True)
 
     def save_now(self):
         try:
-            conn.commit()
+            engine.conn.commit()
             QtWidgets.QMessageBox.information(self, "Saved", "Database saved")
         except:
             QtWidgets.QMessageBox.critical(self, "Error", "Save failed")
 
     def load_now(self):
         try:
-            reload_from_db()
+            reload_from_db(useCache=True)
             self.refresh_views()
             QtWidgets.QMessageBox.information(self, "Loaded", "Data loaded from DB")
         except:
@@ -1026,3 +927,70 @@ class MainWindow(QtWidgets.QMainWindow):
         except:
             QtWidgets.QMessageBox.critical(self, "Error", "Backup failed")
 
+    def show_diagnostics_qt(self):
+        d = QtWidgets.QDialog(self)
+        d.setWindowTitle("Diagnostics")
+        d.resize(900, 500)
+        lay = QtWidgets.QVBoxLayout(d)
+        view = QtWidgets.QPlainTextEdit()
+        view.setReadOnly(True)
+        view.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        lay.addWidget(view)
+        row = QtWidgets.QHBoxLayout()
+        lay.addLayout(row)
+        toggleBtn = QtWidgets.QPushButton()
+        promBtn = QtWidgets.QPushButton("Prometheus")
+        resetBtn = QtWidgets.QPushButton("Reset")
+        saveBtn = QtWidgets.QPushButton("Save JSON")
+        closeBtn = QtWidgets.QPushButton("Close")
+        for b in (toggleBtn, promBtn, resetBtn, saveBtn, closeBtn):
+            row.addWidget(b)
+        def refresh():
+            toggleBtn.setText("Disable" if metrics.is_enabled() else "Enable")
+            view.setPlainText(metrics.summary() + "\nSearch cache: " + engine.cache.summary() + "\n")
+        def toggle():
+            if metrics.is_enabled():
+                metrics.disable()
+            else:
+                metrics.enable()
+            refresh()
+        def reset():
+            metrics.reset()
+            refresh()
+        def save():
+            path, _ = QtWidgets.QFileDialog.getSaveFileName(d, "Save metrics", "metrics.json", "JSON (*.json)")
+            if path:
+                metrics.dump(path)
+        toggleBtn.clicked.connect(toggle)
+        promBtn.clicked.connect(lambda: view.setPlainText(metrics.to_prometheus()))
+        resetBtn.clicked.connect(reset)
+        saveBtn.clicked.connect(save)
+        closeBtn.clicked.connect(d.accept)
+        refresh()
+        d.exec_()
+
+    def show_statistics_qt(self):
+        # engine.aggregates follows every write, so a refresh only re-renders it
+        import aggregates
+        from PyQt5 import QtGui
+        d = QtWidgets.QDialog(self)
+        d.setWindowTitle("Statistics")
+        d.resize(700, 600)
+        lay = QtWidgets.QVBoxLayout(d)
+        view = QtWidgets.QPlainTextEdit()
+        view.setReadOnly(True)
+        view.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        view.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        lay.addWidget(view)
+        row = QtWidgets.QHBoxLayout()
+        lay.addLayout(row)
+        refreshBtn = QtWidgets.QPushButton("Refresh")
+        dbBtn = QtWidgets.QPushButton("From database")
+        closeBtn = QtWidgets.QPushButton("Close")
+        for b in (refreshBtn, dbBtn, closeBtn):
+            row.addWidget(b)
+        refreshBtn.clicked.connect(lambda: view.setPlainText(aggregates.format_report(engine.aggregates.snapshot())))
+        dbBtn.clicked.connect(lambda: view.setPlainText(aggregates.format_report(aggregates.db_snapshot(engine.path))))
+        closeBtn.clicked.connect(d.accept)
+        view.setPlainText(aggregates.format_report(engine.aggregates.snapshot()))
+        d.exec_()
@@ -0,0 +1,457 @@
+"""Secondary indexes and index-aware queries for the School data model.
+
+Provides hashed and sorted (bisect-backed) indexes over entity fields, kept
+current by :class:`models.School` on every mutation, and a lazy query
+builder that uses them for equality, range, order-by and limit/offset.
+Results are produced by generators, so consumers only pay for the rows
+they actually read. Trigram indexes add typo-tolerant ranked lookup.
+"""
+
+from __future__ import annotations
+import heapq
+import re
+from itertools import islice
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+class _Top:
+    """Sorts after every key; used as an inclusive upper bound."""
+    def __lt__(self, other): return False
+    def __gt__(self, other): return True
+
+class _Bottom:
+    """Sorts before every key; used as an inclusive lower bound."""
+    def __lt__(self, other): return True
+    def __gt__(self, other): return False
+
+_TOP, _BOTTOM = _Top(), _Bottom()
+
+def _field_values(obj, field_name: str) -> tuple:
+    """Return the indexable values of a field (list fields index every element)."""
+    v = getattr(obj, field_name)
+    return tuple(v) if isinstance(v, list) else (v,)
+
+class HashIndex:
+    """Equality index mapping field values to entity IDs.
+
+    :param field_name: Entity attribute to index.
+    :type field_name: str
+    """
+    kind = "hash"
+
+    def __init__(self, field_name: str):
+        self.field = field_name
+        self._by_value: Dict[object, Dict[str, None]] = {}
+        self._by_key: Dict[str, tuple] = {}
+
+    def update(self, key: str, obj):
+        """Index (or re-index) the entity stored under ``key``."""
+        new = _field_values(obj, self.field)
+        old = self._by_key.get(key)
+        if old == new:
+            return
+        if old is not None:
+            self.remove(key)
+        self._by_key[key] = new
+        for v in new:
+            self._by_value.setdefault(v, {})[key] = None
+
+    def remove(self, key: str):
+        """Forget the entity stored under ``key``."""
+        for v in self._by_key.pop(key, ()):
+            keys = self._by_value.get(v)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self._by_value[v]
+
+    def bulk_load(self, items):
+        """Index many ``(key, obj)`` pairs."""
+        for key, obj in items:
+            self.update(key, obj)
+
+    def lookup(self, value) -> List[str]:
+        """Return IDs whose field equals (or, for list fields, contains) ``value``."""
+        return list(self._by_value.get(value, ()))
+
+class SortedIndex(HashIndex):
+    """Ordered index supporting equality, inclusive ranges and ordered scans.
+
+    Entries are kept as a sorted list of ``(value, id)`` pairs; ``None``
+    values are only reachable through equality lookups.
+
+    :param field_name: Entity attribute to index.
+    :type field_name: str
+    """
+    kind = "sorted"
+
+    def __init__(self, field_name: str):
+        super().__init__(field_name)
+        self._entries: List[Tuple[object, str]] = []
+
+    def update(self, key: str, obj):
+        new = _field_values(obj, self.field)
+        if self._by_key.get(key) == new:
+            return
+        super().update(key, obj)
+        for v in new:
+            if v is not None:
+                insort(self._entries, (v, key))
+
+    def remove(self, key: str):
+        for v in self._by_key.get(key, ()):
+            if v is not None:
+                i = bisect_left(self._entries, (v, key))
+                if i < len(self._entries) and self._entries[i] == (v, key):
+                    del self._entries[i]
+        super().remove(key)
+
+    def bulk_load(self, items):
+        """Index many ``(key, obj)`` pairs, re-sorting once instead of per insert."""
+        for key, obj in items:
+            HashIndex.update(self, key, obj)
+        self._entries = sorted((v, k) for k, vals in self._by_key.items() for v in vals if v is not None)
+
+    def range(self, lo=None, hi=None, descending: bool = False) -> Iterator[str]:
+        """Yield IDs with ``lo <= value <= hi`` in value order.
+
+        :param lo: Inclusive lower bound, or None for unbounded.
+        :param hi: Inclusive upper bound, or None for unbounded.
+        :param descending: Yield largest values first.
+        :type descending: bool
+        """
+        start = 0 if lo is None else bisect_left(self._entries, (lo, _BOTTOM))
+        stop = len(self._entries) if hi is None else bisect_right(self._entries, (hi, _TOP))
+        seq = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+        entries = self._entries
+        for i in seq:
+            yield entries[i][1]
+        if lo is None and hi is None:
+            yield from self.lookup(None)
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+def _words(text: str) -> List[str]:
+    """Split text into lower-cased alphanumeric words."""
+    return _WORD_RE.findall(text.lower())
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _edit_distance(a: str, b: str, bound: int) -> float:
+    """Optimal-string-alignment distance, capped at ``bound + 1``.
+
+    Adjacent swaps (the most common typo, ``"Jonh"``) cost 0.5; other edits cost 1.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = ca != cb
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                v = min(v, prev2[j - 2] + 0.5)
+            cur[j] = v
+        if min(cur) > bound:
+            return bound + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+class TrigramIndex(HashIndex):
+    """Typo-tolerant index over the words of a text field.
+
+    Every distinct word is indexed by its padded trigrams. A lookup first
+    gathers candidate words sharing trigrams with each query word (an
+    inverted-index count, so cost follows the candidates rather than the
+    collection), then scores them by trigram (Dice) similarity weighted
+    one third and bounded edit-distance similarity weighted two thirds.
+    Equality lookups still work as for :class:`HashIndex`.
+
+    :param field_name: Entity attribute to index.
+    :type field_name: str
+    """
+    kind = "trigram"
+
+    def __init__(self, field_name: str):
+        super().__init__(field_name)
+        self._words_by_key: Dict[str, Tuple[str, ...]] = {}
+        self._keys_by_word: Dict[str, Dict[str, None]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+
+    def _entity_words(self, obj) -> Tuple[str, ...]:
+        return tuple(dict.fromkeys(w for v in _field_values(obj, self.field) if isinstance(v, str)
+                                   for w in _words(v)))
+
+    def update(self, key: str, obj):
+        HashIndex.update(self, key, obj)
+        new = self._entity_words(obj)
+        if self._words_by_key.get(key) == new:
+            return
+        self._forget_words(key)
+        self._words_by_key[key] = new
+        for w in new:
+            keys = self._keys_by_word.get(w)
+            if keys is None:
+                keys = self._keys_by_word[w] = {}
+                for g in _trigrams(w):
+                    self._grams.setdefault(g, set()).add(w)
+            keys[key] = None
+
+    def _forget_words(self, key: str):
+        for w in self._words_by_key.pop(key, ()):
+            keys = self._keys_by_word.get(w)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self._keys_by_word[w]
+                    for g in _trigrams(w):
+                        words = self._grams.get(g)
+                        if words is not None:
+                            words.discard(w)
+                            if not words:
+                                del self._grams[g]
+
+    def remove(self, key: str):
+        self._forget_words(key)
+        super().remove(key)
+
+    def word_scores(self, word: str, min_score: float = 0.3, max_edits: int = 2, max_words: int = 64,
+                    budget: int = 4096) -> Dict[str, float]:
+        """Return the indexed words most similar to ``word``.
+
+        Candidates are gathered from the query's rarest trigrams first and
+        collection stops at ``budget`` words, so very common trigrams (e.g.
+        the ``"S00"`` prefix of every student ID) are never expanded. The
+        candidates with the highest trigram (Dice) similarity are then
+        re-scored with bounded edit distance.
+
+        :return: Up to ``max_words`` ``{word: similarity}`` entries with similarity >= ``min_score``.
+        :rtype: dict[str, float]
+        """
+        grams = _trigrams(word)
+        cand: Set[str] = set()
+        for g in sorted(grams, key=lambda g: len(self._grams.get(g, ()))):
+            words = self._grams.get(g)
+            if not words:
+                continue
+            if len(cand) + len(words) > budget:
+                if not cand:
+                    cand.update(islice(words, budget))
+                break
+            cand.update(words)
+        dice = []
+        for w in cand:
+            padded = f"  {w} "
+            shared = sum(1 for g in grams if g in padded)
+            dice.append((2 * shared / (len(grams) + len(w) + 1), w))
+        out = {}
+        for d, w in heapq.nlargest(max_words * 4, dice):
+            dist = _edit_distance(word, w, max_edits)
+            edit = 1 - dist / max(len(word), len(w)) if dist <= max_edits else 0.0
+            score = (d + 2 * edit) / 3
+            if score >= min_score:
+                out[w] = score
+        return dict(heapq.nlargest(max_words, out.items(), key=lambda kv: kv[1]))
+
+    def scores(self, text: str, min_score: float = 0.3) -> Dict[str, float]:
+        """Score entity IDs against ``text``.
+
+        Each query word is matched to its most similar word in the field;
+        an entity's score is the mean over the query words.
+
+        :param text: Query text.
+        :type text: str
+        :param min_score: Minimum word similarity considered a match.
+        :type min_score: float
+        :return: ``{id: score}`` for entities matching at least one query word.
+        :rtype: dict[str, float]
+        """
+        qwords = _words(text)
+        total: Dict[str, float] = {}
+        for qw in qwords:
+            best: Dict[str, float] = {}
+            for w, sc in self.word_scores(qw, min_score).items():
+                for key in self._keys_by_word[w]:
+                    if sc > best.get(key, 0.0):
+                        best[key] = sc
+            for key, sc in best.items():
+                total[key] = total.get(key, 0.0) + sc
+        n = len(qwords)
+        return {k: v / n for k, v in total.items()}
+
+def fuzzy_rank(indexes: Iterable[TrigramIndex], text: str, limit: int = 10,
+               min_score: float = 0.3) -> List[Tuple[float, str]]:
+    """Return the ``limit`` best ``(score, id)`` pairs across several trigram indexes.
+
+    An entity's score is its best score over the given fields.
+    """
+    best: Dict[str, float] = {}
+    for idx in indexes:
+        for key, sc in idx.scores(text, min_score).items():
+            if sc > best.get(key, 0.0):
+                best[key] = sc
+    return heapq.nsmallest(limit, ((sc, key) for key, sc in best.items()), key=lambda p: (-p[0], p[1]))
+
+INDEX_KINDS = {"hash": HashIndex, "sorted": SortedIndex, "trigram": TrigramIndex}
+
+class Query:
+    """Query builder over one collection of a School (or snapshot).
+
+    Build with :meth:`models.School.query`, chain ``where``/``between``/
+    ``contains``/``filter``/``order_by``/``offset``/``limit``/``select`` and
+    iterate. Nothing is evaluated until iteration; indexed predicates are
+    answered from the index, and unless an unindexed ``order_by`` forces a
+    sort, iteration stops as soon as ``limit`` rows have been produced.
+
+    :param school: School or snapshot to read from.
+    :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+    :type entity: str
+    """
+    def __init__(self, school, entity: str):
+        self._school = school
+        self._entity = entity
+        self._table = getattr(school, entity)
+        self._indexes = getattr(school, "_indexes", {}).get(entity, {})
+        self._eq: List[Tuple[str, object]] = []
+        self._ranges: List[Tuple[str, object, object]] = []
+        self._order: Optional[Tuple[str, bool]] = None
+        self._filters: List[Callable[[object], bool]] = []
+        self._fields: Tuple[str, ...] = ()
+        self._offset = 0
+        self._limit: Optional[int] = None
+
+    def where(self, field_name: str, value) -> "Query":
+        """Keep entities whose field equals (or, for list fields, contains) ``value``."""
+        self._eq.append((field_name, value))
+        return self
+
+    def between(self, field_name: str, lo=None, hi=None) -> "Query":
+        """Keep entities with ``lo <= field <= hi``; either bound may be None."""
+        self._ranges.append((field_name, lo, hi))
+        return self
+
+    def filter(self, predicate: Callable[[object], bool]) -> "Query":
+        """Keep entities for which ``predicate(entity)`` is true; filters combine with AND."""
+        self._filters.append(predicate)
+        return self
+
+    def contains(self, text: str, *fields: str) -> "Query":
+        """Keep entities where any of ``fields`` contains ``text`` (case-insensitive).
+
+        An empty ``text`` keeps everything.
+        """
+        text = (text or "").lower().strip()
+        if text:
+            self._filters.append(
+                lambda o: any(text in v.lower() for v in (getattr(o, f) for f in fields) if isinstance(v, str)))
+        return self
+
+    def select(self, *fields: str) -> "Query":
+        """Project each result to a tuple of the given fields instead of the entity."""
+        self._fields = fields
+        return self
+
+    def order_by(self, field_name: str, descending: bool = False) -> "Query":
+        """Sort results by a field."""
+        self._order = (field_name, descending)
+        return self
+
+    def offset(self, n: int) -> "Query":
+        """Skip the first ``n`` results."""
+        self._offset = max(0, int(n))
+        return self
+
+    def limit(self, n: Optional[int]) -> "Query":
+        """Return at most ``n`` results (None for no limit)."""
+        self._limit = None if n is None else max(0, int(n))
+        return self
+
+    # ---------- Planning ----------
+    def _source(self):
+        """Pick the cheapest key source: ``(keys, predicates_still_to_check, ordered)``."""
+        eq, ranges = list(self._eq), list(self._ranges)
+        order_idx = None
+        if self._order:
+            idx = self._indexes.get(self._order[0])
+            order_idx = idx if isinstance(idx, SortedIndex) else None
+        for i, (f, v) in enumerate(eq):
+            idx = self._indexes.get(f)
+            if idx is not None:
+                return idx.lookup(v), (eq[:i] + eq[i + 1:], ranges), False
+        for i, (f, lo, hi) in enumerate(ranges):
+            idx = self._indexes.get(f)
+            if isinstance(idx, SortedIndex):
+                desc = bool(self._order and self._order[0] == f and self._order[1])
+                ordered = bool(self._order and self._order[0] == f)
+                return idx.range(lo, hi, desc), (eq, ranges[:i] + ranges[i + 1:]), ordered
+        if order_idx is not None:
+            return order_idx.range(descending=self._order[1]), (eq, ranges), True
+        return None, (eq, ranges), False
+
+    def _matches(self, obj, eq, ranges) -> bool:
+        for f, v in eq:
+            if v not in _field_values(obj, f):
+                return False
+        for f, lo, hi in ranges:
+            if not any(x is not None and (lo is None or x >= lo) and (hi is None or x <= hi)
+                       for x in _field_values(obj, f)):
+                return False
+        for pred in self._filters:
+            if not pred(obj):
+                return False
+        return True
+
+    def __iter__(self) -> Iterator:
+        keys, (eq, ranges), ordered = self._source()
+        if keys is None:
+            rows = (o for o in self._table.values() if self._matches(o, eq, ranges))
+        else:
+            rows = self._fetch(keys, eq, ranges)
+        if self._order and not ordered:
+            rows = _ordered(rows, *self._order)
+        skip, left, fields = self._offset, self._limit, self._fields
+        if left == 0:
+            return
+        for obj in rows:
+            if skip:
+                skip -= 1
+                continue
+            yield tuple(getattr(obj, f) for f in fields) if fields else obj
+            if left is not None:
+                left -= 1
+                if not left:
+                    return
+
+    def _fetch(self, keys, eq, ranges):
+        seen = set()
+        table = self._table
+        for k in keys:
+            if k in seen:
+                continue
+            seen.add(k)
+            obj = table.get(k)
+            if obj is not None and self._matches(obj, eq, ranges):
+                yield obj
+
+    def all(self) -> list:
+        """Return the results as a list."""
+        return list(self)
+
+    def first(self):
+        """Return the first result or None."""
+        return next(iter(self.limit(1)), None)
+
+    def count(self) -> int:
+        """Count results, honouring offset and limit."""
+        return sum(1 for _ in self)
+
+def _ordered(rows, field_name: str, descending: bool) -> Iterator:
+    """Sort rows by a field with None values last, like an unbounded index scan."""
+    present, missing = [], []
+    for o in rows:
+        (missing if getattr(o, field_name) is None else present).append(o)
+    present.sort(key=lambda o: getattr(o, field_name), reverse=descending)
+    return iter(present + missing)
@@ -0,0 +1,204 @@
+"""Per-course roster reports written in parallel from SQLite.
+
+:func:`write_rosters` writes one file per course, CSV or plain text,
+listing the course, its instructor and the enrolled students with their
+names and emails. The courses are split into partitions of about equal
+enrollment, one per worker process. Each worker opens its own read-only
+connection, fetches its whole partition with two queries and writes the
+files. No School is built. The parent only plans the partitions and
+collects the manifest.
+"""
+
+from __future__ import annotations
+import csv
+import heapq
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import metrics
+import storage
+
+FORMATS = {"csv": ".csv", "text": ".txt"}
+CSV_HEADER = ["course_id", "course_name", "instructor_id", "instructor_name",
+              "student_id", "student_name", "student_email"]
+MANIFEST = "manifest.json"
+
+_COURSES_SQL = """
+    SELECT c.course_id, c.course_name, c.instructor_id, i.name, i.email
+    FROM json_each(?) j
+    JOIN courses c ON c.course_id = j.value
+    LEFT JOIN instructors i ON i.instructor_id = c.instructor_id"""
+_ROSTER_SQL = """
+    SELECT r.course_id, s.student_id, s.name, s.email
+    FROM json_each(?) j
+    JOIN registrations r ON r.course_id = j.value
+    JOIN students s ON s.student_id = r.student_id
+    ORDER BY r.course_id, s.name, s.student_id"""
+
+# ---------------------- Planning ----------------------
+def _file_names(course_ids: Iterable[str], ext: str) -> Dict[str, str]:
+    """Map course IDs to file names that are safe on every filesystem and unique."""
+    names, taken = {}, set()
+    for cid in course_ids:
+        base = re.sub(r"[^\w.-]", "_", cid).strip(".") or "course"
+        name, n = base + ext, 1
+        while name.lower() in taken:
+            n += 1
+            name = f"{base}~{n}{ext}"
+        taken.add(name.lower())
+        names[cid] = name
+    return names
+
+def partition(sizes: Dict[str, int], parts: int) -> List[List[str]]:
+    """Split courses into ``parts`` lists of about equal total enrollment.
+
+    Courses are placed largest first onto the currently lightest partition.
+    An empty course still counts as one row for its header.
+
+    :param sizes: ``{course_id: enrolled students}``.
+    :type sizes: dict[str, int]
+    :param parts: Number of partitions.
+    :type parts: int
+    :return: Non-empty course ID lists.
+    :rtype: list[list[str]]
+    """
+    heap = [(0, n, []) for n in range(max(1, parts))]
+    for cid, size in sorted(sizes.items(), key=lambda kv: kv[1], reverse=True):
+        load, n, ids = heapq.heappop(heap)
+        ids.append(cid)
+        heapq.heappush(heap, (load + size + 1, n, ids))
+    return [ids for _, _, ids in sorted(heap, key=lambda t: t[1]) if ids]
+
+# ---------------------- Workers ----------------------
+def _write_text(f, course: tuple, students: Sequence[tuple]):
+    cid, cname, iid, iname, iemail = course
+    f.write(f"{cid}  {cname}\n")
+    f.write(f"Instructor: {iname} <{iemail}> ({iid})\n" if iid else "Instructor: (none)\n")
+    f.write(f"Students: {len(students)}\n\n")
+    width = max((len(s[1]) for s in students), default=0)
+    for _, sid, name, email in students:
+        f.write(f"  {sid:<12}{name:<{width}}  {email}\n")
+
+def _write_csv(f, course: tuple, students: Sequence[tuple]):
+    w = csv.writer(f)
+    w.writerow(CSV_HEADER)
+    cid, cname, iid, iname, _ = course
+    w.writerows((cid, cname, iid, iname, sid, name, email) for _, sid, name, email in students)
+
+def _write_partition(db: str, folder: str, names: Dict[str, str], fmt: str) -> List[dict]:
+    """Write the rosters of one partition; runs in a worker process.
+
+    :return: Manifest entries of the files written.
+    :rtype: list[dict]
+    """
+    conn = sqlite3.connect(f"{Path(db).resolve().as_uri()}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    write = _write_csv if fmt == "csv" else _write_text
+    folder = Path(folder)
+    try:
+        keys = json.dumps(list(names))
+        courses = {row[0]: row for row in conn.execute(_COURSES_SQL, (keys,))}
+        rosters = {cid: list(rows) for cid, rows in groupby(conn.execute(_ROSTER_SQL, (keys,)),
+                                                            key=lambda r: r[0])}
+    finally:
+        conn.close()
+    entries = []
+    for cid, course in courses.items():
+        students = rosters.get(cid, ())
+        dest = folder / names[cid]
+        with dest.open("w", newline="", encoding="utf-8") as f:
+            write(f, course, students)
+        entries.append({"course_id": cid, "file": names[cid], "students": len(students),
+                        "bytes": dest.stat().st_size})
+    return entries
+
+# ---------------------- Pipeline ----------------------
+@metrics.instrumented()
+def write_rosters(folder: str | Path, path: str | Path | None = None, course_ids: Optional[Iterable[str]] = None,
+                  fmt: str = "csv", workers: Optional[int] = None,
+                  progress: storage.Progress = None) -> dict:
+    """Write one roster file per course, partitioned across worker processes.
+
+    The files and a ``manifest.json`` describing them are written to
+    ``folder``. With ``workers=1``, or a single partition, everything runs
+    in this process.
+
+    :param folder: Directory to write the reports to.
+    :type folder: str | Path
+    :param path: Database file; defaults to ``storage.DB_PATH``.
+    :type path: str | Path | None
+    :param course_ids: Courses to report; defaults to all. Unknown IDs are skipped.
+    :type course_ids: Iterable[str] | None
+    :param fmt: ``"csv"`` or ``"text"``.
+    :type fmt: str
+    :param workers: Worker processes; defaults to the CPU count.
+    :type workers: int | None
+    :param progress: Optional ``progress(stage, done, total)`` callback,
+        called once per finished partition.
+    :raises FileNotFoundError: If the database does not exist.
+    :raises ValueError: If ``fmt`` is unknown.
+    :return: The manifest: ``{"format", "database", "workers", "partitions",
+        "courses", "students", "seconds", "files": [{"course_id", "file",
+        "students", "bytes"}]}`` with files in course ID order.
+    :rtype: dict
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown report format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    db = Path(path if path is not None else storage.DB_PATH)
+    if not db.exists():
+        raise FileNotFoundError(db)
+    started = time.perf_counter()
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    conn = sqlite3.connect(f"{db.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        sizes = dict(conn.execute("""SELECT c.course_id, COUNT(r.student_id) FROM courses c
+                                     LEFT JOIN registrations r ON r.course_id = c.course_id
+                                     GROUP BY c.course_id"""))
+    finally:
+        conn.close()
+    if course_ids is not None:
+        wanted = set(course_ids)
+        sizes = {cid: n for cid, n in sizes.items() if cid in wanted}
+    names = _file_names(sorted(sizes), FORMATS[fmt])
+    parts = partition(sizes, min(workers, len(sizes)))
+
+    entries, done = [], 0
+    def collect(result):
+        nonlocal done
+        entries.extend(result)
+        done += 1
+        storage._report(progress, "rosters", done, len(parts), every=1)
+    tasks = [(str(db), str(folder), {cid: names[cid] for cid in ids}, fmt) for ids in parts]
+    if len(tasks) <= 1 or workers == 1:
+        for task in tasks:
+            collect(_write_partition(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            for future in as_completed([pool.submit(_write_partition, *task) for task in tasks]):
+                collect(future.result())
+
+    entries.sort(key=lambda e: e["course_id"])
+    manifest = {
+        "format": fmt,
+        "database": str(db),
+        "workers": min(workers, len(tasks)) if tasks else 0,
+        "partitions": len(tasks),
+        "courses": len(entries),
+        "students": sum(e["students"] for e in entries),
+        "seconds": round(time.perf_counter() - started, 3),
+        "files": entries,
+    }
+    (folder / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    if metrics.is_enabled():
+        metrics.record("reports.write_rosters", rows=manifest["students"],
+                       nbytes=sum(e["bytes"] for e in entries))
+    return manifest
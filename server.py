@@ -0,0 +1,404 @@
+"""Local HTTP/JSON API over the School data model.
+
+Serves CRUD, register/assign and search endpoints from an asyncio event
+loop; all model and database work runs in a bounded thread pool so slow
+queries never stall other connections. Start it with::
+
+    python server.py --db school.db --port 8080 --workers 4
+
+Endpoints (``{entity}`` is ``students``, ``instructors`` or ``courses``)::
+
+    GET    /health
+    GET    /search?q=&offset=&limit=                       all three collections
+    GET    /{entity}?q=&offset=&limit=                     paginated listing/search
+    POST   /{entity}                                       create (409 if the ID exists)
+    GET    /{entity}/{id}
+    PATCH  /{entity}/{id}                                  update name/age/email or course_name
+    DELETE /{entity}/{id}                                  delete with cascades
+    GET    /courses/{course_id}/students?offset=&limit=    roster
+    PUT    /courses/{course_id}/students/{student_id}      register
+    PUT    /courses/{course_id}/instructor/{instructor_id} assign
+
+GET responses carry an ``ETag`` that changes with every write (and, for
+the SQLite backend, with commits from other processes); a matching
+``If-None-Match`` returns ``304`` without running the query.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from itertools import islice
+from typing import Callable, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import metrics
+from models import Course, Instructor, School, Student
+
+ENTITIES = ("students", "instructors", "courses")
+DEFAULT_LIMIT, MAX_LIMIT = 50, 1000
+MAX_BODY = 1 << 20
+
+_REASONS = {200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+            404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+            422: "Unprocessable Entity", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# fields clients may send, mapped to model attribute names
+_EDITABLE = {
+    "students": {"name": "name", "age": "age", "email": "_email"},
+    "instructors": {"name": "name", "age": "age", "email": "_email"},
+    "courses": {"course_name": "course_name"},
+}
+
+class HttpError(Exception):
+    """Error that maps directly to an HTTP status."""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _public(obj) -> dict:
+    """Return an entity as JSON-ready data, exposing ``email`` instead of ``_email``."""
+    d = asdict(obj)
+    if "_email" in d:
+        d["email"] = d.pop("_email")
+    return d
+
+def _page(rows, offset: int, limit: int) -> dict:
+    items = [_public(o) for o in islice(rows, offset, offset + limit + 1)]
+    more = len(items) > limit
+    return {"items": items[:limit], "offset": offset, "limit": limit,
+            "next_offset": offset + limit if more else None}
+
+def _age(value) -> int:
+    # JSON integers only: "20" or 20.5 would otherwise reach the model and SQLite as-is
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise HttpError(422, "age must be an integer")
+    return value
+
+def _int_param(params: dict, name: str, default: int, maximum: Optional[int] = None) -> int:
+    raw = params.get(name, [None])[0]
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if value < 0:
+        raise HttpError(400, f"{name} must be non-negative")
+    return min(value, maximum) if maximum is not None else value
+
+class SchoolService:
+    """Thread-safe request handlers over one School.
+
+    Writes are serialised with a lock. For in-memory schools every read
+    works on an O(1) snapshot taken at the current revision, so concurrent
+    reads never block each other or see half-applied writes. Schools whose
+    snapshots are not cheap (:class:`storage.SqliteSchool`, see
+    ``School.cheap_snapshots``) are read under the lock instead.
+
+    :param school: School (or ``SqliteSchool``) to serve.
+    :type school: School
+    """
+    def __init__(self, school: School):
+        self.school = school
+        self._lock = threading.Lock()
+        self._revision = 0
+        self._snap = None
+        self._snap_rev = -1
+        self._snapshots = school.cheap_snapshots
+
+    def version(self) -> str:
+        """Return the current data version used as the ETag."""
+        with self._lock:
+            return self._version()
+
+    def _version(self) -> str:
+        # caller holds self._lock
+        conn = getattr(self.school, "conn", None)
+        if conn is None:
+            return str(self._revision)
+        return f"{self._revision}.{conn.execute('PRAGMA data_version').fetchone()[0]}"
+
+    def _view(self, fn, fresh: Optional[Callable[[str], bool]] = None) -> Tuple[str, object]:
+        """Run ``fn`` on a consistent view of the school.
+
+        The version is taken in the same lock hold as the snapshot (or, without
+        cheap snapshots, the whole query), so it always describes the data
+        ``fn`` saw. When ``fresh(version)`` is true ``fn`` is skipped.
+
+        :return: ``(version, result)``; ``result`` is ``None`` if skipped.
+        """
+        if not self._snapshots:
+            with self._lock:
+                version = self._version()
+                return version, None if fresh and fresh(version) else fn(self.school)
+        with self._lock:
+            version = self._version()
+            if fresh and fresh(version):
+                return version, None
+            if self._snap_rev != self._revision:
+                self._snap, self._snap_rev = self.school.snapshot(), self._revision
+            snap = self._snap
+        return version, fn(snap)
+
+    def _read(self, fn):
+        return self._view(fn)[1]
+
+    def _write(self, fn):
+        # failed writes (409/404/422) leave the data, and so the ETag, alone
+        with self._lock:
+            result = fn(self.school)
+            self._revision += 1
+            return result
+
+    # ---------------------- Routing ----------------------
+    def handle(self, method: str, target: str, headers: dict, body: bytes) -> Tuple[int, Optional[dict], dict]:
+        """Run one request; returns ``(status, payload, extra_headers)``.
+
+        Called from a worker thread.
+        """
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        params = parse_qs(url.query)
+        if method in ("GET", "HEAD"):
+            query = self._query(parts, params)
+            inm = headers.get("if-none-match")
+            tags = {t.strip() for t in inm.split(",")} if inm else set()
+            version, payload = self._view(query, lambda v: "*" in tags or f'"{v}"' in tags)
+            etag = f'"{version}"'
+            if payload is None:
+                return 304, None, {"ETag": etag}
+            if parts == ["health"]:
+                payload["version"] = version
+            return 200, payload, {"ETag": etag}
+        data = self._json(body) if body else {}
+        if method == "POST" and len(parts) == 1:
+            return 201, self._create(parts[0], data), {}
+        if method == "PATCH" and len(parts) == 2:
+            return 200, self._update(parts[0], parts[1], data), {}
+        if method == "DELETE" and len(parts) == 2:
+            self._delete(parts[0], parts[1])
+            return 204, None, {}
+        if method == "PUT" and len(parts) == 4 and parts[0] == "courses":
+            if parts[2] == "students":
+                self._write(lambda sc: sc.register_student_in_course(parts[3], parts[1]))
+            elif parts[2] == "instructor":
+                self._write(lambda sc: sc.assign_instructor_to_course(parts[3], parts[1]))
+            else:
+                raise HttpError(404, "Not found")
+            return 200, self._read(lambda sc: _public(sc.courses[parts[1]])), {}
+        raise HttpError(405 if parts and parts[0] in ENTITIES else 404, f"{method} {url.path} not supported")
+
+    @staticmethod
+    def _json(body: bytes) -> dict:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HttpError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Body must be a JSON object")
+        return data
+
+    @staticmethod
+    def _entity(name: str) -> str:
+        if name not in ENTITIES:
+            raise HttpError(404, f"Unknown collection: {name}")
+        return name
+
+    def _query(self, parts, params) -> Callable[[School], dict]:
+        """Validate a GET and return the function that builds its payload."""
+        offset = _int_param(params, "offset", 0)
+        limit = _int_param(params, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+        q = params.get("q", [""])[0]
+        if parts == ["health"]:
+            return lambda sc: {"status": "ok"}
+        if parts == ["search"]:
+            return lambda sc: {e: _page(sc.search_iter(q, e), offset, limit) for e in ENTITIES}
+        if len(parts) == 1:
+            entity = self._entity(parts[0])
+            return lambda sc: _page(sc.search_iter(q, entity), offset, limit)
+        if len(parts) == 2:
+            entity = self._entity(parts[0])
+            return lambda sc: _public(getattr(sc, entity)[parts[1]])
+        if len(parts) == 3 and parts[0] == "courses" and parts[2] == "students":
+            return lambda sc: _page(iter(sc.roster(parts[1])), offset, limit)
+        raise HttpError(404, "Not found")
+
+    def _create(self, entity: str, data: dict) -> dict:
+        entity = self._entity(entity)
+        try:
+            if entity == "courses":
+                obj = Course(course_id=str(data["course_id"]), course_name=str(data["course_name"]))
+                key, add = obj.course_id, "add_course"
+            elif entity == "students":
+                obj = Student(name=str(data["name"]), age=_age(data["age"]), _email=str(data.get("email", "")),
+                              student_id=str(data["student_id"]))
+                key, add = obj.student_id, "add_student"
+            else:
+                obj = Instructor(name=str(data["name"]), age=_age(data["age"]), _email=str(data.get("email", "")),
+                                 instructor_id=str(data["instructor_id"]))
+                key, add = obj.instructor_id, "add_instructor"
+        except KeyError as e:
+            raise HttpError(422, f"Missing field: {e.args[0]}")
+        def create(sc):
+            if key in getattr(sc, entity):
+                raise HttpError(409, f"{key} already exists")
+            getattr(sc, add)(obj)
+            return _public(obj)
+        return self._write(create)
+
+    def _update(self, entity: str, key: str, data: dict) -> dict:
+        allowed = _EDITABLE[self._entity(entity)]
+        unknown = set(data) - set(allowed)
+        if unknown:
+            raise HttpError(422, f"Fields not editable: {', '.join(sorted(unknown))}")
+        updates = {allowed[k]: v for k, v in data.items()}
+        if "age" in updates:
+            updates["age"] = _age(updates["age"])
+        method = {"students": "update_student", "instructors": "update_instructor", "courses": "update_course"}[entity]
+        def update(sc):
+            getattr(sc, method)(key, **updates)
+            return _public(getattr(sc, entity)[key])
+        return self._write(update)
+
+    def _delete(self, entity: str, key: str):
+        entity = self._entity(entity)
+        method = {"students": "delete_student", "instructors": "delete_instructor", "courses": "delete_course"}[entity]
+        def delete(sc):
+            if key not in getattr(sc, entity):
+                raise KeyError(key)
+            getattr(sc, method)(key)
+        self._write(delete)
+
+class SchoolServer:
+    """asyncio HTTP/1.1 server (with keep-alive) in front of a :class:`SchoolService`.
+
+    :param school: School to serve.
+    :type school: School
+    :param workers: Size of the thread pool running requests.
+    :type workers: int
+    :param queue: Requests allowed to wait for a worker before new ones get ``503``.
+    :type queue: int
+    """
+    def __init__(self, school: School, workers: int = 4, queue: int = 256):
+        self.service = SchoolService(school)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="school-api")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> int:
+        """Start listening; returns the bound port (useful with ``port=0``)."""
+        self._server = await asyncio.start_server(self._client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Serve until cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        """Stop listening and shut the worker pool down."""
+        if self._server is not None:
+            self._server.close()
+        self._pool.shutdown(wait=False)
+
+    @metrics.instrumented("server.request")
+    def _run(self, method, target, headers, body):
+        try:
+            status, payload, extra = self.service.handle(method, target, headers, body)
+        except HttpError as e:
+            status, payload, extra = e.status, {"error": str(e)}, {}
+        except KeyError as e:
+            status, payload, extra = 404, {"error": f"Not found: {e.args[0] if e.args else ''}"}, {}
+        except (ValueError, TypeError) as e:
+            status, payload, extra = 422, {"error": str(e)}, {}
+        except Exception as e:
+            status, payload, extra = 500, {"error": f"{type(e).__name__}: {e}"}, {}
+        finally:
+            self._slots.release()
+        data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        return status, data, extra
+
+    async def _dispatch(self, method, target, headers, body):
+        if not self._slots.acquire(blocking=False):
+            return 503, b'{"error": "Server busy"}', {"Retry-After": "1"}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self._run, method, target, headers, body)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, b'{"error": "Malformed request line"}', {}, False)
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, b'{"error": "Body too large"}', {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, data, extra = await self._dispatch(method.upper(), target, headers, body)
+                await self._respond(writer, status, b"" if method.upper() == "HEAD" else data, extra, keep,
+                                    len(data))
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status: int, data: bytes, extra: dict, keep: bool, length: Optional[int] = None):
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                f"Content-Length: {len(data) if length is None else length}",
+                f"Connection: {'keep-alive' if keep else 'close'}"]
+        if data or length:
+            head.append("Content-Type: application/json")
+        head += [f"{k}: {v}" for k, v in extra.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+
+def main(argv=None) -> int:
+    """Command-line entry point; returns the process exit code."""
+    ap = argparse.ArgumentParser(description="Serve the school database as a JSON API.")
+    ap.add_argument("--db", help="SQLite database path (default: school.db)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--cache-size", type=int, default=4096, help="hydrated entities kept per collection")
+    args = ap.parse_args(argv)
+
+    from storage import SqliteSchool
+    school = SqliteSchool(args.db, cache_size=args.cache_size, check_same_thread=False)
+    server = SchoolServer(school, workers=args.workers)
+
+    async def run():
+        port = await server.start(args.host, args.port)
+        print(f"Serving {school.path} on http://{args.host}:{port}", file=sys.stderr)
+        await server.serve_forever()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        school.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,28 @@ Provides JSON serialization, CSV export, and SQLite database persistence
 for the School data model.
 """
 
-import json, csv, shutil, time
+import json, csv, marshal, os, shutil, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import ItemsView, MutableMapping, ValuesView
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Tuple
-from models import School
+from typing import Callable, List, Mapping, Optional, Tuple
+from models import School, SchoolSnapshot, Student, Instructor, Course
+import metrics
 import sqlite3
 
 DB_PATH = Path("school.db")
 
+# progress(stage, done, total) callback used by the bulk operations
+Progress = Optional[Callable[[str, int, int], None]]
+
+def _report(progress: Progress, stage: str, done: int, total: int, every: int = 1000):
+    if progress is not None and (done % every == 0 or done == total):
+        progress(stage, done, total)
+
+@metrics.instrumented()
 def save_json(school: School, path: str | Path):
     """Save school data to a JSON file.
     
@@ -23,7 +37,11 @@ def save_json(school: School, path: str | Path):
     """
     path = Path(path)
     path.write_text(json.dumps(school.to_dict(), indent=2), encoding="utf-8")
+    if metrics.is_enabled():
+        metrics.record("storage.save_json", rows=len(school.students) + len(school.instructors) + len(school.courses),
+                       nbytes=path.stat().st_size)
 
+@metrics.instrumented()
 def load_json(path: str | Path) -> School:
     """Load school data from a JSON file.
     
@@ -32,10 +50,14 @@ def load_json(path: str | Path) -> School:
     :return: Reconstructed School object.
     :rtype: School
     """
-    data = json.loads(Path(path).read_text(encoding="utf-8"))
-    return School.from_dict(data)
+    text = Path(path).read_text(encoding="utf-8")
+    school = School.from_dict(json.loads(text))
+    metrics.record("storage.load_json", rows=len(school.students) + len(school.instructors) + len(school.courses),
+                   nbytes=len(text))
+    return school
 
-def export_csv(school: School, folder: str | Path):
+@metrics.instrumented()
+def export_csv(school: School, folder: str | Path, progress: Progress = None):
     """Export school data to separate CSV files.
     
     Creates students.csv, instructors.csv, and courses.csv in the target folder.
@@ -44,6 +66,7 @@ def export_csv(school: School, folder: str | Path):
     :type school: School
     :param folder: Directory to write CSV files to.
     :type folder: str | Path
+    :param progress: Optional ``progress(stage, done, total)`` callback.
     """
     folder = Path(folder)
     folder.mkdir(parents=True, exist_ok=True)
@@ -51,84 +74,309 @@ def export_csv(school: School, folder: str | Path):
     with (folder / "students.csv").open("w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(["student_id","name","age","email","registered_courses"])
-        for s in school.students.values():
+        total = len(school.students)
+        for n, s in enumerate(school.students.values(), 1):
             w.writerow([s.student_id,s.name,s.age,s._email,";".join(s.registered_courses)])
+            _report(progress, "students", n, total)
     # Instructors
     with (folder / "instructors.csv").open("w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(["instructor_id","name","age","email","assigned_courses"])
-        for i in school.instructors.values():
+        total = len(school.instructors)
+        for n, i in enumerate(school.instructors.values(), 1):
             w.writerow([i.instructor_id,i.name,i.age,i._email,";".join(i.assigned_courses)])
+            _report(progress, "instructors", n, total)
     # Courses
     with (folder / "courses.csv").open("w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(["course_id","course_name","instructor_id","enrolled_students"])
-        for c in school.courses.values():
+        total = len(school.courses)
+        for n, c in enumerate(school.courses.values(), 1):
             w.writerow([c.course_id,c.course_name,c.instructor_id or "", ";".join(c.enrolled_students)])
+            _report(progress, "courses", n, total)
+    if metrics.is_enabled():
+        metrics.record("storage.export_csv", rows=len(school.students) + len(school.instructors) + len(school.courses),
+                       nbytes=sum((folder / n).stat().st_size for n in ("students.csv", "instructors.csv", "courses.csv")))
+
+# file name -> (header, SELECT producing rows in header order, table with one row per CSV row);
+# readable by load_csv. The table is only counted, for progress totals
+CSV_LAYOUT = {
+    "students.csv": (
+        ["student_id", "name", "age", "email", "registered_courses"],
+        """SELECT s.student_id, s.name, s.age, s.email,
+                  (SELECT group_concat(r.course_id, ';') FROM registrations r WHERE r.student_id = s.student_id)
+           FROM students s""",
+        "students"),
+    "instructors.csv": (
+        ["instructor_id", "name", "age", "email", "assigned_courses"],
+        """SELECT i.instructor_id, i.name, i.age, i.email, g.ids
+           FROM instructors i
+           LEFT JOIN (SELECT instructor_id, group_concat(course_id, ';') AS ids
+                      FROM courses GROUP BY instructor_id) g ON g.instructor_id = i.instructor_id""",
+        "instructors"),
+    "courses.csv": (
+        ["course_id", "course_name", "instructor_id", "enrolled_students"],
+        """SELECT c.course_id, c.course_name, c.instructor_id, g.ids
+           FROM courses c
+           LEFT JOIN (SELECT course_id, group_concat(student_id, ';') AS ids
+                      FROM registrations GROUP BY course_id) g ON g.course_id = c.course_id""",
+        "courses"),
+}
+
+def _stream_csv(db: Path, dest: Path, header: list, sql: str, table: Optional[str], buffer_size: int,
+                progress: Progress) -> int:
+    conn = sqlite3.connect(f"{db.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        total = 0
+        if progress:
+            # counting the base table walks one index; counting the SELECT would run the export twice
+            count = f"SELECT COUNT(*) FROM {table}" if table else f"SELECT COUNT(*) FROM ({sql})"
+            total = conn.execute(count).fetchone()[0]
+        cur = conn.execute(sql)
+        n = 0
+        with dest.open("w", newline="", encoding="utf-8", buffering=buffer_size) as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            while True:
+                rows = cur.fetchmany(5000)
+                if not rows:
+                    break
+                w.writerows(rows)
+                n += len(rows)
+                _report(progress, dest.stem, n, total, every=1)
+        return n
+    finally:
+        conn.close()
+
+@metrics.instrumented()
+def export_db_csv(folder: str | Path, path: str | Path | None = None, layout: Optional[dict] = None,
+                  workers: int = 3, buffer_size: int = 1 << 20, progress: Progress = None) -> dict:
+    """Export the database to CSV files straight from SQLite cursors.
+    
+    Unlike :func:`export_csv` no School is built: each file is streamed
+    from its own read-only connection (course lists come from
+    ``group_concat``) through a large buffered writer, and the files are
+    written concurrently on a thread pool. Memory stays flat however large
+    the database is. The default layout is the one :func:`load_csv` reads.
+    
+    :param folder: Directory to write the CSV files to.
+    :type folder: str | Path
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :param layout: ``{file name: (header, SELECT[, table])}``; defaults to :data:`CSV_LAYOUT`.
+        ``table`` must have one row per CSV row; its count is the ``progress``
+        total. Without it the SELECT itself is counted, which runs it twice.
+    :type layout: dict | None
+    :param workers: Files written at the same time.
+    :type workers: int
+    :param buffer_size: Write buffer per file in bytes.
+    :type buffer_size: int
+    :param progress: Optional ``progress(stage, done, total)`` callback, called
+        from the worker threads once per fetched batch.
+    :return: Rows written per file name.
+    :rtype: dict[str, int]
+    """
+    db = Path(path if path is not None else DB_PATH)
+    if not db.exists():
+        raise FileNotFoundError(db)
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    layout = layout or CSV_LAYOUT
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {name: pool.submit(_stream_csv, db, folder / name, header, sql, table, buffer_size, progress)
+                   for name, (header, sql, table) in ((n, (*entry, None)[:3]) for n, entry in layout.items())}
+        counts = {name: f.result() for name, f in futures.items()}
+    if metrics.is_enabled():
+        metrics.record("storage.export_db_csv", rows=sum(counts.values()),
+                       nbytes=sum((folder / n).stat().st_size for n in counts))
+    return counts
+
+@metrics.instrumented()
+def load_csv(folder: str | Path) -> School:
+    """Load school data from CSV files written by :func:`export_csv`.
+    
+    :param folder: Directory containing students.csv, instructors.csv and courses.csv.
+    :type folder: str | Path
+    :raises FileNotFoundError: If one of the three files is missing.
+    :return: Reconstructed School object.
+    :rtype: School
+    """
+    folder = Path(folder)
+    def rows(name):
+        with (folder / name).open(newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    split = lambda v: [x for x in (v or "").split(";") if x]
+    data = {
+        "students": [{"student_id": r["student_id"], "name": r["name"], "age": int(r["age"]), "_email": r["email"],
+                      "registered_courses": split(r["registered_courses"])} for r in rows("students.csv")],
+        "instructors": [{"instructor_id": r["instructor_id"], "name": r["name"], "age": int(r["age"]),
+                         "_email": r["email"], "assigned_courses": split(r["assigned_courses"])}
+                        for r in rows("instructors.csv")],
+        "courses": [{"course_id": r["course_id"], "course_name": r["course_name"],
+                     "instructor_id": r["instructor_id"] or None, "enrolled_students": split(r["enrolled_students"])}
+                    for r in rows("courses.csv")],
+    }
+    return School.from_dict(data)
 
 # ---------------------- SQLite ----------------------
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+def get_conn(path: str | Path | None = None):
+    return sqlite3.connect(path if path is not None else DB_PATH)
 
-def init_db():
+@metrics.instrumented()
+def init_db(path: str | Path | None = None):
     """Initialize the SQLite database with required tables.
     
     Creates students, instructors, courses, and registrations tables
     with appropriate foreign key constraints.
+    
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.executescript(
-        """
-        PRAGMA foreign_keys = ON;
-        CREATE TABLE IF NOT EXISTS students (
-            student_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            age INTEGER NOT NULL CHECK(age >= 0),
-            email TEXT NOT NULL
-        );
-        CREATE TABLE IF NOT EXISTS instructors (
-            instructor_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            age INTEGER NOT NULL CHECK(age >= 0),
-            email TEXT NOT NULL
-        );
-        CREATE TABLE IF NOT EXISTS courses (
-            course_id TEXT PRIMARY KEY,
-            course_name TEXT NOT NULL,
-            instructor_id TEXT,
-            FOREIGN KEY (instructor_id) REFERENCES instructors(instructor_id) ON DELETE SET NULL
-        );
-        CREATE TABLE IF NOT EXISTS registrations (
-            student_id TEXT NOT NULL,
-            course_id TEXT NOT NULL,
-            PRIMARY KEY (student_id, course_id),
-            FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
-            FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
-        );
-        """
-    )
+    _create_schema(path if path is not None else DB_PATH)
+
+# table -> CREATE TABLE statement; verify_db compares existing tables with these
+_SCHEMA = {
+    "students": """CREATE TABLE IF NOT EXISTS students (
+        student_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        age INTEGER NOT NULL CHECK(age >= 0),
+        email TEXT NOT NULL
+    )""",
+    "instructors": """CREATE TABLE IF NOT EXISTS instructors (
+        instructor_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        age INTEGER NOT NULL CHECK(age >= 0),
+        email TEXT NOT NULL
+    )""",
+    "courses": """CREATE TABLE IF NOT EXISTS courses (
+        course_id TEXT PRIMARY KEY,
+        course_name TEXT NOT NULL,
+        instructor_id TEXT,
+        FOREIGN KEY (instructor_id) REFERENCES instructors(instructor_id) ON DELETE SET NULL ON UPDATE CASCADE
+    )""",
+    "registrations": """CREATE TABLE IF NOT EXISTS registrations (
+        student_id TEXT NOT NULL,
+        course_id TEXT NOT NULL,
+        PRIMARY KEY (student_id, course_id),
+        FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE ON UPDATE CASCADE
+    )""",
+}
+# column -> its name in databases written by the PyQt window before it shared init_db
+_LEGACY_COLUMNS = {"email": "_email"}
+# the primary key serves lookups by student; rosters and course deletes go by course
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS registrations_course ON registrations(course_id)",
+    "CREATE INDEX IF NOT EXISTS courses_instructor ON courses(instructor_id)",
+)
+
+def _create_schema(path: str | Path):
+    conn = sqlite3.connect(path)
+    conn.executescript("PRAGMA foreign_keys = ON;\n" + ";\n".join((*_SCHEMA.values(), *_INDEXES)) + ";")
     conn.commit()
     conn.close()
 
-def school_to_db(school: School):
-    init_db()
-    conn = get_conn()
+def _table_shape(conn: sqlite3.Connection, table: str) -> Tuple[dict, set]:
+    """Return ``({column: (type, not null, pk position)}, {foreign keys})`` of a table."""
+    columns = {r[1]: (r[2].upper(), bool(r[3]), r[5]) for r in conn.execute(f"PRAGMA table_info({table})")}
+    fks = {(r[3], r[2], r[4], r[5].upper(), r[6].upper()) for r in conn.execute(f"PRAGMA foreign_key_list({table})")}
+    return columns, fks
+
+def _source(columns: dict, col: str) -> Optional[str]:
+    """Return the existing column that holds ``col``'s data, if any."""
+    if col in columns:
+        return col
+    legacy = _LEGACY_COLUMNS.get(col)
+    return legacy if legacy in columns else None
+
+def _describe(kind: str, notnull: bool, pk: int) -> str:
+    return (kind or "untyped") + (" NOT NULL" if notnull else "") + (" PRIMARY KEY" if pk else "")
+
+def schema_drift(conn: sqlite3.Connection) -> dict:
+    """Compare each table's columns and foreign keys with :data:`_SCHEMA`.
+    
+    Databases created by older versions, or by the PyQt window before it
+    shared :func:`init_db`, can lack ``NOT NULL`` columns or cascading
+    foreign keys. ``CHECK`` constraints are not visible to the pragmas and
+    are not compared.
+    
+    :return: ``{table: [difference, ...]}`` for the tables that differ.
+    :rtype: dict[str, list[str]]
+    """
+    ref = sqlite3.connect(":memory:")
+    try:
+        for ddl in _SCHEMA.values():
+            ref.execute(ddl)
+        drift = {}
+        for table in _SCHEMA:
+            (have_cols, have_fks), (want_cols, want_fks) = _table_shape(conn, table), _table_shape(ref, table)
+            diffs = []
+            for col, (kind, notnull, pk) in want_cols.items():
+                have = have_cols.get(col)
+                if have is None:
+                    src = _source(have_cols, col)
+                    diffs.append(f"column {col} is named {src}" if src else f"column {col} is missing")
+                elif have != (kind, notnull, pk):
+                    diffs.append(f"column {col} is {_describe(*have)}, expected {_describe(kind, notnull, pk)}")
+            for col, parent, to, on_update, on_delete in sorted(want_fks - have_fks):
+                diffs.append(f"{col} lacks REFERENCES {parent}({to}) ON UPDATE {on_update} ON DELETE {on_delete}")
+            if diffs:
+                drift[table] = diffs
+        return drift
+    finally:
+        ref.close()
+
+def _rebuild_table(conn: sqlite3.Connection, table: str):
+    """Recreate ``table`` with its :data:`_SCHEMA` definition, keeping its rows.
+    
+    Runs inside the caller's transaction; foreign keys must not be enforced.
+    """
+    have = _table_shape(conn, table)[0]
+    tmp = f"_rebuild_{table}"
+    conn.execute(_SCHEMA[table].replace(f"CREATE TABLE IF NOT EXISTS {table}", f"CREATE TABLE {tmp}", 1))
+    cols = [(c, _source(have, c)) for c in _table_shape(conn, tmp)[0]]
+    cols = [(c, src) for c, src in cols if src]
+    conn.execute(f"INSERT INTO {tmp}({', '.join(c for c, _ in cols)}) "
+                 f"SELECT {', '.join(src for _, src in cols)} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+
+@metrics.instrumented()
+def school_to_db(school: School, prune: bool = False, progress: Progress = None,
+                 path: str | Path | None = None):
+    """Upsert the model into the database.
+    
+    :param school: School object to write.
+    :type school: School
+    :param prune: Also delete database rows whose IDs are not in ``school``,
+        making the database mirror the model.
+    :type prune: bool
+    :param progress: Optional ``progress(stage, done, total)`` callback.
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    """
+    init_db(path)
+    conn = get_conn(path)
     cur = conn.cursor()
     # Upsert instructors
-    for i in school.instructors.values():
+    total = len(school.instructors)
+    for n, i in enumerate(school.instructors.values(), 1):
         cur.execute("""INSERT INTO instructors(instructor_id,name,age,email)
                        VALUES(?,?,?,?)
                        ON CONFLICT(instructor_id) DO UPDATE SET name=excluded.name, age=excluded.age, email=excluded.email""",
                     (i.instructor_id, i.name, i.age, i._email))
+        _report(progress, "instructors", n, total)
     # Upsert students
-    for s in school.students.values():
+    total = len(school.students)
+    for n, s in enumerate(school.students.values(), 1):
         cur.execute("""INSERT INTO students(student_id,name,age,email)
                        VALUES(?,?,?,?)
                        ON CONFLICT(student_id) DO UPDATE SET name=excluded.name, age=excluded.age, email=excluded.email""",
                     (s.student_id, s.name, s.age, s._email))
+        _report(progress, "students", n, total)
     # Upsert courses
-    for c in school.courses.values():
+    total = len(school.courses)
+    for n, c in enumerate(school.courses.values(), 1):
         cur.execute("""INSERT INTO courses(course_id,course_name,instructor_id)
                        VALUES(?,?,?)
                        ON CONFLICT(course_id) DO UPDATE SET course_name=excluded.course_name, instructor_id=excluded.instructor_id""",
@@ -137,35 +385,171 @@ def school_to_db(school: School):
         cur.execute("DELETE FROM registrations WHERE course_id=?", (c.course_id,))
         for sid in c.enrolled_students:
             cur.execute("INSERT OR IGNORE INTO registrations(student_id,course_id) VALUES(?,?)", (sid, c.course_id))
+        _report(progress, "courses", n, total)
+    if prune:
+        # children before parents so enforced foreign keys never see a dangling row
+        for table, key, keep in (("registrations", "course_id", school.courses),
+                                 ("registrations", "student_id", school.students),
+                                 ("courses", "course_id", school.courses),
+                                 ("students", "student_id", school.students),
+                                 ("instructors", "instructor_id", school.instructors)):
+            stale = [(k,) for (k,) in cur.execute(f"SELECT DISTINCT {key} FROM {table}").fetchall() if k not in keep]
+            cur.executemany(f"DELETE FROM {table} WHERE {key}=?", stale)
     conn.commit()
     conn.close()
+    metrics.record("storage.school_to_db", rows=len(school.students) + len(school.instructors) + len(school.courses))
+
+@metrics.instrumented()
+def db_to_school(progress: Progress = None, path: str | Path | None = None) -> School:
+    """Load the whole database into a new School.
+    
+    Rows are taken as stored: they were validated when they were written,
+    and re-checking them here would lock out data saved under an older or
+    looser rule (such as the PyQt window's email pattern). The collections
+    are built in one pass without going through the School API. Links to
+    rows that do not exist are skipped; :func:`verify_db` reports them.
+    
+    :param progress: Optional ``progress(stage, done, total)`` callback.
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :return: Hydrated School object.
+    :rtype: School
+    """
+    init_db(path)
+    conn = get_conn(path)
+    try:
+        sc = _read_school(conn, progress)
+    finally:
+        conn.close()
+    metrics.record("storage.db_to_school", rows=len(sc.students) + len(sc.instructors) + len(sc.courses))
+    return sc
 
-def db_to_school() -> School:
+def _read_school(conn: sqlite3.Connection, progress: Progress = None) -> School:
+    """Build a School from every row visible on ``conn``; see :func:`db_to_school`."""
+    count = lambda table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] if progress else 0
+    total = count("instructors")
+    instructors = {}
+    for n, (iid, name, age, email) in enumerate(conn.execute("SELECT instructor_id,name,age,email FROM instructors"), 1):
+        instructors[iid] = Instructor(name=name, age=age, _email=email, instructor_id=iid)
+        _report(progress, "instructors", n, total)
+    total = count("students")
+    students = {}
+    for n, (sid, name, age, email) in enumerate(conn.execute("SELECT student_id,name,age,email FROM students"), 1):
+        students[sid] = Student(name=name, age=age, _email=email, student_id=sid)
+        _report(progress, "students", n, total)
+    total = count("courses")
+    courses = {}
+    for n, (cid, cname, iid) in enumerate(conn.execute("SELECT course_id,course_name,instructor_id FROM courses"), 1):
+        courses[cid] = Course(course_id=cid, course_name=cname, instructor_id=iid or None)
+        ins = instructors.get(iid) if iid else None
+        if ins is not None:
+            ins.assigned_courses.append(cid)
+        _report(progress, "courses", n, total)
+    # (student_id, course_id) is the primary key, so no link can repeat
+    total = count("registrations")
+    for n, (sid, cid) in enumerate(conn.execute("SELECT student_id, course_id FROM registrations"), 1):
+        st, c = students.get(sid), courses.get(cid)
+        if st is not None and c is not None:
+            st.registered_courses.append(cid)
+            c.enrolled_students.append(sid)
+        _report(progress, "registrations", n, total)
+    sc = School()
+    sc.instructors, sc.students, sc.courses = instructors, students, courses
+    return sc
+
+@metrics.instrumented()
+def verify_db(path: str | Path | None = None, repair: bool = False, quick: bool = False) -> list:
+    """Check database integrity and referential consistency.
+    
+    Runs SQLite's integrity check, compares the tables with the current
+    schema (:func:`schema_drift`), and looks for rows the constraints should
+    have rejected: NULL or negative fields, dangling registrations and
+    course instructors. Older schemas without enforced foreign keys may
+    contain these. Dangling references are found by joining the distinct
+    IDs a child table uses to its parent's primary key, so each parent is
+    probed once per ID rather than once per row.
+    
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :param repair: In one transaction, delete dangling and NULL
+        registrations, clear dangling course instructors, and rebuild
+        drifted tables with the current schema. A table that still has NULL
+        or negative fields is not rebuilt. Integrity errors are never
+        repaired; restore a backup instead.
+    :type repair: bool
+    :param quick: Use ``PRAGMA quick_check``, which skips index consistency
+        and is much faster on large files.
+    :type quick: bool
+    :return: Problems found, before any repair; empty when the database is healthy.
+    :rtype: list[str]
+    """
+    init_db(path)
+    conn = get_conn(path)
+    try:
+        check = "quick_check" if quick else "integrity_check"
+        problems = [f"integrity: {r[0]}" for r in conn.execute(f"PRAGMA {check}") if r[0] != "ok"]
+        drift = schema_drift(conn)
+        problems += [f"schema: {table}: {d}" for table, diffs in drift.items() for d in diffs]
+        invalid = {}
+        for table, key, required in (("students", "student_id", ("name", "age", "email")),
+                                     ("instructors", "instructor_id", ("name", "age", "email")),
+                                     ("courses", "course_id", ("course_name",))):
+            columns = _table_shape(conn, table)[0]
+            sources = [_source(columns, c) for c in required]
+            if None in sources:
+                invalid[table] = ["a required column is missing"]
+                continue
+            where = " OR ".join([f"{c} IS NULL" for c in sources] + (["age < 0"] if "age" in required else []))
+            invalid[table] = [r[0] for r in conn.execute(f"SELECT {key} FROM {table} WHERE {where}")]
+            problems += [f"{table[:-1]} {k} has a NULL or negative field" for k in invalid[table]]
+        # distinct referenced IDs first: one index walk each, then one probe per ID rather than per row
+        for col, parent, what in (("student_id", "students", "student"), ("course_id", "courses", "course")):
+            missing = [r[0] for r in conn.execute(
+                f"""SELECT d.{col} FROM (SELECT DISTINCT {col} FROM registrations) d
+                    LEFT JOIN {parent} p ON p.{col} = d.{col} WHERE p.{col} IS NULL""")]
+            for key in missing:
+                problems += [f"registration ({sid}, {cid}) references a missing {what}" for sid, cid in
+                             conn.execute(f"SELECT student_id, course_id FROM registrations WHERE {col} IS ?", (key,))]
+        problems += [f"course {cid} references missing instructor {iid}" for cid, iid in conn.execute(
+            """SELECT c.course_id, c.instructor_id FROM courses c
+               LEFT JOIN instructors i ON i.instructor_id = c.instructor_id
+               WHERE c.instructor_id IS NOT NULL AND i.instructor_id IS NULL""")]
+        if repair and problems:
+            conn.execute("BEGIN")
+            conn.execute("""DELETE FROM registrations WHERE student_id IS NULL OR course_id IS NULL
+                            OR student_id NOT IN (SELECT student_id FROM students)
+                            OR course_id NOT IN (SELECT course_id FROM courses)""")
+            conn.execute("""UPDATE courses SET instructor_id = NULL WHERE instructor_id IS NOT NULL
+                            AND instructor_id NOT IN (SELECT instructor_id FROM instructors)""")
+            for table in drift:
+                if not invalid.get(table):
+                    _rebuild_table(conn, table)
+            for ddl in _INDEXES:
+                conn.execute(ddl)
+            conn.commit()
+    finally:
+        conn.close()
+    metrics.record("storage.verify_db", rows=len(problems))
+    return problems
+
+def db_stats() -> dict:
+    """Return row counts and file size of the database.
+    
+    :return: Counts per table, ``registrations``, ``unassigned_courses`` and ``bytes``.
+    :rtype: dict
+    """
     init_db()
     conn = get_conn()
-    cur = conn.cursor()
-    sc = School()
-    # Instructors
-    for row in cur.execute("SELECT instructor_id,name,age,email FROM instructors"):
-        from models import Instructor
-        ins = Instructor(name=row[1], age=row[2], _email=row[3], instructor_id=row[0])
-        sc.add_instructor(ins)
-    # Students
-    for row in cur.execute("SELECT student_id,name,age,email FROM students"):
-        from models import Student
-        st = Student(name=row[1], age=row[2], _email=row[3], student_id=row[0])
-        sc.add_student(st)
-    # Courses
-    from models import Course
-    for row in cur.execute("SELECT course_id,course_name,instructor_id FROM courses"):
-        c = Course(course_id=row[0], course_name=row[1], instructor_id=row[2] or None)
-        sc.add_course(c)
-    # Registrations
-    for row in cur.execute("SELECT student_id, course_id FROM registrations"):
-        sc.register_student_in_course(row[0], row[1])
+    stats = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+             for t in ("students", "instructors", "courses", "registrations")}
+    stats["unassigned_courses"] = conn.execute("SELECT COUNT(*) FROM courses WHERE instructor_id IS NULL").fetchone()[0]
+    stats["students_without_courses"] = conn.execute(
+        "SELECT COUNT(*) FROM students WHERE student_id NOT IN (SELECT student_id FROM registrations)").fetchone()[0]
     conn.close()
-    return sc
+    stats["bytes"] = Path(DB_PATH).stat().st_size
+    return stats
 
+@metrics.instrumented()
 def backup_db(dest_folder: str | Path) -> Path:
     init_db()
     dest_folder = Path(dest_folder)
@@ -173,4 +557,499 @@ def backup_db(dest_folder: str | Path) -> Path:
     ts = time.strftime("%Y%m%d-%H%M%S")
     backup_path = dest_folder / f"school-backup-{ts}.db"
     shutil.copyfile(DB_PATH, backup_path)
+    if metrics.is_enabled():
+        metrics.record("storage.backup_db", nbytes=backup_path.stat().st_size)
     return backup_path
+
+# ---------------------- Renames ----------------------
+# prefix of the temporary keys a rename passes through when new IDs reuse old ones
+_RENAME_STAGING = "\x1frename\x1f"
+
+def foreign_keys_to(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str, bool]]:
+    """List the columns that reference ``table``, from ``PRAGMA foreign_key_list``.
+    
+    :return: ``(child table, column, cascades on update)`` triples; the last is
+        only True if the key declares ``ON UPDATE CASCADE`` and the
+        connection enforces foreign keys.
+    :rtype: list[tuple]
+    """
+    enforced = bool(conn.execute("PRAGMA foreign_keys").fetchone()[0])
+    out = []
+    for (child,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"):
+        for fk in conn.execute(f"PRAGMA foreign_key_list({child})"):
+            if fk[2] == table:
+                out.append((child, fk[3], enforced and fk[5].upper() == "CASCADE"))
+    return out
+
+@metrics.instrumented()
+def rename_ids(conn: sqlite3.Connection, entity: str, mapping: Mapping[str, str]) -> int:
+    """Re-key rows of one entity table and every column that references them.
+    
+    The mapping is loaded into a temporary ``id_map`` table, then the entity
+    table and each referencing column are updated with one statement each.
+    Columns declared ``ON UPDATE CASCADE`` are left to SQLite. If new IDs
+    reuse old ones (chains or swaps), rows pass through temporary keys first.
+    Runs in the caller's transaction and does not commit.
+    
+    :param conn: Open connection.
+    :type conn: sqlite3.Connection
+    :param entity: ``"students"``, ``"instructors"`` or ``"courses"``.
+    :type entity: str
+    :param mapping: ``{old_id: new_id}``; unknown old IDs are ignored.
+    :type mapping: Mapping[str, str]
+    :raises ValueError: If a new ID is empty, given twice, or taken by a row that is not renamed.
+    :return: Number of entity rows renamed.
+    :rtype: int
+    """
+    table, key = _TABLES[entity][0], _TABLES[entity][1]
+    mapping = {o: n for o, n in mapping.items() if n != o}
+    if not mapping:
+        return 0
+    if not all(mapping.values()):
+        raise ValueError(f"{key} is required")
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS id_map(old TEXT PRIMARY KEY, new TEXT NOT NULL UNIQUE)")
+
+    def load(pairs):
+        cur.execute("DELETE FROM temp.id_map")
+        cur.executemany("INSERT INTO temp.id_map(old, new) VALUES(?, ?)", pairs)
+
+    try:
+        load(mapping.items())
+    except sqlite3.IntegrityError:
+        raise ValueError("a new ID is given twice") from None
+    # referencing rows are fixed up after their parent, so check keys at commit; set
+    # inside the transaction because the DDL above would have reset it
+    cur.execute("PRAGMA defer_foreign_keys = ON")
+    taken = cur.execute(f"SELECT new FROM temp.id_map WHERE new IN (SELECT {key} FROM {table}) "
+                        f"AND new NOT IN (SELECT old FROM temp.id_map)").fetchone()
+    if taken:
+        raise ValueError(f"{taken[0]} already exists")
+    if set(mapping).isdisjoint(mapping.values()):
+        passes = [None]
+    else:
+        passes = [[(o, _RENAME_STAGING + o) for o in mapping],
+                  [(_RENAME_STAGING + o, n) for o, n in mapping.items()]]
+    targets = [(table, key)] + [(t, c) for t, c, cascades in foreign_keys_to(conn, table) if not cascades]
+    renamed = 0
+    for pairs in passes:
+        if pairs is not None:
+            load(pairs)
+        for t, c in targets:
+            n = cur.execute(f"UPDATE {t} SET {c} = (SELECT new FROM temp.id_map WHERE old = {c}) "
+                            f"WHERE {c} IN (SELECT old FROM temp.id_map)").rowcount
+            if t == table:
+                renamed = n
+    cur.execute("DELETE FROM temp.id_map")
+    metrics.record("storage.rename_ids", rows=renamed)
+    return renamed
+
+# ---------------------- Startup cache ----------------------
+# bumped whenever the cached row layout changes
+_STARTUP_CACHE_VERSION = 4
+
+def db_fingerprint(path: str | Path | None = None) -> Optional[dict]:
+    """Return a cheap fingerprint that changes whenever the database changes.
+    
+    Combines the file size and mtime with SQLite's file change counter
+    (header bytes 24-28, bumped by every committed write transaction) and
+    the size/mtime of a ``-wal`` file, whose commits do not touch the main
+    file until a checkpoint. No connection is opened, so reading it costs
+    two ``stat`` calls and a 100-byte read.
+    
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :return: Fingerprint dictionary, or None if the file does not exist.
+    :rtype: dict | None
+    """
+    path = Path(path if path is not None else DB_PATH)
+    try:
+        st = path.stat()
+        with path.open("rb") as f:
+            header = f.read(100)
+    except OSError:
+        return None
+    fp = {"path": str(path.resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+          "change_counter": int.from_bytes(header[24:28], "big") if len(header) >= 28 else None}
+    wal = path.with_name(path.name + "-wal")
+    if wal.exists():
+        wst = wal.stat()
+        fp["wal"] = (wst.st_size, wst.st_mtime_ns)
+    return fp
+
+def startup_cache_path(path: str | Path | None = None, name: str = "cache") -> Path:
+    """Return where a startup cache for a database lives (``<db>.<name>``)."""
+    path = Path(path if path is not None else DB_PATH)
+    return path.with_name(f"{path.name}.{name}")
+
+def _school_rows(school: School) -> tuple:
+    """Reduce a School to tuples of str/int/None, which marshal stores without code."""
+    return (tuple((k, s.name, s.age, s._email, tuple(s.registered_courses)) for k, s in school.students.items()),
+            tuple((k, i.name, i.age, i._email, tuple(i.assigned_courses)) for k, i in school.instructors.items()),
+            tuple((k, c.course_name, c.instructor_id, tuple(c.enrolled_students)) for k, c in school.courses.items()))
+
+def _rows_school(rows: tuple) -> School:
+    students, instructors, courses = rows
+    school = School()
+    school.students = {k: Student(name=n, age=a, _email=e, student_id=k, registered_courses=list(ids))
+                       for k, n, a, e, ids in students}
+    school.instructors = {k: Instructor(name=n, age=a, _email=e, instructor_id=k, assigned_courses=list(ids))
+                          for k, n, a, e, ids in instructors}
+    school.courses = {k: Course(course_id=k, course_name=n, instructor_id=iid, enrolled_students=list(ids))
+                      for k, n, iid, ids in courses}
+    return school
+
+def _private_file(path: Path) -> bool:
+    """Whether ``path`` belongs to the current user and nobody else may write it (POSIX only)."""
+    if not hasattr(os, "getuid"):
+        return True
+    st = path.stat()
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+@metrics.instrumented()
+def save_startup_cache(school: School, path: str | Path | None = None, fingerprint: Optional[dict] = None,
+                       name: str = "cache") -> Path:
+    """Store a School's rows next to the database, tagged with its fingerprint.
+    
+    Only call this when ``school`` matches the database exactly (right
+    after loading or syncing it). The file holds plain tuples in
+    :mod:`marshal` format, is readable and writable by the owner only, and
+    is written atomically.
+    
+    :param school: Model to cache.
+    :type school: School
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :param fingerprint: Fingerprint taken when ``school`` was read; defaults to the current one.
+    :type fingerprint: dict | None
+    :param name: Cache file suffix, so several caches can coexist.
+    :type name: str
+    :return: Path of the cache file.
+    :rtype: Path
+    """
+    fp = fingerprint if fingerprint is not None else db_fingerprint(path)
+    dest = startup_cache_path(path, name)
+    tmp = dest.with_name(dest.name + ".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o600)
+    with os.fdopen(fd, "wb") as f:
+        marshal.dump((_STARTUP_CACHE_VERSION, fp, _school_rows(school)), f)
+    os.replace(tmp, dest)
+    metrics.record("storage.save_startup_cache", nbytes=dest.stat().st_size)
+    return dest
+
+@metrics.instrumented()
+def load_startup_cache(path: str | Path | None = None, name: str = "cache") -> Optional[School]:
+    """Return the cached School if the database is unchanged since it was saved.
+    
+    The file sits next to the database, where other users may be able to
+    write, so it is not trusted like the database: it only holds
+    marshalled tuples of strings and numbers (loading it runs no code), it
+    is ignored unless the current user owns it and nobody else can write
+    it, and a file that does not unpack into rows counts as a miss.
+    
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :param name: Cache file suffix used when saving.
+    :type name: str
+    :return: The School, or None if the cache is missing, stale, foreign or unreadable.
+    :rtype: School | None
+    """
+    fp = db_fingerprint(path)
+    if fp is None:
+        return None
+    cache = startup_cache_path(path, name)
+    try:
+        if not _private_file(cache):
+            return None
+        with cache.open("rb") as f:
+            # one read: marshal.load on a file object is several times slower
+            version, cached_fp, rows = marshal.loads(f.read())
+        if version != _STARTUP_CACHE_VERSION or cached_fp != fp:
+            return None
+        return _rows_school(rows)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+def db_to_school_cached(progress: Progress = None, path: str | Path | None = None) -> Tuple[School, bool]:
+    """Load the database like :func:`db_to_school`, via the startup cache when valid.
+    
+    On a miss the database is read and the cache rewritten for next time.
+    
+    :param progress: Optional ``progress(stage, done, total)`` callback (misses only).
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :return: ``(school, cache_hit)``.
+    :rtype: tuple[School, bool]
+    """
+    school = load_startup_cache(path)
+    if isinstance(school, School):
+        return school, True
+    init_db(path)
+    fp = db_fingerprint(path)
+    school = db_to_school(progress, path)
+    if fp == db_fingerprint(path):
+        save_startup_cache(school, path, fingerprint=fp)
+    return school, False
+
+# ---------------------- Lazy SQLite School ----------------------
+_SEP = "\x1f"
+
+def _split(joined):
+    return joined.split(_SEP) if joined else []
+
+def _write_student(cur, s: Student):
+    cur.execute("""INSERT INTO students(student_id,name,age,email) VALUES(?,?,?,?)
+                   ON CONFLICT(student_id) DO UPDATE SET name=excluded.name, age=excluded.age, email=excluded.email""",
+                (s.student_id, s.name, s.age, s._email))
+    cur.execute("DELETE FROM registrations WHERE student_id=?", (s.student_id,))
+    cur.executemany("INSERT OR IGNORE INTO registrations(student_id,course_id) VALUES(?,?)",
+                    [(s.student_id, cid) for cid in s.registered_courses])
+
+def _write_instructor(cur, i: Instructor):
+    cur.execute("""INSERT INTO instructors(instructor_id,name,age,email) VALUES(?,?,?,?)
+                   ON CONFLICT(instructor_id) DO UPDATE SET name=excluded.name, age=excluded.age, email=excluded.email""",
+                (i.instructor_id, i.name, i.age, i._email))
+
+def _write_course(cur, c: Course):
+    cur.execute("""INSERT INTO courses(course_id,course_name,instructor_id) VALUES(?,?,?)
+                   ON CONFLICT(course_id) DO UPDATE SET course_name=excluded.course_name, instructor_id=excluded.instructor_id""",
+                (c.course_id, c.course_name, c.instructor_id))
+    cur.execute("DELETE FROM registrations WHERE course_id=?", (c.course_id,))
+    cur.executemany("INSERT OR IGNORE INTO registrations(student_id,course_id) VALUES(?,?)",
+                    [(sid, c.course_id) for sid in c.enrolled_students])
+
+# table, key column, hydrating SELECT (aliased as t), row -> entity, writer, delete statements
+_TABLES = {
+    "students": (
+        "students", "student_id",
+        """SELECT t.student_id, t.name, t.age, t.email,
+                  (SELECT group_concat(course_id, char(31)) FROM registrations r WHERE r.student_id = t.student_id)
+           FROM students t""",
+        lambda r: Student(name=r[1], age=r[2], _email=r[3], student_id=r[0], registered_courses=_split(r[4])),
+        _write_student,
+        ("DELETE FROM registrations WHERE student_id=?", "DELETE FROM students WHERE student_id=?"),
+    ),
+    "instructors": (
+        "instructors", "instructor_id",
+        """SELECT t.instructor_id, t.name, t.age, t.email,
+                  (SELECT group_concat(course_id, char(31)) FROM courses c WHERE c.instructor_id = t.instructor_id)
+           FROM instructors t""",
+        lambda r: Instructor(name=r[1], age=r[2], _email=r[3], instructor_id=r[0], assigned_courses=_split(r[4])),
+        _write_instructor,
+        ("UPDATE courses SET instructor_id=NULL WHERE instructor_id=?", "DELETE FROM instructors WHERE instructor_id=?"),
+    ),
+    "courses": (
+        "courses", "course_id",
+        """SELECT t.course_id, t.course_name, t.instructor_id,
+                  (SELECT group_concat(student_id, char(31)) FROM registrations r WHERE r.course_id = t.course_id)
+           FROM courses t""",
+        lambda r: Course(course_id=r[0], course_name=r[1], instructor_id=r[2] or None, enrolled_students=_split(r[3])),
+        _write_course,
+        ("DELETE FROM registrations WHERE course_id=?", "DELETE FROM courses WHERE course_id=?"),
+    ),
+}
+
+_REFERRERS = {
+    ("courses", "enrolled_students"): "SELECT course_id FROM registrations WHERE student_id=?",
+    ("courses", "instructor_id"): "SELECT course_id FROM courses WHERE instructor_id=?",
+    ("students", "registered_courses"): "SELECT student_id FROM registrations WHERE course_id=?",
+    ("instructors", "assigned_courses"): "SELECT instructor_id FROM courses WHERE course_id=? AND instructor_id IS NOT NULL",
+}
+
+class _SqlTable(MutableMapping):
+    """Entity mapping backed by one SQLite table with a bounded LRU cache.
+
+    Reads hydrate rows on demand; assignments and deletions are written
+    straight through to the database.
+    """
+    def __init__(self, school: "SqliteSchool", entity: str, cache_size: int):
+        self._school = school
+        self._table, self._key, self._select, self._hydrate, self._write, self._delete = _TABLES[entity]
+        self._cache: "OrderedDict[str, object]" = OrderedDict()
+        self._cache_size = cache_size
+
+    def _remember(self, key, obj):
+        self._cache[key] = obj
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return obj
+
+    def _row_to_obj(self, row):
+        obj = self._cache.get(row[0])
+        return obj if obj is not None else self._remember(row[0], self._hydrate(row))
+
+    def __getitem__(self, key):
+        obj = self._cache.get(key)
+        if obj is not None:
+            self._cache.move_to_end(key)
+            return obj
+        row = self._school.conn.execute(f"{self._select} WHERE t.{self._key}=?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self._remember(key, self._hydrate(row))
+
+    def __contains__(self, key) -> bool:
+        if key in self._cache:
+            return True
+        q = self._school.conn.execute(f"SELECT 1 FROM {self._table} WHERE {self._key}=?", (key,))
+        return q.fetchone() is not None
+
+    def __setitem__(self, key, obj):
+        with self._school.batch():
+            self._write(self._school.conn.cursor(), obj)
+        self._remember(key, obj)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        with self._school.batch():
+            for sql in self._delete:
+                self._school.conn.execute(sql, (key,))
+        self._cache.pop(key, None)
+
+    def __iter__(self):
+        cur = self._school.conn.execute(f"SELECT {self._key} FROM {self._table} ORDER BY rowid")
+        for row in iter(lambda: cur.fetchmany(512), []):
+            yield from (r[0] for r in row)
+
+    def __len__(self) -> int:
+        return self._school.conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    def query(self, where: str = "", params=()):
+        """Yield hydrated entities for an optional ``WHERE`` clause over alias ``t``."""
+        sql = f"{self._select} {'WHERE ' + where if where else ''} ORDER BY t.rowid"
+        cur = self._school.conn.execute(sql, params)
+        for rows in iter(lambda: cur.fetchmany(512), []):
+            for row in rows:
+                yield self._row_to_obj(row)
+
+    def values(self):
+        return _SqlValuesView(self)
+
+    def items(self):
+        return _SqlItemsView(self)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+class _SqlValuesView(ValuesView):
+    def __iter__(self):
+        return self._mapping.query()
+
+class _SqlItemsView(ItemsView):
+    def __iter__(self):
+        key = self._mapping._key
+        return ((getattr(o, key), o) for o in self._mapping.query())
+
+class SqliteSchool(School):
+    """School whose collections are paged from SQLite on demand.
+
+    Only the most recently used ``cache_size`` entities per collection stay
+    hydrated, and every mutation made through the School API is written
+    through to the database in a single transaction. Memory therefore
+    follows the working set rather than the database size.
+
+    :param path: Database file; defaults to ``DB_PATH``.
+    :type path: str | Path | None
+    :param cache_size: Maximum hydrated entities kept per collection.
+    :type cache_size: int
+    :param check_same_thread: Passed to :func:`sqlite3.connect`; pass False
+        when the caller serialises access from several threads itself.
+    :type check_same_thread: bool
+    """
+    def __init__(self, path: str | Path | None = None, cache_size: int = 1024, check_same_thread: bool = True):
+        super().__init__()
+        self.path = Path(path) if path is not None else DB_PATH
+        _create_schema(self.path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.create_function("py_lower", 1, lambda v: v.lower() if isinstance(v, str) else v)
+        self._depth = 0
+        self.students = _SqlTable(self, "students", cache_size)
+        self.instructors = _SqlTable(self, "instructors", cache_size)
+        self.courses = _SqlTable(self, "courses", cache_size)
+
+    @contextmanager
+    def batch(self):
+        """Group writes into one transaction; nested batches join the outer one.
+
+        On error the transaction is rolled back and the caches are dropped so
+        no half-applied object survives.
+        """
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if not self._depth:
+                self.conn.rollback()
+                for t in (self.students, self.instructors, self.courses):
+                    t.clear_cache()
+            raise
+        self._depth -= 1
+        if not self._depth:
+            self.conn.commit()
+
+    def close(self):
+        """Close the underlying database connection."""
+        self.conn.close()
+
+    # snapshot() reads every row, so per-request snapshots (as in server.py) do not pay off
+    cheap_snapshots = False
+
+    def snapshot(self) -> SchoolSnapshot:
+        """Read the whole database into an immutable snapshot.
+
+        Unlike :meth:`School.snapshot` this is O(n): nothing is held in
+        memory to share. All tables are read in one transaction on this
+        connection, so the snapshot is consistent and includes the writes of
+        an open :meth:`batch`.
+
+        :return: Read-only snapshot.
+        :rtype: SchoolSnapshot
+        """
+        own = not self.conn.in_transaction
+        if own:
+            self.conn.execute("BEGIN")
+        try:
+            return _read_school(self.conn).snapshot()
+        finally:
+            if own:
+                self.conn.rollback()
+
+    def _referrers(self, entity: str, field_name: str, key: str):
+        return [r[0] for r in self.conn.execute(_REFERRERS[(entity, field_name)], (key,))]
+
+    def search_iter(self, text: str, entity: str, limit: int | None = None):
+        """Search names and IDs with SQL instead of hydrating every row.
+
+        :param text: Search term (case-insensitive); empty yields everything.
+        :type text: str
+        :param entity: Collection name (``"students"``, ``"instructors"`` or ``"courses"``).
+        :type entity: str
+        :param limit: Maximum number of results, or None for all.
+        :type limit: int | None
+        :return: Iterator of matching entities.
+        """
+        text = (text or "").lower().strip()
+        fields = School._SEARCH_FIELDS[entity]
+        where = " OR ".join(f"instr(py_lower(t.{f}), ?) > 0" for f in fields) if text else ""
+        return self._cached_search(
+            entity, text, limit,
+            lambda: islice(getattr(self, entity).query(where, (text,) * len(fields) if text else ()), limit))
+
+def _atomic(name: str):
+    base = getattr(School, name)
+    def method(self, *args, **kwargs):
+        with self.batch():
+            return base(self, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = base.__doc__
+    return method
+
+for _name in ("add_student", "add_students_bulk", "update_student", "delete_student", "add_instructor", "update_instructor",
+              "delete_instructor", "add_course", "update_course", "delete_course",
+              "register_student_in_course", "assign_instructor_to_course", "rename", "rename_many",
+              "delete_many", "register_students_in_course", "assign_instructor_to_courses"):
+    setattr(SqliteSchool, _name, _atomic(_name))
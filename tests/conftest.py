@@ -0,0 +1,16 @@
+"""Shared fixtures; the modules live flat in the repository root."""
+
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.generator import make_school  # noqa: E402
+
+@pytest.fixture
+def school():
+    """A small deterministic School with every link filled in on both sides."""
+    return make_school(300, seed=7)
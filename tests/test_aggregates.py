@@ -0,0 +1,39 @@
+import storage
+from aggregates import Aggregates, db_snapshot
+from models import Course, Instructor
+
+def _live(school):
+    agg = Aggregates()
+    agg.reset(school)
+    school.subscribe(agg.on_write)
+    return agg
+
+def _fresh(school):
+    agg = Aggregates()
+    agg.reset(school)
+    return agg.snapshot()
+
+def test_reset_matches_the_database(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    agg = Aggregates()
+    agg.reset(school)
+    assert agg.snapshot() == db_snapshot(path)
+
+def test_load_counts_only_stored_instructors(school):
+    agg = _live(school)
+    school.add_course(Course(course_id="GHOST-1", course_name="Ghost", instructor_id="GHOST"))
+    assert "GHOST" not in agg.instructor_load() and "GHOST" not in agg._load
+    assert agg.snapshot() == _fresh(school)
+
+    school.add_instructor(Instructor(name="Late Hire", age=40, _email="late@uni.org", instructor_id="GHOST"))
+    assert agg.instructor_load()["GHOST"] == (1, 0)
+    school.update_instructor("GHOST", age=41)
+    assert agg.instructor_load()["GHOST"] == (1, 0)
+    assert agg.snapshot() == _fresh(school)
+
+    school.delete_instructor("GHOST")
+    assert "GHOST" not in agg._load
+    school.update_course("GHOST-1", instructor_id="GHOST")
+    school.delete_course("GHOST-1")
+    assert agg.snapshot() == _fresh(school)
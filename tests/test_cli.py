@@ -0,0 +1,21 @@
+import pytest
+import cli
+import storage
+
+@pytest.fixture
+def snapshot(tmp_path, school, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", storage.DB_PATH)
+    path = tmp_path / "school.json"
+    storage.save_json(school, path)
+    return path
+
+def test_verify_snapshot_rejects_repair(snapshot, capsys):
+    assert cli.main(["-q", "verify", "--snapshot", str(snapshot)]) == cli.EXIT_OK
+    assert cli.main(["-q", "verify", "--snapshot", str(snapshot), "--repair"]) == cli.EXIT_USAGE
+    assert "--repair" in capsys.readouterr().err
+
+def test_type_errors_are_not_reported_as_invalid_data(snapshot, monkeypatch):
+    def broken(path, fmt):
+        raise TypeError("bug")
+    monkeypatch.setattr(cli, "_load_source", broken)
+    assert cli.main(["-q", "verify", "--snapshot", str(snapshot)]) == cli.EXIT_ERROR
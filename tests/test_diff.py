@@ -0,0 +1,143 @@
+import copy
+import pytest
+import storage
+from diff import ChangeSet, apply_db, db_rows, diff, merge, patch, school_rows
+
+def _base():
+    return {
+        "students": {"S1": ("Ann Lee", 20, "ann@uni.org"), "S2": ("Bob Ray", 21, "bob@uni.org"),
+                     "S3": ("Cy Day", 22, "cy@uni.org")},
+        "instructors": {"I1": ("Ida Fox", 40, "ida@uni.org"), "I2": ("Ike Roe", 50, "ike@uni.org")},
+        "courses": {"C1": ("Math", "I1"), "C2": ("Art", None)},
+        "registrations": {("S1", "C1"), ("S2", "C1")},
+    }
+
+def _kinds(conflicts):
+    return sorted((c.kind, c.entity, c.key, c.field) for c in conflicts)
+
+def _merged(base, ours, theirs, prefer="ours"):
+    changes, conflicts = merge(base, ours, theirs, prefer)
+    return patch(ours, changes), conflicts
+
+def test_diff_patch_round_trip(school):
+    old = school_rows(school)
+    sids = list(school.students)
+    school.update_student(sids[0], age=66)
+    school.delete_student(sids[1])
+    cid = next(iter(school.courses))
+    school.update_course(cid, course_name="Renamed")
+    new = school_rows(school)
+    changes = diff(old, new)
+    assert changes.changed["students"][sids[0]] == {"age": 66}
+    assert changes.removed["students"] == {sids[1]}
+    assert patch(old, changes) == new
+    assert len(diff(new, patch(old, changes))) == 0
+    assert patch(old, ChangeSet.from_dict(changes.to_dict())) == new
+
+def test_one_sided_changes_merge_cleanly():
+    base = _base()
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    ours["students"]["S1"] = ("Ann Lee", 30, "ann@uni.org")
+    theirs["students"]["S1"] = ("Ann Smith", 20, "ann@uni.org")   # different field: no conflict
+    theirs["students"]["S4"] = ("Dee Poe", 19, "dee@uni.org")
+    theirs["registrations"].add(("S3", "C2"))
+    theirs["registrations"].discard(("S2", "C1"))
+    merged, conflicts = _merged(base, ours, theirs)
+    assert conflicts == []
+    assert merged["students"]["S1"] == ("Ann Smith", 30, "ann@uni.org")
+    assert "S4" in merged["students"]
+    assert merged["registrations"] == {("S1", "C1"), ("S3", "C2")}
+
+@pytest.mark.parametrize("prefer, age", [("ours", 30), ("theirs", 31)])
+def test_modify_modify(prefer, age):
+    base = _base()
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    ours["students"]["S1"] = ("Ann Lee", 30, "ann@uni.org")
+    theirs["students"]["S1"] = ("Ann Lee", 31, "ann@uni.org")
+    merged, conflicts = _merged(base, ours, theirs, prefer)
+    assert _kinds(conflicts) == [("modify/modify", "students", "S1", "age")]
+    assert (conflicts[0].base, conflicts[0].ours, conflicts[0].theirs) == (20, 30, 31)
+    assert merged["students"]["S1"][1] == age
+
+@pytest.mark.parametrize("prefer", ["ours", "theirs"])
+def test_add_add(prefer):
+    base = _base()
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    ours["courses"]["C9"] = ("Chess", "I1")
+    theirs["courses"]["C9"] = ("Go", "I2")
+    merged, conflicts = _merged(base, ours, theirs, prefer)
+    assert _kinds(conflicts) == [("add/add", "courses", "C9", None)]
+    assert merged["courses"]["C9"] == (ours if prefer == "ours" else theirs)["courses"]["C9"]
+
+@pytest.mark.parametrize("prefer", ["ours", "theirs"])
+def test_modify_delete(prefer):
+    base = _base()
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    ours["students"]["S2"] = ("Bob Ray", 25, "bob@uni.org")
+    del theirs["students"]["S2"]
+    theirs["registrations"].discard(("S2", "C1"))
+    merged, conflicts = _merged(base, ours, theirs, prefer)
+    assert _kinds(conflicts) == [("modify/delete", "students", "S2", None)]
+    if prefer == "ours":
+        assert merged["students"]["S2"][1] == 25 and ("S2", "C1") in merged["registrations"]
+    else:
+        assert "S2" not in merged["students"] and ("S2", "C1") not in merged["registrations"]
+
+@pytest.mark.parametrize("prefer", ["ours", "theirs"])
+def test_delete_modify(prefer):
+    base = _base()
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    del ours["students"]["S3"]
+    theirs["students"]["S3"] = ("Cy Day", 23, "cy@uni.org")
+    merged, conflicts = _merged(base, ours, theirs, prefer)
+    assert _kinds(conflicts) == [("delete/modify", "students", "S3", None)]
+    assert ("S3" in merged["students"]) == (prefer == "theirs")
+
+@pytest.mark.parametrize("prefer", ["ours", "theirs"])
+def test_delete_reference(prefer):
+    base = _base()
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    del ours["courses"]["C2"]
+    del ours["instructors"]["I2"]
+    theirs["registrations"].add(("S3", "C2"))
+    theirs["courses"]["C1"] = ("Math", "I2")
+    merged, conflicts = _merged(base, ours, theirs, prefer)
+    assert _kinds(conflicts) == [("delete/reference", "courses", "C2", None),
+                                 ("delete/reference", "instructors", "I2", None)]
+    if prefer == "ours":
+        assert "C2" not in merged["courses"] and ("S3", "C2") not in merged["registrations"]
+        assert merged["courses"]["C1"] == ("Math", "I1")
+    else:
+        assert "C2" in merged["courses"] and ("S3", "C2") in merged["registrations"]
+        assert merged["courses"]["C1"] == ("Math", "I2") and "I2" in merged["instructors"]
+
+@pytest.mark.parametrize("prefer", ["ours", "theirs"])
+def test_reference_delete(prefer):
+    base = _base()
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    ours["registrations"].add(("S3", "C2"))
+    del theirs["courses"]["C2"]
+    merged, conflicts = _merged(base, ours, theirs, prefer)
+    assert _kinds(conflicts) == [("reference/delete", "courses", "C2", None)]
+    if prefer == "ours":
+        assert "C2" in merged["courses"] and ("S3", "C2") in merged["registrations"]
+    else:
+        assert "C2" not in merged["courses"] and ("S3", "C2") not in merged["registrations"]
+
+def test_merge_rejects_unknown_side():
+    with pytest.raises(ValueError):
+        merge(_base(), _base(), _base(), prefer="both")
+
+def test_apply_db_matches_patch(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    base = db_rows(path)
+    theirs = copy.deepcopy(base)
+    sid, gone = list(theirs["students"])[:2]
+    theirs["students"][sid] = ("Renamed Student", 44, theirs["students"][sid][2])
+    del theirs["students"][gone]
+    theirs["registrations"] = {p for p in theirs["registrations"] if p[0] != gone}
+    changes, conflicts = merge(base, base, theirs)
+    assert conflicts == []
+    apply_db(changes, path)
+    assert db_rows(path) == patch(base, changes) == theirs
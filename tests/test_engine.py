@@ -0,0 +1,65 @@
+import sqlite3
+import pytest
+import storage
+from diff import db_rows, school_rows
+from engine import Engine
+from models import Course, Student
+
+@pytest.fixture
+def engine(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    eng = Engine(path)
+    eng.load(use_cache=False)
+    yield eng
+    eng.close()
+
+def _no_reload(monkeypatch, engine):
+    def load(*args, **kwargs):
+        raise AssertionError("the whole model was reloaded")
+    monkeypatch.setattr(engine, "load", load)
+
+def test_invalid_edits_do_not_reload(engine, monkeypatch):
+    _no_reload(monkeypatch, engine)
+    live = engine.school
+    before = school_rows(live)
+    sid = next(iter(live.students))
+    with pytest.raises(ValueError):
+        engine.update_student(sid, sid, name="Z", _email="bad")
+    with pytest.raises(ValueError):
+        engine.add_student(Student(name="New", age=20, _email="bad", student_id="NEW"))
+    assert engine.school is live
+    assert school_rows(live) == before == db_rows(engine.path)
+
+def test_failed_block_restores_only_what_it_wrote(engine, monkeypatch):
+    _no_reload(monkeypatch, engine)
+    live = engine.school
+    engine._index_references()
+    before = school_rows(live)
+    sid, gone = list(live.students)[:2]
+    cid = next(c for c in live.courses if sid not in live.courses[c].enrolled_students)
+    seen = []
+    engine.watch(lambda entity, key, obj: seen.append((entity, key, obj)))
+    with pytest.raises(RuntimeError):
+        with engine.transaction():
+            live.update_student(sid, age=77)
+            live.register_student_in_course(sid, cid)
+            live.delete_student(gone)
+            live.add_student(Student(name="New", age=20, _email="new@uni.org", student_id="NEW"))
+            raise RuntimeError("stop")
+    assert engine.school is live
+    assert school_rows(live) == before == db_rows(engine.path)
+    # watchers saw the restored entities, not just the rolled-back writes
+    restored = {(entity, key): obj for entity, key, obj in seen}
+    assert restored[("students", "NEW")] is None
+    assert restored[("students", sid)].age == before["students"][sid][1]
+    assert live.verify() == []
+
+def test_sqlite_errors_reload_the_model(engine):
+    live = engine.school
+    before = school_rows(live)
+    with pytest.raises(sqlite3.IntegrityError):
+        with engine.transaction():
+            live.add_course(Course(course_id="CX", course_name="Dangling", instructor_id="GONE"))
+    assert engine.school is not live
+    assert school_rows(engine.school) == before == db_rows(engine.path)
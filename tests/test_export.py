@@ -0,0 +1,21 @@
+import storage
+from diff import school_rows
+
+def test_export_db_csv_progress_totals(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    calls = []
+    counts = storage.export_db_csv(tmp_path / "csv", path, progress=lambda *a: calls.append(a))
+    last = {stage: (done, total) for stage, done, total in calls}
+    assert last == {name[:-4]: (n, n) for name, n in counts.items()}
+    assert counts["students.csv"] == len(school.students)
+    assert school_rows(storage.load_csv(tmp_path / "csv")) == school_rows(school)
+
+def test_export_db_csv_layout_without_count_table(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    layout = {"ids.csv": (["student_id"], "SELECT student_id FROM students WHERE age > 20")}
+    calls = []
+    counts = storage.export_db_csv(tmp_path / "csv", path, layout=layout, progress=lambda *a: calls.append(a))
+    n = sum(1 for s in school.students.values() if s.age > 20)
+    assert counts == {"ids.csv": n} and calls[-1] == ("ids", n, n)
@@ -0,0 +1,201 @@
+import json
+import os
+import zlib
+import pytest
+import journal
+from diff import school_rows
+from journal import Journal, read_batches
+from models import Student
+
+def _log(folder, generation=0):
+    return folder / f"journal-{generation:06d}.log"
+
+def _edit(school, n=3, age=50):
+    ids = list(school.students)[:n]
+    for sid in ids:
+        school.update_student(sid, age=age)
+    return ids
+
+def test_reopen_replays_committed_batches(tmp_path, school):
+    with Journal.open(tmp_path, school) as j:
+        _edit(school)
+        school.add_student(Student(name="New Student", age=20, _email="new@uni.org", student_id="NEW"))
+        school.delete_student(list(school.students)[10])
+        assert j.commit() > 0
+        expected = school_rows(school)
+    reopened = Journal.open(tmp_path)
+    try:
+        assert school_rows(reopened.school) == expected
+        assert reopened.school.verify() == []
+    finally:
+        reopened.close()
+
+def test_repeated_writes_are_coalesced(tmp_path, school):
+    with Journal.open(tmp_path, school) as j:
+        sid = next(iter(school.students))
+        for age in range(20, 30):
+            school.update_student(sid, age=age)
+        assert j.pending == 1
+        assert j.commit() == 1
+        assert j.commit() == 0
+
+def test_uncommitted_changes_are_not_recovered(tmp_path, school):
+    j = Journal.open(tmp_path, school)
+    _edit(school, age=40)
+    j.commit()
+    expected = school_rows(school)
+    _edit(school, age=41)
+    j._file.close()  # crash: no commit, no close()
+    reopened = Journal.open(tmp_path)
+    assert school_rows(reopened.school) == expected
+    reopened.close()
+
+def _torn(path):
+    with open(path, "ab") as f:
+        f.write(b'deadbeef ["s","S000')
+
+def _bad_hex(path):
+    with open(path, "ab") as f:
+        f.write(b'zzzzzzzz ["s","S0000001"]\n')
+
+def _bad_json(path):
+    payload = b'["s","S0000001"'
+    with open(path, "ab") as f:
+        f.write(b"%08x %s\n" % (zlib.crc32(payload), payload))
+
+def _unknown_tag(path):
+    with open(path, "ab") as f:
+        f.write(journal._line(["x", "S0000001"]))
+
+def _short_record(path):
+    with open(path, "ab") as f:
+        f.write(journal._line(["s"]))
+
+def _missing_fields(path):
+    with open(path, "ab") as f:
+        f.write(journal._line(["s", "S0000001", "Name"]))
+
+def _missing_commit(path):
+    with open(path, "ab") as f:
+        f.write(journal._line(["s", "S0000001"]))
+
+@pytest.mark.parametrize("damage", [_torn, _bad_hex, _bad_json, _unknown_tag, _short_record,
+                                    _missing_fields, _missing_commit])
+def test_corrupt_tail_is_truncated(tmp_path, school, damage):
+    with Journal.open(tmp_path, school) as j:
+        _edit(school)
+        j.commit()
+        expected = school_rows(school)
+    good = _log(tmp_path).stat().st_size
+    damage(_log(tmp_path))
+    assert _log(tmp_path).stat().st_size > good
+
+    reopened = Journal.open(tmp_path)
+    assert school_rows(reopened.school) == expected
+    assert _log(tmp_path).stat().st_size == good
+    # appends after recovery are readable again
+    _edit(reopened.school, age=60)
+    reopened.commit()
+    expected = school_rows(reopened.school)
+    reopened.close()
+    again = Journal.open(tmp_path)
+    assert school_rows(again.school) == expected
+    again.close()
+
+def test_read_batches_stops_at_first_bad_line(tmp_path, school):
+    with Journal.open(tmp_path, school) as j:
+        _edit(school, n=2)
+        j.commit()
+    _bad_hex(_log(tmp_path))
+    with open(_log(tmp_path), "ab") as f:  # a valid batch after the damage must not be applied
+        f.write(journal._line(["s", "S0000001"]) + journal._line(["C", 1]))
+    batches, good = read_batches(_log(tmp_path))
+    assert [len(b) for b in batches] == [2]
+    assert good < _log(tmp_path).stat().st_size
+
+def test_failed_commit_keeps_changes_and_leaves_no_torn_bytes(tmp_path, school, monkeypatch):
+    j = Journal.open(tmp_path, school)
+    _edit(school, n=2, age=40)
+    j.commit()
+    size = _log(tmp_path).stat().st_size
+
+    ids = _edit(school, n=5, age=41)
+    real_fsync = os.fsync
+    def failing_fsync(fd):
+        raise OSError(5, "Input/output error")
+    monkeypatch.setattr(journal.os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        j.commit()
+    # the flushed bytes of the failed batch were cut off again
+    assert _log(tmp_path).stat().st_size == size
+    assert j.pending == len(ids)
+
+    monkeypatch.setattr(journal.os, "fsync", real_fsync)
+    school.update_student(ids[0], age=42)
+    assert j.commit() == len(ids)
+    _edit(school, n=1, age=43)
+    j.commit()
+    expected = school_rows(school)
+    j.close()
+
+    reopened = Journal.open(tmp_path)
+    assert school_rows(reopened.school) == expected
+    assert reopened.school.students[ids[1]].age == 41
+    reopened.close()
+
+def test_compaction_starts_a_new_generation(tmp_path, school):
+    j = Journal.open(tmp_path, school)
+    _edit(school)
+    j.commit()
+    assert j.compact(wait=True)
+    _edit(school, age=70)
+    j.commit()
+    expected = school_rows(school)
+    j.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["journal-000001.log", "snapshot-000001.json"]
+    reopened = Journal.open(tmp_path)
+    assert school_rows(reopened.school) == expected
+    assert reopened.generation == 1
+    reopened.close()
+
+def test_crash_before_compacted_snapshot_is_written(tmp_path, school):
+    j = Journal.open(tmp_path, school)
+    _edit(school, age=30)
+    j.commit()
+    # rotate the journal the way compact() does, but "crash" before the snapshot exists
+    j.generation += 1
+    j._file.close()
+    j._file = open(_log(tmp_path, 1), "ab")
+    _edit(school, n=6, age=31)
+    j.commit()
+    expected = school_rows(school)
+    j._file.close()
+    reopened = Journal.open(tmp_path)
+    assert school_rows(reopened.school) == expected
+    assert reopened.generation == 1
+    reopened.close()
+
+def test_journal_after_a_torn_one_is_discarded(tmp_path, school):
+    j = Journal.open(tmp_path, school)
+    base = school_rows(school)
+    _edit(school, age=30)
+    j.commit()
+    j.generation += 1
+    j._file.close()
+    j._file = open(_log(tmp_path, 1), "ab")
+    _edit(school, age=31)
+    j.commit()
+    j._file.close()
+    # damage the only batch of generation 0: generation 1 builds on it and must go too
+    data = bytearray(_log(tmp_path).read_bytes())
+    data[:8] = b"00000000"
+    _log(tmp_path).write_bytes(bytes(data))
+    reopened = Journal.open(tmp_path)
+    assert school_rows(reopened.school) == base
+    assert not _log(tmp_path, 1).exists()
+    reopened.close()
+
+def test_snapshot_is_plain_school_json(tmp_path, school):
+    Journal.open(tmp_path, school).close()
+    data = json.loads((tmp_path / "snapshot-000000.json").read_text(encoding="utf-8"))
+    assert len(data["students"]) == len(school.students)
@@ -0,0 +1,82 @@
+import sqlite3
+import pytest
+import storage
+from engine import Engine
+from models import School, Student
+from utils import is_loose_email
+
+LEGACY = [("P1", "Bob Legacy", 30, "bob@mail.c"), ("P2", "Zoé Legacy", 31, "zoé@uni.рф")]
+
+@pytest.fixture
+def legacy_db(tmp_path, school):
+    """A database holding emails the PyQt window accepted but is_valid_email rejects."""
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany("INSERT INTO students(student_id, name, age, email) VALUES (?, ?, ?, ?)", LEGACY)
+    conn.close()
+    return path
+
+def test_stored_rows_load_without_revalidation(legacy_db, school):
+    loaded = storage.db_to_school(path=legacy_db)
+    assert loaded.students["P1"].email == "bob@mail.c"
+    assert len(loaded.students) == len(school.students) + len(LEGACY)
+    assert loaded.verify() == []
+
+def test_pyqt_rule_keeps_legacy_rows_editable(legacy_db):
+    engine = Engine(legacy_db, email_check=is_loose_email)
+    try:
+        engine.load(use_cache=False)
+        assert engine.update_student("P1", "P1", age=32)
+        assert engine.add_student(Student(name="New Legacy", age=20, _email="new@mail.c", student_id="P3"))
+        with pytest.raises(ValueError):
+            engine.add_student(Student(name="No Domain", age=20, _email="a@b", student_id="P4"))
+    finally:
+        engine.close()
+    reloaded = storage.db_to_school(path=legacy_db)
+    assert reloaded.students["P1"].age == 32 and "P3" in reloaded.students and "P4" not in reloaded.students
+
+def test_default_rule_is_strict_for_new_data(legacy_db):
+    engine = Engine(legacy_db)
+    try:
+        engine.load(use_cache=False)
+        with pytest.raises(ValueError):
+            engine.update_student("P1", "P1", age=33)
+        with pytest.raises(ValueError):
+            engine.add_student(Student(name="New Legacy", age=20, _email="new@mail.c", student_id="P3"))
+    finally:
+        engine.close()
+
+@pytest.mark.parametrize("loose", [False, True])
+def test_bulk_add_uses_the_school_email_rule(loose):
+    school = School()
+    if loose:
+        school.email_check = is_loose_email
+    emails = ["ok@uni.org", "bob@mail.c", "a@b", None]
+    rejected = school.add_students_bulk(["A", "B", "C", "D"], ["Ann", "Bob", "Cy", "Dee"], [20] * 4, emails,
+                                        skip_invalid=True)
+    assert rejected == ([2, 3] if loose else [1, 2, 3])
+    for sid, email in zip("AB", emails):
+        single = School()
+        single.email_check = school.email_check
+        try:
+            single.add_student(Student(name="X", age=20, _email=email, student_id=sid))
+        except ValueError:
+            assert sid not in school.students
+        else:
+            assert sid in school.students
+
+def test_email_is_checked_by_the_school_not_the_property(school):
+    sid = next(iter(school.students))
+    old = school.students[sid].email
+    with pytest.raises(ValueError):
+        school.update_student(sid, email="bob@mail.c")
+    assert school.students[sid].email == old
+    school.email_check = is_loose_email
+    school.update_student(sid, email="bob@mail.c")
+    assert school.students[sid].email == "bob@mail.c"
+    s = Student(name="Bob", age=30, _email="bob@mail.c", student_id="P9")
+    s.email = "zoé@uni.рф"
+    school.add_student(s)
+    assert school.students["P9"]._email == "zoé@uni.рф"
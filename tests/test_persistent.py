@@ -0,0 +1,120 @@
+import pickle
+import random
+import threading
+import pytest
+from diff import school_rows
+from models import School, SchoolSnapshot, Student
+from persistent import PMap, PersistentDict
+
+class _Clash:
+    """Key whose hash collides with every other ``_Clash``."""
+    def __init__(self, name):
+        self.name = name
+    def __hash__(self):
+        return 42
+    def __eq__(self, other):
+        return isinstance(other, _Clash) and other.name == self.name
+    def __repr__(self):
+        return f"_Clash({self.name!r})"
+
+def test_pmap_matches_dict_under_random_edits():
+    rnd = random.Random(3)
+    m, d = PMap(), {}
+    for step in range(5000):
+        key = f"k{rnd.randrange(800)}"
+        if key in d and rnd.random() < 0.4:
+            m, _ = m.delete(key), d.pop(key)
+        else:
+            m, d[key] = m.set(key, step), step
+        if step % 500 == 0:
+            assert list(m.items()) == list(d.items())
+    assert len(m) == len(d)
+    assert list(m.items()) == list(d.items())
+    assert all(m[k] == v for k, v in d.items())
+
+def test_pmap_updates_leave_the_original_alone():
+    base = PMap.from_items((str(i), i) for i in range(100))
+    changed = base.set("5", -5).set("new", 0).delete("7")
+    assert base["5"] == 5 and "new" not in base and "7" in base and len(base) == 100
+    assert changed["5"] == -5 and "new" in changed and "7" not in changed and len(changed) == 100
+
+def test_pmap_keeps_insertion_order_and_rebinds_in_place():
+    m = PMap.from_items([("b", 1), ("a", 2), ("b", 3)])
+    assert list(m.items()) == [("b", 3), ("a", 2)]
+    m = m.set("c", 4).set("b", 5)
+    assert list(m) == ["b", "a", "c"] and m["b"] == 5
+
+def test_pmap_hash_collisions():
+    keys = [_Clash(n) for n in "abcdef"]
+    m = PMap()
+    for i, k in enumerate(keys):
+        m = m.set(k, i)
+    assert [m[_Clash(n)] for n in "abcdef"] == list(range(6))
+    m = m.delete(_Clash("c"))
+    assert _Clash("c") not in m and len(m) == 5
+    with pytest.raises(KeyError):
+        m.delete(_Clash("zz"))
+
+def test_pmap_pickles_across_hash_seeds():
+    m = PMap.from_items((f"S{i}", i) for i in range(300)).delete("S10")
+    again = pickle.loads(pickle.dumps(m))
+    assert list(again.items()) == list(m.items())
+
+def test_persistent_dict_freeze_is_isolated():
+    d = PersistentDict({"a": 1})
+    frozen = d.freeze()
+    d["b"] = 2
+    d.extend((str(i), i) for i in range(50))
+    del d["a"]
+    assert dict(frozen) == {"a": 1}
+    assert "a" not in d and len(d) == 51
+
+def test_school_keeps_plain_dicts_until_first_snapshot(school):
+    assert type(school.students) is dict and school._owned is None
+    snap = school.snapshot()
+    assert isinstance(snap, SchoolSnapshot)
+    assert isinstance(school.students, PersistentDict)
+    assert school_rows(snap) == school_rows(school)
+
+def test_snapshot_is_isolated_from_writes(school):
+    snap = school.snapshot()
+    before = school_rows(snap)
+    sid, other = list(school.students)[:2]
+    cid = next(c for c in school.courses if sid not in school.courses[c].enrolled_students)
+    school.update_student(sid, age=77, name="Changed Name")
+    school.register_student_in_course(sid, cid)
+    school.delete_student(other)
+    school.add_student(Student(name="Late Student", age=19, _email="late@uni.org", student_id="LATE"))
+    assert school_rows(snap) == before
+    assert snap.students[sid].age != 77
+    assert sid not in snap.courses[cid].enrolled_students
+    assert other in snap.students and "LATE" not in snap.students
+    assert school.verify() == []
+    assert school_rows(school.snapshot()) == school_rows(school)
+
+def test_snapshot_read_concurrently_with_writes(school):
+    snap = school.snapshot()
+    expected = school_rows(snap)
+    ids = list(school.students)
+    stop = threading.Event()
+    def writer():
+        rnd = random.Random(1)
+        while not stop.is_set():
+            school.update_student(rnd.choice(ids), age=rnd.randrange(18, 60))
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        for _ in range(20):
+            assert school_rows(snap) == expected
+    finally:
+        stop.set()
+        t.join()
+
+def test_pickled_school_snapshots_again(school):
+    school.snapshot()
+    copy = pickle.loads(pickle.dumps(school))
+    assert isinstance(copy, School)
+    sid = next(iter(copy.students))
+    snap = copy.snapshot()
+    copy.update_student(sid, age=88)
+    assert snap.students[sid].age != 88
@@ -0,0 +1,113 @@
+import sqlite3
+import pytest
+import storage
+from diff import db_rows, school_rows
+from engine import Engine
+
+def _db(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    return path
+
+def _connect(path, enforce):
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA foreign_keys = {'ON' if enforce else 'OFF'}")
+    return conn
+
+def _renamed(rows, entity, mapping):
+    """Expected rows after renaming, computed independently of storage."""
+    out = {e: dict(t) for e, t in rows.items() if e != "registrations"}
+    out[entity] = {mapping.get(k, k): v for k, v in rows[entity].items()}
+    if entity == "instructors":
+        out["courses"] = {k: (name, mapping.get(iid, iid)) for k, (name, iid) in out["courses"].items()}
+    pos = {"students": 0, "courses": 1}.get(entity)
+    regs = rows["registrations"]
+    if pos is not None:
+        regs = {tuple(mapping.get(x, x) if n == pos else x for n, x in enumerate(p)) for p in regs}
+    out["registrations"] = set(regs)
+    return out
+
+def _mappings(school, entity):
+    a, b, c, d = list(getattr(school, entity))[:4]
+    return {
+        "fresh": {a: a + "-NEW", b: b + "-NEW"},
+        "swap": {a: b, b: a},
+        "chain": {a: b, b: c, c: c + "-NEW"},
+        "cycle": {a: b, b: c, c: d, d: a},
+    }
+
+@pytest.mark.parametrize("enforce", [True, False], ids=["cascade", "manual"])
+@pytest.mark.parametrize("entity", ["students", "instructors", "courses"])
+@pytest.mark.parametrize("shape", ["fresh", "swap", "chain", "cycle"])
+def test_rename_ids_updates_every_reference(tmp_path, school, entity, shape, enforce):
+    path = _db(tmp_path, school)
+    before = db_rows(path)
+    mapping = _mappings(school, entity)[shape]
+    conn = _connect(path, enforce)
+    try:
+        with conn:
+            assert storage.rename_ids(conn, entity, mapping) == len(mapping)
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    finally:
+        conn.close()
+    assert db_rows(path) == _renamed(before, entity, mapping)
+
+@pytest.mark.parametrize("mapping, message", [
+    ({"A": ""}, "required"),
+    ({"A": "X", "B": "X"}, "given twice"),
+    ({"A": "B"}, "already exists"),
+])
+def test_rename_ids_rejects_bad_mappings(tmp_path, school, mapping, message):
+    path = _db(tmp_path, school)
+    a, b = list(school.students)[:2]
+    mapping = {{"A": a, "B": b}[o]: {"A": a, "B": b}.get(n, n) for o, n in mapping.items()}
+    before = db_rows(path)
+    conn = _connect(path, True)
+    try:
+        with pytest.raises(ValueError, match=message):
+            with conn:
+                storage.rename_ids(conn, "students", mapping)
+    finally:
+        conn.close()
+    assert db_rows(path) == before
+
+def test_rename_ids_ignores_unknown_and_unchanged_ids(tmp_path, school):
+    path = _db(tmp_path, school)
+    sid = next(iter(school.students))
+    conn = _connect(path, True)
+    try:
+        assert storage.rename_ids(conn, "students", {sid: sid}) == 0
+        assert storage.rename_ids(conn, "students", {"NOPE": "NOPE2"}) == 0
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize("entity", ["students", "instructors", "courses"])
+@pytest.mark.parametrize("shape", ["fresh", "swap", "chain", "cycle"])
+def test_school_rename_many_rewrites_links(school, entity, shape):
+    mapping = _mappings(school, entity)[shape]
+    expected = _renamed(school_rows(school), entity, mapping)
+    school.rename_many(entity, mapping)
+    assert school_rows(school) == expected
+    assert school.verify() == []
+
+def test_school_rename_errors_leave_school_alone(school):
+    a, b = list(school.students)[:2]
+    before = school_rows(school)
+    with pytest.raises(KeyError):
+        school.rename("students", "NOPE", "X")
+    with pytest.raises(ValueError):
+        school.rename("students", a, b)
+    with pytest.raises(ValueError):
+        school.rename_many("students", {a: "X", b: "X"})
+    assert school_rows(school) == before
+
+def test_engine_rename_keeps_model_and_database_equal(tmp_path, school):
+    engine = Engine(_db(tmp_path, school))
+    try:
+        engine.load(use_cache=False)
+        ids = list(engine.school.courses)[:3]
+        assert engine.rename_many("courses", {ids[0]: ids[1], ids[1]: ids[2], ids[2]: ids[0]}) == 3
+        assert engine.school.verify() == []
+        assert school_rows(engine.school) == db_rows(engine.path)
+    finally:
+        engine.close()
@@ -0,0 +1,35 @@
+import pytest
+from models import School, Student
+
+TEXTS = ["", "nasser", "S00001", "I00000", "zzzz", "COURSE 1", "  Khoury  "]
+
+def _expected(school, entity, text):
+    text = text.strip().lower()
+    fields = School._SEARCH_FIELDS[entity]
+    return [o for o in getattr(school, entity).values()
+            if any(isinstance(getattr(o, f), str) and text in getattr(o, f).lower() for f in fields)]
+
+@pytest.mark.parametrize("cached", [False, True])
+@pytest.mark.parametrize("entity", ["students", "instructors", "courses"])
+@pytest.mark.parametrize("text", TEXTS)
+def test_search_iter_matches_every_search_field(school, entity, text, cached):
+    if cached:
+        school.enable_cache(64)
+    expected = _expected(school, entity, text)
+    assert list(school.search_iter(text, entity)) == expected
+    assert list(school.search_iter(text, entity, limit=3)) == expected[:3]
+    assert list(school.search_iter(text, entity, limit=0)) == []
+
+def test_search_on_a_snapshot(school):
+    snap = school.snapshot()
+    school.add_student(Student(name="Student Zed", age=20, _email="zed@uni.org", student_id="ZED"))
+    assert [s.student_id for s in school.search("zed")["students"]] == ["ZED"]
+    assert snap.search("zed")["students"] == []
+
+def test_cached_search_sees_writes(school):
+    school.enable_cache(64)
+    assert school.search("newcomer")["students"] == []
+    school.add_student(Student(name="Newcomer", age=20, _email="new@uni.org", student_id="NEW"))
+    assert [s.student_id for s in school.search("newcomer")["students"]] == ["NEW"]
+    school.update_student("NEW", name="Renamed")
+    assert school.search("newcomer")["students"] == []
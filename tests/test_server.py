@@ -0,0 +1,93 @@
+import json
+import threading
+import pytest
+import storage
+from server import HttpError, SchoolService
+
+def _get(service, target, inm=None):
+    headers = {"if-none-match": inm} if inm else {}
+    return service.handle("GET", target, headers, b"")
+
+def _post(service, target, data):
+    return service.handle("POST", target, {}, json.dumps(data).encode())
+
+@pytest.fixture(params=["memory", "sqlite"])
+def service(request, tmp_path, school):
+    if request.param == "memory":
+        yield SchoolService(school)
+        return
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    lazy = storage.SqliteSchool(path, cache_size=16)
+    yield SchoolService(lazy)
+    lazy.close()
+
+def test_etag_changes_only_on_successful_writes(service, school):
+    sid = next(iter(school.students))
+    _, _, headers = _get(service, "/students")
+    etag = headers["ETag"]
+    with pytest.raises(HttpError) as e:
+        _post(service, "/students", {"name": "Dup", "age": 20, "email": "d@uni.org", "student_id": sid})
+    assert e.value.status == 409
+    with pytest.raises(ValueError):
+        service.handle("PATCH", f"/students/{sid}", {}, json.dumps({"age": -5}).encode())
+    with pytest.raises(KeyError):
+        service.handle("DELETE", "/students/NOPE", {}, b"")
+    status, _, headers = _get(service, "/students", inm=etag)
+    assert status == 304 and headers["ETag"] == etag
+
+    service.handle("PATCH", f"/students/{sid}", {}, json.dumps({"age": 33}).encode())
+    status, payload, headers = _get(service, f"/students/{sid}", inm=etag)
+    assert status == 200 and headers["ETag"] != etag
+    assert payload["age"] == 33
+
+def test_health_reports_its_etag(service):
+    status, payload, headers = _get(service, "/health")
+    assert status == 200 and headers["ETag"] == f'"{payload["version"]}"'
+    assert _get(service, "/health", inm=headers["ETag"])[0] == 304
+
+def test_etag_matches_the_data_it_was_sent_with(school):
+    service = SchoolService(school)
+    sid = next(iter(school.students))
+    seen = {}
+    stop = threading.Event()
+    def writer():
+        age = 20
+        while not stop.is_set():
+            age = 20 + (age - 19) % 50
+            service.handle("PATCH", f"/students/{sid}", {}, json.dumps({"age": age}).encode())
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        for _ in range(2000):
+            _, payload, headers = _get(service, f"/students/{sid}")
+            assert seen.setdefault(headers["ETag"], payload["age"]) == payload["age"]
+    finally:
+        stop.set()
+        t.join()
+    assert len(seen) > 1
+
+def test_failed_patch_leaves_the_entity_unchanged(service, school):
+    sid = next(iter(school.students))
+    before = (school.students[sid].name, school.students[sid]._email)
+    # no GET first: the model has no snapshot yet, so nothing is copied on write
+    with pytest.raises(ValueError):
+        service.handle("PATCH", f"/students/{sid}", {}, json.dumps({"name": "Z", "email": "bad"}).encode())
+    status, after, _ = _get(service, f"/students/{sid}")
+    assert status == 200 and (after["name"], after["email"]) == before
+    if service.school is school:
+        assert (school.students[sid].name, school.students[sid]._email) == before
+
+@pytest.mark.parametrize("age", ["20", 20.5, True, None])
+def test_age_must_be_a_json_integer(service, school, age):
+    sid = next(iter(school.students))
+    with pytest.raises(HttpError) as e:
+        _post(service, "/students", {"name": "New", "age": age, "email": "n@uni.org", "student_id": "NEW"})
+    assert e.value.status == 422
+    with pytest.raises(HttpError) as e:
+        service.handle("PATCH", f"/students/{sid}", {}, json.dumps({"age": age}).encode())
+    assert e.value.status == 422
+    assert _get(service, f"/students/{sid}")[1]["age"] == school.students[sid].age
+    status, payload, _ = _post(service, "/students", {"name": "New", "age": 20, "email": "n@uni.org",
+                                                      "student_id": "NEW"})
+    assert status == 201 and payload["age"] == 20
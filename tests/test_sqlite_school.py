@@ -0,0 +1,54 @@
+import storage
+from diff import school_rows
+from models import School, SchoolSnapshot, Student
+from server import SchoolService
+
+def _db(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    return path
+
+def test_snapshot_reads_every_row(tmp_path, school):
+    lazy = storage.SqliteSchool(_db(tmp_path, school), cache_size=16)
+    try:
+        snap = lazy.snapshot()
+        assert isinstance(snap, SchoolSnapshot)
+        assert school_rows(snap) == school_rows(school)
+    finally:
+        lazy.close()
+
+def test_snapshot_is_isolated_from_later_writes(tmp_path, school):
+    lazy = storage.SqliteSchool(_db(tmp_path, school), cache_size=16)
+    try:
+        sid = next(iter(school.students))
+        snap = lazy.snapshot()
+        lazy.update_student(sid, age=99)
+        lazy.delete_student(list(school.students)[1])
+        assert snap.students[sid].age == school.students[sid].age
+        assert len(snap.students) == len(school.students)
+        assert lazy.snapshot().students[sid].age == 99
+    finally:
+        lazy.close()
+
+def test_snapshot_inside_batch_sees_its_writes(tmp_path, school):
+    lazy = storage.SqliteSchool(_db(tmp_path, school), cache_size=16)
+    try:
+        with lazy.batch():
+            lazy.add_student(Student(name="Batch Student", age=20, _email="b@uni.org", student_id="B1"))
+            assert "B1" in lazy.snapshot().students
+            assert lazy.conn.in_transaction
+        assert "B1" in storage.db_to_school(path=lazy.path).students
+    finally:
+        lazy.close()
+
+def test_server_reads_sqlite_school_under_lock(tmp_path, school):
+    assert School.cheap_snapshots and not storage.SqliteSchool.cheap_snapshots
+    lazy = storage.SqliteSchool(_db(tmp_path, school), cache_size=16, check_same_thread=False)
+    try:
+        service = SchoolService(lazy)
+        assert not service._snapshots
+        sid = next(iter(school.students))
+        status, payload, _ = service.handle("GET", f"/students/{sid}", {}, b"")
+        assert status == 200 and payload["student_id"] == sid
+    finally:
+        lazy.close()
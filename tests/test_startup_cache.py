@@ -0,0 +1,50 @@
+import os
+import pickle
+import sqlite3
+import pytest
+import storage
+from diff import school_rows
+from models import School
+
+@pytest.fixture
+def db(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    return path
+
+def test_round_trip(db, school):
+    dest = storage.save_startup_cache(school, db)
+    assert dest == storage.startup_cache_path(db)
+    loaded = storage.load_startup_cache(db)
+    assert isinstance(loaded, School) and loaded is not school
+    assert school_rows(loaded) == school_rows(school)
+    assert loaded.verify() == []
+
+def test_stale_cache_is_a_miss(db, school):
+    storage.save_startup_cache(school, db)
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.execute("UPDATE students SET age = age + 1")
+    conn.close()
+    assert storage.load_startup_cache(db) is None
+    loaded, hit = storage.db_to_school_cached(path=db)
+    assert not hit and storage.db_to_school_cached(path=db)[1]
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_cache_writable_by_others_is_ignored(db, school):
+    dest = storage.save_startup_cache(school, db)
+    assert dest.stat().st_mode & 0o077 == 0
+    os.chmod(dest, 0o666)
+    assert storage.load_startup_cache(db) is None
+
+class _Planted:
+    ran = False
+    def __reduce__(self):
+        return (setattr, (_Planted, "ran", True))
+
+@pytest.mark.parametrize("content", [pickle.dumps(_Planted()), b"", b"\x00garbage"])
+def test_foreign_files_are_a_miss_and_run_nothing(db, school, content):
+    dest = storage.save_startup_cache(school, db)
+    dest.write_bytes(content)
+    assert storage.load_startup_cache(db) is None
+    assert not _Planted.ran
@@ -0,0 +1,117 @@
+import sqlite3
+import pytest
+import storage
+from diff import school_rows
+
+def _pick(school):
+    """A student, a course they are not in, and an instructor with a course."""
+    sid = next(iter(school.students))
+    cid = next(c for c in school.courses if sid not in school.courses[c].enrolled_students)
+    iid = next(i for i, ins in school.instructors.items() if ins.assigned_courses)
+    return sid, cid, iid
+
+def _unassigned(school):
+    cid = next(c for c, co in school.courses.items() if co.instructor_id)
+    school.instructors[school.courses[cid].instructor_id].assigned_courses.remove(cid)
+    school.courses[cid].instructor_id = None
+    return cid
+
+# each damages the school behind the API and returns a check of the repaired state
+def _student_side_only(school):
+    sid, cid, _ = _pick(school)
+    school.students[sid].registered_courses.append(cid)
+    return lambda sc: sid in sc.courses[cid].enrolled_students
+
+def _course_side_only(school):
+    sid, cid, _ = _pick(school)
+    school.courses[cid].enrolled_students.append(sid)
+    return lambda sc: cid in sc.students[sid].registered_courses
+
+def _missing_course(school):
+    sid, _, _ = _pick(school)
+    school.students[sid].registered_courses.append("GONE")
+    return lambda sc: "GONE" not in sc.students[sid].registered_courses
+
+def _missing_student(school):
+    _, cid, _ = _pick(school)
+    school.courses[cid].enrolled_students.append("GONE")
+    return lambda sc: "GONE" not in sc.courses[cid].enrolled_students
+
+def _duplicates(school):
+    sid = next(s for s, st in school.students.items() if st.registered_courses)
+    cid = school.students[sid].registered_courses[0]
+    school.students[sid].registered_courses.append(cid)
+    school.courses[cid].enrolled_students.append(sid)
+    return lambda sc: (sc.students[sid].registered_courses.count(cid) == 1
+                       and sc.courses[cid].enrolled_students.count(sid) == 1)
+
+def _misfiled(school):
+    sid, _, _ = _pick(school)
+    school.students[sid].student_id = "WRONG"
+    return lambda sc: sc.students[sid].student_id == sid
+
+def _instructor_side_only(school):
+    cid = _unassigned(school)
+    iid = next(iter(school.instructors))
+    school.instructors[iid].assigned_courses.append(cid)
+    return lambda sc: sc.courses[cid].instructor_id == iid
+
+def _course_side_only_teaching(school):
+    cid = _unassigned(school)
+    iid = next(iter(school.instructors))
+    school.courses[cid].instructor_id = iid
+    return lambda sc: cid in sc.instructors[iid].assigned_courses
+
+def _missing_instructor(school):
+    cid = next(c for c, co in school.courses.items() if co.instructor_id)
+    school.instructors[school.courses[cid].instructor_id].assigned_courses.remove(cid)
+    school.courses[cid].instructor_id = "GONE"
+    return lambda sc: sc.courses[cid].instructor_id is None
+
+def _taught_by_another(school):
+    cid = next(c for c, co in school.courses.items() if co.instructor_id)
+    owner = school.courses[cid].instructor_id
+    iid = next(i for i in school.instructors if i != owner)
+    school.instructors[iid].assigned_courses.append(cid)
+    return lambda sc: cid not in sc.instructors[iid].assigned_courses and sc.courses[cid].instructor_id == owner
+
+DAMAGE = [_student_side_only, _course_side_only, _missing_course, _missing_student, _duplicates, _misfiled,
+          _instructor_side_only, _course_side_only_teaching, _missing_instructor, _taught_by_another]
+
+def test_consistent_school_has_no_problems(school):
+    assert school.verify() == []
+    assert school.verify(repair=True) == []
+
+@pytest.mark.parametrize("damage", DAMAGE)
+def test_repair(school, damage):
+    repaired = damage(school)
+    problems = school.verify()
+    assert problems
+    assert school.verify(repair=True) == problems
+    assert school.verify() == []
+    assert repaired(school)
+
+def test_repair_goes_through_the_api(school):
+    check = _course_side_only(school)
+    damaged = school_rows(school)
+    snap = school.snapshot()
+    seen = []
+    school.subscribe(lambda entity, key, obj: seen.append((entity, key)))
+    school.verify(repair=True)
+    assert check(school) and not check(snap)
+    assert school_rows(snap) == damaged
+    assert seen and all(entity == "students" for entity, _ in seen)
+
+def test_verify_db_finds_and_repairs_dangling_rows(tmp_path, school):
+    path = tmp_path / "school.db"
+    storage.school_to_db(school, path=path)
+    assert storage.verify_db(path) == []
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("INSERT INTO registrations(student_id, course_id) VALUES ('GONE', ?)", (next(iter(school.courses)),))
+        conn.execute("UPDATE courses SET instructor_id = 'GONE' WHERE course_id = ?", (next(iter(school.courses)),))
+    conn.close()
+    problems = storage.verify_db(path, repair=True)
+    assert any("missing student" in p for p in problems)
+    assert any("missing instructor GONE" in p for p in problems)
+    assert storage.verify_db(path) == []
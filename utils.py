@@ -2,12 +2,21 @@
 """Utility functions for data validation.
 
 Contains email validation and numeric validation helpers used throughout
-the School Management System.
+the School Management System, plus column-at-a-time batch variants for
+bulk ingest.
 """
 
 import re
+from functools import lru_cache
+from typing import Iterable, List, Tuple
 
 EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+# EMAIL_RE split at its single "@": local parts are checked per value,
+# domains repeat heavily across a roster and are memoised.
+_LOCAL_RE = re.compile(r"[A-Za-z0-9._%+-]+")
+_DOMAIN_RE = re.compile(r"^[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+# the PyQt window's original rule: anything around one "@" with a dot after it
+LOOSE_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
 def is_valid_email(email: str) -> bool:
     """Validate an email address using regex.
@@ -19,6 +28,20 @@ def is_valid_email(email: str) -> bool:
     """
     return bool(EMAIL_RE.match(email or ""))
 
+def is_loose_email(email: str) -> bool:
+    """Validate an email address the way the PyQt window always has.
+    
+    Accepts addresses :func:`is_valid_email` rejects, such as one-letter or
+    non-ASCII top-level domains, so data entered there keeps loading and
+    can still be edited.
+    
+    :param email: Email string to validate.
+    :type email: str
+    :return: True if email format is valid, False otherwise.
+    :rtype: bool
+    """
+    return bool(LOOSE_EMAIL_RE.match(email or ""))
+
 def non_negative_int(value) -> bool:
     """Check if a value can be converted to a non-negative integer.
     
@@ -30,3 +53,60 @@ def non_negative_int(value) -> bool:
         return int(value) >= 0
     except Exception:
         return False
+
+@lru_cache(maxsize=4096)
+def _valid_domain(domain: str) -> bool:
+    return bool(_DOMAIN_RE.match(domain))
+
+def validate_emails(emails: Iterable) -> Tuple[List[bool], List[int]]:
+    """Validate a column of email addresses.
+    
+    Gives the same verdict as :func:`is_valid_email` for every string, but
+    checks each distinct domain only once.
+    
+    :param emails: Email values to validate.
+    :type emails: Iterable[str]
+    :return: Per-value validity mask and the indices of invalid values.
+    :rtype: tuple[list[bool], list[int]]
+    """
+    mask, bad = [], []
+    local_ok = _LOCAL_RE.fullmatch
+    for i, e in enumerate(emails):
+        ok = False
+        if isinstance(e, str):
+            local, at, domain = e.partition("@")
+            ok = bool(at and local_ok(local) and "@" not in domain and _valid_domain(domain))
+        mask.append(ok)
+        if not ok:
+            bad.append(i)
+    return mask, bad
+
+def validate_non_negative_ints(values: Iterable) -> Tuple[List[bool], List[int]]:
+    """Validate a column of values with :func:`non_negative_int` semantics.
+    
+    :param values: Values to check (any type).
+    :return: Per-value validity mask and the indices of invalid values.
+    :rtype: tuple[list[bool], list[int]]
+    """
+    mask, bad = [], []
+    for i, v in enumerate(values):
+        ok = v >= 0 if type(v) is int else non_negative_int(v)
+        mask.append(ok)
+        if not ok:
+            bad.append(i)
+    return mask, bad
+
+def validate_required(values: Iterable) -> Tuple[List[bool], List[int]]:
+    """Validate a column of required text values (non-blank strings).
+    
+    :param values: Values to check.
+    :return: Per-value validity mask and the indices of invalid values.
+    :rtype: tuple[list[bool], list[int]]
+    """
+    mask, bad = [], []
+    for i, v in enumerate(values):
+        ok = isinstance(v, str) and bool(v.strip())
+        mask.append(ok)
+        if not ok:
+            bad.append(i)
+    return mask, bad